@@ -14,10 +14,46 @@ class Settings(BaseSettings):
     API_V1_PREFIX: str = "/api/v1"
 
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./fitness_tracker.db")
+    # Connection pool (sync and async engines each keep one pool of this size per process)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))  # Seconds; -1 disables
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    # SQLite production profile (file databases only): WAL + pragmas on every connection, and a single
+    # writer thread that group-commits activity/nutrition/sleep inserts
+    SQLITE_PRODUCTION_MODE: bool = os.getenv("SQLITE_PRODUCTION_MODE", "false").lower() in ("1", "true", "yes")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", 65536))
+    SQLITE_MMAP_SIZE_BYTES: int = int(os.getenv("SQLITE_MMAP_SIZE_BYTES", 268435456))
+    SQLITE_WRITE_QUEUE: bool = os.getenv("SQLITE_WRITE_QUEUE", "true").lower() in ("1", "true", "yes")
+    SQLITE_WRITE_BATCH_SIZE: int = int(os.getenv("SQLITE_WRITE_BATCH_SIZE", 64))
+    SQLITE_WRITE_BATCH_WINDOW_MS: float = float(os.getenv("SQLITE_WRITE_BATCH_WINDOW_MS", 2))
+    # Authenticated-user cache (per API process); 0 for either disables it
+    USER_CACHE_TTL_S: float = float(os.getenv("USER_CACHE_TTL_S", 30))
+    USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))
+    # GPS track metrics (services/gps_service.py)
+    GPS_DISTANCE_FORMULA: str = os.getenv("GPS_DISTANCE_FORMULA", "haversine")  # "haversine" or "vincenty"
+    GPS_MAX_ACCURACY_M: float = float(os.getenv("GPS_MAX_ACCURACY_M", 50))  # Fixes less accurate than this are dropped
+    GPS_ELEVATION_HYSTERESIS_M: float = float(os.getenv("GPS_ELEVATION_HYSTERESIS_M", 3))
+    GPS_MOVING_SPEED_MPS: float = float(os.getenv("GPS_MOVING_SPEED_MPS", 0.5))  # Slower segments count as stopped
+    GPS_SIMPLIFY_TOLERANCE_M: float = float(os.getenv("GPS_SIMPLIFY_TOLERANCE_M", 5))  # 0 stores tracks as recorded
+    # Route polylines for maps (services/polyline_service.py)
+    ROUTE_TOLERANCE_PX: float = float(os.getenv("ROUTE_TOLERANCE_PX", 1))  # Max on-screen deviation at the requested zoom
+    ROUTE_CACHE_MAX_ACTIVITIES: int = int(os.getenv("ROUTE_CACHE_MAX_ACTIVITIES", 256))
+    ROUTE_CACHE_TTL_S: float = float(os.getenv("ROUTE_CACHE_TTL_S", 600))
+    # Bulk ingestion (/activities/bulk, /nutrition/bulk, /sleep/bulk)
+    BULK_MAX_ITEMS: int = int(os.getenv("BULK_MAX_ITEMS", 5000))
+    BULK_INSERT_CHUNK_SIZE: int = int(os.getenv("BULK_INSERT_CHUNK_SIZE", 500))  # Rows per executemany
 
     SECRET_KEY: str = os.getenv("SECRET_KEY", "fallback_secret_key_32_chars_long_CHANGE_ME_IMMEDIATELY")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60 * 24 * 7))
+    # Password hashing: bcrypt cost, and a dedicated pool so login bursts can't take every core
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+    PASSWORD_HASH_MAX_CONCURRENT: int = int(os.getenv("PASSWORD_HASH_MAX_CONCURRENT", 2))
+    PASSWORD_HASH_MAX_QUEUED: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUED", 64))
 
     STRIPE_SECRET_KEY: str = os.getenv("STRIPE_SECRET_KEY", "sk_test_YOUR_STRIPE_SECRET_KEY")
     STRIPE_PUBLISHABLE_KEY: str = os.getenv("STRIPE_PUBLISHABLE_KEY", "pk_test_YOUR_STRIPE_PUBLISHABLE_KEY")
@@ -31,6 +67,30 @@ class Settings(BaseSettings):
     MYFITNESSPAL_API_KEY: str = os.getenv("MYFITNESSPAL_API_KEY", "YOUR_MFP_API_KEY_HYPOTHETICAL")
 
     POSE_ESTIMATION_MODEL_PATH: str = os.getenv("POSE_ESTIMATION_MODEL_PATH", "backend/models/mmovenet-tflite-singlepose-thunder.tflite")
+    # Several pose models, e.g. "lightning=backend/models/movenet_lightning.tflite,thunder=...,lightning_int8=...".
+    # Interactive requests use the fastest measured one, batch requests the most accurate. Overrides the path above.
+    POSE_MODEL_VARIANTS: Optional[str] = os.getenv("POSE_MODEL_VARIANTS")
+    # CV form analysis runs in a separate process pool; requests beyond running + queued get a 429
+    CV_MAX_CONCURRENT_ANALYSES: int = int(os.getenv("CV_MAX_CONCURRENT_ANALYSES", 2))
+    CV_MAX_QUEUED_ANALYSES: int = int(os.getenv("CV_MAX_QUEUED_ANALYSES", 8))
+    # Pose inference engine: one TFLite interpreter per worker thread, frames dispatched in batches. Every CV
+    # worker process has its own engine, so by default the interpreter threads of all workers together
+    # (CV_MAX_CONCURRENT_ANALYSES x POSE_INFERENCE_NUM_WORKERS x POSE_INTERPRETER_NUM_THREADS) match the cores
+    POSE_INTERPRETER_NUM_THREADS: int = int(os.getenv("POSE_INTERPRETER_NUM_THREADS", 2))
+    POSE_INFERENCE_NUM_WORKERS: int = int(os.getenv("POSE_INFERENCE_NUM_WORKERS", max(1, (os.cpu_count() or 2) // (
+            max(1, CV_MAX_CONCURRENT_ANALYSES) * max(1, POSE_INTERPRETER_NUM_THREADS)))))
+    POSE_INFERENCE_BATCH_SIZE: int = int(os.getenv("POSE_INFERENCE_BATCH_SIZE", 8))
+    # OpenCV/TFLite and the model load on first use; set to start the CV workers and load it at startup
+    CV_WARM_UP_ON_STARTUP: bool = os.getenv("CV_WARM_UP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+    # Keypoint cache keyed by frame content hash + model: in-memory LRU entries, optional on-disk tier
+    POSE_KEYPOINT_CACHE_SIZE: int = int(os.getenv("POSE_KEYPOINT_CACHE_SIZE", 4096))
+    POSE_KEYPOINT_CACHE_DIR: Optional[str] = os.getenv("POSE_KEYPOINT_CACHE_DIR")
+    # JSON file of exercise form specs (joints, thresholds, phases, weights); defaults to the bundled rules
+    EXERCISE_FORM_RULES_PATH: Optional[str] = os.getenv("EXERCISE_FORM_RULES_PATH")
+    # Capture rate assumed for uploaded frames that don't state one; used to time rep tempo
+    CV_DEFAULT_SOURCE_FPS: float = float(os.getenv("CV_DEFAULT_SOURCE_FPS", 30))
+    # Live (WebSocket) form feedback: frames older than this when inference is free are dropped
+    CV_LIVE_LATENCY_BUDGET_MS: int = int(os.getenv("CV_LIVE_LATENCY_BUDGET_MS", 200))
 
     BACKEND_CORS_ORIGINS: str = os.getenv(
         "BACKEND_CORS_ORIGINS",
@@ -39,6 +99,14 @@ class Settings(BaseSettings):
 
 
     FIREBASE_SERVICE_ACCOUNT_KEY_PATH: Optional[str] = os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY_PATH", "backend/firebase-service-account-key.json")
+    # Firebase ID token verification; the project ID defaults to the service account's
+    FIREBASE_PROJECT_ID: Optional[str] = os.getenv("FIREBASE_PROJECT_ID")
+    FIREBASE_CERTS_URL: str = os.getenv(
+        "FIREBASE_CERTS_URL",
+        "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+    )
+    FIREBASE_CERTS_REFRESH_S: float = float(os.getenv("FIREBASE_CERTS_REFRESH_S", 3600))  # If no Cache-Control max-age
+    FIREBASE_TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("FIREBASE_TOKEN_CACHE_MAX_ENTRIES", 10000))
 
     model_config = SettingsConfigDict(
         case_sensitive=True,
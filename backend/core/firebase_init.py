@@ -1,13 +1,16 @@
 # backend/core/firebase_init.py
 import firebase_admin
-from firebase_admin import credentials, auth
+from firebase_admin import credentials
 from fastapi import HTTPException, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
 
 from backend.core.config import settings
 from backend import models, crud, schemas as pydantic_schemas  # For type hints and user creation
 from backend.database import get_db  # To interact with DB for user creation/retrieval
+from backend.core.firebase_tokens import InvalidFirebaseTokenError, firebase_token_verifier
+from backend.core.user_cache import USER_KEY_FIREBASE_UID, user_identity_cache
 from sqlalchemy.orm import Session
 
 firebase_app_initialized = False
@@ -50,6 +53,8 @@ async def verify_firebase_token(
 ) -> dict:
     """
     Verifies Firebase ID token and returns decoded claims.
+    Verified tokens are cached until they expire; a miss verifies in the threadpool (it may have to fetch
+    rotated signing certs) rather than on the event loop.
     """
     if not firebase_app_initialized:
         raise HTTPException(
@@ -58,21 +63,23 @@ async def verify_firebase_token(
         )
 
     id_token = token_cred.credentials
-    try:
-        decoded_token = auth.verify_id_token(id_token)
+    decoded_token = firebase_token_verifier.get_cached(id_token)
+    if decoded_token is not None:
         return decoded_token
-    except firebase_admin.auth.InvalidIdTokenError as e:
+    try:
+        return await run_in_threadpool(firebase_token_verifier.verify, id_token)
+    except InvalidFirebaseTokenError as e:
+        if e.expired:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Expired Firebase ID token: {e}",
+                headers={"WWW-Authenticate": "Bearer error=\"expired_token\""},
+            )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Invalid Firebase ID token: {e}",
             headers={"WWW-Authenticate": "Bearer error=\"invalid_token\""},
         )
-    except firebase_admin.auth.ExpiredIdTokenError as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Expired Firebase ID token: {e}",
-            headers={"WWW-Authenticate": "Bearer error=\"expired_token\""},
-        )
     except Exception as e:  # Catch other Firebase auth errors
         print(f"Error verifying Firebase token: {e}")
         raise HTTPException(
@@ -82,13 +89,14 @@ async def verify_firebase_token(
         )
 
 
-async def get_current_firebase_user(
+def get_current_firebase_user(
         db: Session = Depends(get_db),
         decoded_token: dict = Depends(verify_firebase_token)
 ) -> models.User:
     """
     Dependency to get the current user based on a verified Firebase ID token.
     Creates or updates the user in the local database.
+    A plain def so FastAPI runs the blocking DB lookups in its threadpool rather than on the event loop.
     """
     firebase_uid = decoded_token.get("uid")
     email = decoded_token.get("email")
@@ -101,7 +109,10 @@ async def get_current_firebase_user(
             detail="Firebase token missing UID or email."
         )
 
-    user = crud.user.get_by_firebase_uid(db, firebase_uid=firebase_uid)
+    user = user_identity_cache.get(db, USER_KEY_FIREBASE_UID, firebase_uid)
+    from_cache = user is not None
+    if not user:
+        user = crud.user.get_by_firebase_uid(db, firebase_uid=firebase_uid)
 
     if not user:
         # User authenticated with Firebase but doesn't exist in our DB yet.
@@ -116,6 +127,7 @@ async def get_current_firebase_user(
             db.add(user_by_email)
             db.commit()
             db.refresh(user_by_email)
+            user_identity_cache.invalidate_user(user_by_email.id)
             user = user_by_email
         else:
             # Create a new user in our database.
@@ -128,6 +140,8 @@ async def get_current_firebase_user(
             )
             user = crud.user.create_with_firebase(db, obj_in=user_create_schema)
 
+    if not from_cache:  # Re-putting a hit would extend its expiry, so the user would never be reloaded
+        user_identity_cache.put(USER_KEY_FIREBASE_UID, firebase_uid, user)
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User account is inactive.")
 
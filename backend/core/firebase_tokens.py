@@ -0,0 +1,196 @@
+# backend/core/firebase_tokens.py
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+from google.auth import jwt as google_jwt
+
+from backend.core.config import settings
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class InvalidFirebaseTokenError(Exception):
+    def __init__(self, message: str, expired: bool = False):
+        super().__init__(message)
+        self.expired = expired
+
+
+class FirebaseSigningKeys:
+    """
+    Google's x509 certs for Firebase ID tokens, keyed by `kid`.
+
+    A background thread refetches them shortly before the Cache-Control max-age runs out, so requests
+    never wait on the cert server. A token signed with an unknown `kid` (key rotation) triggers at most
+    one inline refetch per `min_refetch_s`.
+    """
+
+    def __init__(self, certs_url: str, fallback_refresh_s: float, min_refetch_s: float = 30.0):
+        self.certs_url = certs_url
+        self.fallback_refresh_s = fallback_refresh_s
+        self.min_refetch_s = min_refetch_s
+        self._certs: Dict[str, str] = {}
+        self._fetched_at = 0.0
+        self._refresh_in_s = fallback_refresh_s
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.fetches = 0
+        self.fetch_failures = 0
+
+    def refresh(self) -> Dict[str, str]:
+        response = httpx.get(self.certs_url, timeout=10.0)
+        response.raise_for_status()
+        certs = response.json()
+        max_age = _MAX_AGE_RE.search(response.headers.get("cache-control", ""))
+        with self._lock:
+            self._certs = certs
+            self._fetched_at = time.monotonic()
+            # Refetch ahead of expiry so the old certs are still valid if the fetch is slow or fails
+            self._refresh_in_s = int(max_age.group(1)) * 0.8 if max_age else self.fallback_refresh_s
+            self.fetches += 1
+        return certs
+
+    def get(self, kid: str) -> Optional[str]:
+        with self._lock:
+            cert = self._certs.get(kid)
+            can_refetch = time.monotonic() - self._fetched_at >= self.min_refetch_s or not self._certs
+        if cert is None and can_refetch:
+            try:
+                cert = self.refresh().get(kid)
+            except (httpx.HTTPError, ValueError) as e:
+                self.fetch_failures += 1
+                print(f"WARNING: Could not fetch Firebase signing certs: {e}")
+        return cert
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                wait_s = self._refresh_in_s
+            except (httpx.HTTPError, ValueError) as e:
+                self.fetch_failures += 1
+                print(f"WARNING: Could not refresh Firebase signing certs, retrying in 60s: {e}")
+                wait_s = 60.0
+            self._stop.wait(max(1.0, wait_s))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="firebase-certs-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+class FirebaseTokenVerifier:
+    """
+    Verifies Firebase ID tokens the way firebase_admin.auth.verify_id_token does (RS256 signature, aud,
+    iss, iat/exp, sub) against keys held warm by FirebaseSigningKeys, and caches the decoded claims by
+    token hash until the token expires, so each token's signature is checked once per process.
+    """
+
+    def __init__(self, keys: FirebaseSigningKeys, project_id: Callable[[], Optional[str]], max_entries: int):
+        self.keys = keys
+        self._project_id = project_id
+        self.max_entries = max(0, max_entries)
+        self._cache: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _cache_key(id_token: str) -> bytes:
+        return hashlib.sha256(id_token.encode("utf-8")).digest()
+
+    def get_cached(self, id_token: str) -> Optional[Dict[str, Any]]:
+        key = self._cache_key(id_token)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def verify(self, id_token: str) -> Dict[str, Any]:
+        cached = self.get_cached(id_token)
+        if cached is not None:
+            return cached
+        self.misses += 1  # Every signature check, including failed ones
+
+        project_id = self._project_id()
+        if not project_id:
+            raise InvalidFirebaseTokenError("Firebase project ID is not configured.")
+        try:
+            header = google_jwt.decode_header(id_token)
+        except (ValueError, TypeError) as e:
+            raise InvalidFirebaseTokenError(f"Malformed token: {e}")
+        if header.get("alg") != "RS256" or not header.get("kid"):
+            raise InvalidFirebaseTokenError("Token must be RS256-signed and carry a 'kid' header.")
+        cert = self.keys.get(header["kid"])
+        if cert is None:
+            raise InvalidFirebaseTokenError("Token was signed with an unknown key.")
+
+        try:
+            claims = google_jwt.decode(id_token, certs={header["kid"]: cert}, audience=project_id)
+        except ValueError as e:
+            unverified = google_jwt.decode(id_token, verify=False)
+            expired = isinstance(unverified.get("exp"), (int, float)) and unverified["exp"] <= time.time()
+            raise InvalidFirebaseTokenError(str(e), expired=expired)
+
+        if claims.get("iss") != f"https://securetoken.google.com/{project_id}":
+            raise InvalidFirebaseTokenError("Token has an incorrect 'iss' (issuer) claim.")
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise InvalidFirebaseTokenError("Token has an invalid 'sub' (subject) claim.")
+        claims["uid"] = subject
+
+        if self.max_entries > 0:
+            with self._lock:
+                self._cache[self._cache_key(id_token)] = (float(claims["exp"]), claims)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return dict(claims)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._cache)
+        return {
+            "cached_tokens": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "cert_fetches": self.keys.fetches,
+            "cert_fetch_failures": self.keys.fetch_failures,
+        }
+
+
+def _project_id() -> Optional[str]:
+    if settings.FIREBASE_PROJECT_ID:
+        return settings.FIREBASE_PROJECT_ID
+    import firebase_admin
+    try:
+        return firebase_admin.get_app().project_id
+    except ValueError:  # App not initialized
+        return None
+
+
+firebase_signing_keys = FirebaseSigningKeys(
+    certs_url=settings.FIREBASE_CERTS_URL,
+    fallback_refresh_s=settings.FIREBASE_CERTS_REFRESH_S,
+)
+firebase_token_verifier = FirebaseTokenVerifier(
+    keys=firebase_signing_keys,
+    project_id=_project_id,
+    max_entries=settings.FIREBASE_TOKEN_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,178 @@
+# backend/core/password_hashing.py
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from backend.core.config import settings
+
+
+def build_password_context(rounds: int) -> CryptContext:
+    # Pinning min and max to the configured cost makes needs_update() flag hashes made at any other cost,
+    # so they are rehashed at the next successful login
+    return CryptContext(
+        schemes=["bcrypt"], deprecated="auto",
+        bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds,
+    )
+
+
+class PasswordHashingPool:
+    """
+    Runs bcrypt hashing and verification on a small dedicated thread pool (bcrypt releases the GIL).
+
+    At most `max_concurrent` hashes run at once, so a burst of logins or registrations can use only that
+    many cores and every other endpoint keeps running. At most `max_queued` more may wait; beyond that
+    callers get 429 with a Retry-After estimate rather than queueing behind the burst.
+    """
+
+    def __init__(self, context: CryptContext, max_concurrent: int, max_queued: int):
+        self.context = context
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0  # Running + queued
+        self._running = 0
+
+        # Metrics
+        self.hashes = 0
+        self.verifications = 0
+        self.rehashes = 0
+        self.jobs_rejected = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.total_run_s = 0.0
+        self.logins_succeeded = 0
+        self.logins_failed = 0
+        self._recent_logins: deque = deque()  # Monotonic timestamps of the last minute's login attempts
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def _estimate_retry_after_s(self) -> int:
+        jobs = self.hashes + self.verifications
+        avg_run_s = self.total_run_s / jobs if jobs else 0.25
+        return max(1, int(round(avg_run_s * self._pending / self.max_concurrent)))
+
+    def _timed(self, enqueued_at: float, fn: Callable[..., Any], *args) -> Any:
+        started_at = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            wait_s = started_at - enqueued_at
+            self.total_wait_s += wait_s
+            self.max_wait_s = max(self.max_wait_s, wait_s)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.total_run_s += time.perf_counter() - started_at
+
+    def _release(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+
+    def _submit(self, fn: Callable[..., Any], *args) -> Future:
+        with self._lock:
+            if self._pending >= self.max_concurrent + self.max_queued:
+                self.jobs_rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many sign-in attempts are being processed. Please retry shortly.",
+                    headers={"Retry-After": str(self._estimate_retry_after_s())},
+                )
+            self._pending += 1
+        try:
+            future = self._get_executor().submit(self._timed, time.perf_counter(), fn, *args)
+        except RuntimeError:  # Executor shut down
+            with self._lock:
+                self._pending -= 1
+            raise
+        # Also runs for jobs cancelled before they started (an awaiting request went away, shutdown()),
+        # which never reach _timed
+        future.add_done_callback(self._release)
+        return future
+
+    def _hash(self, password: str) -> str:
+        hashed = self.context.hash(password)
+        with self._lock:
+            self.hashes += 1
+        return hashed
+
+    def _verify_and_update(self, password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+        if not hashed_password:  # No local password (Firebase-only user)
+            return False, None
+        verified, new_hash = self.context.verify_and_update(password, hashed_password)
+        with self._lock:
+            self.verifications += 1
+            if new_hash:
+                self.rehashes += 1
+        return verified, new_hash
+
+    def hash(self, password: str) -> str:
+        """Blocks the calling (threadpool) thread until the hash is ready; CPU use stays capped by the pool."""
+        return self._submit(self._hash, password).result()
+
+    async def ahash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(self._hash, password))
+
+    def verify_and_update(self, password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """Returns (verified, new_hash); new_hash is set when the stored hash used another cost or scheme."""
+        return self._submit(self._verify_and_update, password, hashed_password).result()
+
+    async def averify_and_update(self, password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+        return await asyncio.wrap_future(self._submit(self._verify_and_update, password, hashed_password))
+
+    def record_login(self, succeeded: bool):
+        now = time.monotonic()
+        with self._lock:
+            if succeeded:
+                self.logins_succeeded += 1
+            else:
+                self.logins_failed += 1
+            self._recent_logins.append(now)
+            while self._recent_logins and self._recent_logins[0] < now - 60:
+                self._recent_logins.popleft()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            while self._recent_logins and self._recent_logins[0] < now - 60:
+                self._recent_logins.popleft()
+            jobs = self.hashes + self.verifications
+            return {
+                "bcrypt_rounds": self.context.handler().default_rounds,
+                "max_concurrent": self.max_concurrent,
+                "max_queued": self.max_queued,
+                "running": self._running,
+                "queue_depth": self._pending - self._running,
+                "hashes": self.hashes,
+                "verifications": self.verifications,
+                "rehashes": self.rehashes,
+                "jobs_rejected": self.jobs_rejected,
+                "avg_wait_ms": round(self.total_wait_s / jobs * 1000, 1) if jobs else 0.0,
+                "max_wait_ms": round(self.max_wait_s * 1000, 1),
+                "avg_run_ms": round(self.total_run_s / jobs * 1000, 1) if jobs else 0.0,
+                "logins_succeeded": self.logins_succeeded,
+                "logins_failed": self.logins_failed,
+                "logins_last_minute": len(self._recent_logins),
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHashingPool(
+    context=build_password_context(settings.BCRYPT_ROUNDS),
+    max_concurrent=settings.PASSWORD_HASH_MAX_CONCURRENT,
+    max_queued=settings.PASSWORD_HASH_MAX_QUEUED,
+)
@@ -1,7 +1,6 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Any
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
@@ -10,20 +9,21 @@ from backend.core.config import settings
 from backend import schemas as pydantic_schemas  # Renamed to avoid confusion
 from backend import models  # For User model type hint
 from backend.database import get_db  # For dependency
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from backend.core.user_cache import USER_KEY_EMAIL, user_identity_cache
+from backend.core.password_hashing import password_hasher
 
 from backend.core.firebase_init import get_current_firebase_user # Import the new dependency
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = password_hasher.context
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_PREFIX}/auth/login")
+# bcrypt runs on password_hasher's bounded pool; these block the calling thread until it's done.
+# Async code should await password_hasher.ahash() / averify_and_update() instead.
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    if not hashed_password: # Handle cases where user has no local password (Firebase only)
-        return False
-    return pwd_context.verify(plain_password, hashed_password)
+    # A missing hash (Firebase-only user) never verifies
+    return password_hasher.verify_and_update(plain_password, hashed_password)[0]
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 
 
@@ -45,7 +45,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-async def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> models.User:
+def get_user_from_token(db: Session, token: str) -> models.User:
+    """Resolves a JWT access token to its user. Used directly where OAuth2 headers are unavailable (WebSockets)."""
     from backend import crud  # Avoid circular import at module level
 
     credentials_exception = HTTPException(
@@ -63,12 +64,21 @@ async def get_current_user(db: Session = Depends(get_db), token: str = Depends(o
         print(f"JWTError: {e}")  # Log the error for debugging
         raise credentials_exception
 
-    user = crud.get_user_by_email(db, email=token_data.email)
+    user = user_identity_cache.get(db, USER_KEY_EMAIL, token_data.email)
     if user is None:
-        raise credentials_exception
+        user = crud.user.get_by_email(db, email=token_data.email)
+        if user is None:
+            raise credentials_exception
+        user_identity_cache.put(USER_KEY_EMAIL, token_data.email, user)
     return user
 
 
+def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> models.User:
+    # Plain def: FastAPI runs it in the threadpool, so the blocking user lookup stays off the event loop.
+    # It keeps the sync session because routes lazy-load relationships and update the user through it.
+    return get_user_from_token(db, token)
+
+
 async def get_current_active_user(current_user: models.User = Depends(get_current_user)) -> models.User:
     if not current_user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
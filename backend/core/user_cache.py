@@ -0,0 +1,102 @@
+# backend/core/user_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from backend import models
+from backend.core.config import settings
+
+USER_KEY_EMAIL = "email"  # JWT subject
+USER_KEY_FIREBASE_UID = "firebase_uid"
+
+
+def _snapshot(user: models.User) -> models.User:
+    """Detached copy holding only the user's column values, as if freshly loaded."""
+    snapshot = models.User(**{attr.key: getattr(user, attr.key) for attr in inspect(models.User).column_attrs})
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+class UserIdentityCache:
+    """
+    Short-lived, size-bounded cache of authenticated users, keyed by JWT subject or Firebase UID.
+
+    Entries are detached column-only snapshots that are never handed out themselves: get() merges a copy
+    into the request's session without a SELECT, so routes can still lazy-load relationships and update
+    the user, and the shared snapshot is never mutated. crud.user invalidates a user's entries when it is
+    updated (including deactivation) or deleted; other API processes pick the change up within `ttl_s`.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float):
+        self.max_entries = max(0, max_entries)
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, models.User]]" = OrderedDict()
+        self._keys_by_user_id: Dict[int, Set[Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_s > 0
+
+    def get(self, db: Session, kind: str, value: str) -> Optional[models.User]:
+        if not self.enabled:
+            return None
+        key = (kind, value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            snapshot = entry[1]
+        return db.merge(snapshot, load=False)
+
+    def put(self, kind: str, value: str, user: models.User):
+        if not self.enabled or user.id is None:
+            return
+        key = (kind, value)
+        snapshot = _snapshot(user)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_s, snapshot)
+            self._keys_by_user_id.setdefault(snapshot.id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: Optional[int]):
+        with self._lock:
+            for key in list(self._keys_by_user_id.get(user_id, ())):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user_id.clear()
+
+    def _drop(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            user_keys = self._keys_by_user_id.get(entry[1].id)
+            if user_keys is not None:
+                user_keys.discard(key)
+                if not user_keys:
+                    del self._keys_by_user_id[entry[1].id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+user_identity_cache = UserIdentityCache(
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    ttl_s=settings.USER_CACHE_TTL_S,
+)
@@ -1,15 +1,24 @@
+import base64
+import json
 from datetime import datetime
 
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer, joinedload, selectinload
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from typing import List, Optional, Type, TypeVar, Generic, Any, Dict, Union
+from typing import List, Optional, Type, TypeVar, Generic, Any, Dict, Tuple, Union
 from pydantic import BaseModel as PydanticBaseModel  # Alias for clarity
 
 
 from backend import models
 from backend import schemas as pydantic_schemas  # Consistent alias
-from backend.core.security import get_password_hash
+from backend.core.config import settings
+from backend.core.security import get_password_hash, password_hasher
 from backend.database import Base as DBBase  # SQLAlchemy Base
+from backend.core.user_cache import user_identity_cache
+from backend.database import in_unit_of_work, sqlite_write_queue
+from backend.services import gps_service
+from backend.services.polyline_service import route_levels_cache
 
 # --- Generic CRUD Base ---
 ModelType = TypeVar("ModelType", bound=DBBase)
@@ -17,9 +26,56 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=PydanticBaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=PydanticBaseModel)
 
 
+# --- Keyset pagination cursors ---
+def encode_page_cursor(timestamp: Optional[datetime], id: int) -> str:
+    """Opaque cursor for the row a page ended on: its listing timestamp and id."""
+    payload = json.dumps({"t": timestamp.isoformat() if timestamp else None, "id": id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_page_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Raises ValueError for anything encode_page_cursor() didn't produce."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        timestamp = datetime.fromisoformat(payload["t"]) if payload["t"] is not None else None
+        return timestamp, int(payload["id"])
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid pagination cursor.") from e
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    # Timestamp per-user listings are ordered by (newest first, ties by id); enables get_page_by_user()
+    listing_time_column: Optional[str] = None
+    # Loader options for relationships listing responses serialize, so they aren't lazy-loaded row by row
+    listing_load_options: tuple = ()
+
     def __init__(self, model: Type[ModelType]):
         self.model = model
+        # Columns the database fills in itself (server defaults, server onupdate, computed); none by default
+        self._has_server_generated_values = any(
+            column.server_default is not None or column.server_onupdate is not None or column.computed is not None
+            for column in self.model.__table__.columns if not column.primary_key)
+
+    def _needs_refresh(self, db: Session) -> bool:
+        # Python-side defaults are already on the object after flush and sessions don't expire on commit.
+        # Server-generated values come back via RETURNING on dialects that support it.
+        return self._has_server_generated_values and not db.get_bind().dialect.insert_returning
+
+    def _commit(self, db: Session, *objs: ModelType) -> None:
+        """Commits, or only flushes inside database.unit_of_work(), and refreshes `objs` only if needed."""
+        if in_unit_of_work(db):
+            db.flush()
+        else:
+            db.commit()
+        if self._needs_refresh(db):
+            for obj in objs:
+                db.refresh(obj)
+
+    async def _acommit(self, db: AsyncSession, *objs: ModelType) -> None:
+        await db.commit()
+        if self._needs_refresh(db.sync_session):
+            for obj in objs:
+                await db.refresh(obj)
 
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
         return db.query(self.model).filter(self.model.id == id).first()
@@ -32,13 +88,119 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db_obj = self.model(**obj_in_data)
         db.add(db_obj)
         try:
-            db.commit()
-            db.refresh(db_obj)
+            self._commit(db, db_obj)
         except IntegrityError as e:  # Catch potential unique constraint violations etc.
             db.rollback()
             raise e
         return db_obj
 
+    def get_page_by_user(
+            self, db: Session, *, user_id: int, cursor: Optional[str] = None, limit: int = 100, skip: int = 0,
+            filters: tuple = ()
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Keyset pagination over a user's rows, newest first by `listing_time_column` then id.
+
+        Each page seeks directly to the row after `cursor` on the (user_id, time DESC, id DESC) index, so
+        page N costs the same as page 1, unlike OFFSET. Rows without a timestamp come after all others.
+        `skip` is only applied without a cursor, for clients still paging by offset. Returns the page and
+        the cursor for the next one (None on the last page). Raises ValueError for a malformed cursor.
+        """
+        time_column, id_column = getattr(self.model, self.listing_time_column), self.model.id
+        base_query = db.query(self.model).options(*self.listing_load_options).filter(
+            self.model.user_id == user_id, *filters)
+        after_time, after_id = decode_page_cursor(cursor) if cursor else (None, None)
+
+        rows: List[ModelType] = []
+        if not cursor or after_time is not None:
+            query = base_query.filter(time_column.isnot(None))
+            if cursor:
+                query = query.filter(time_column <= after_time,
+                                     or_(time_column < after_time, and_(time_column == after_time, id_column < after_id)))
+            query = query.order_by(time_column.desc(), id_column.desc())
+            if not cursor and skip:
+                query = query.offset(skip)
+            rows = query.limit(limit + 1).all()
+        if len(rows) <= limit and time_column.nullable:
+            query = base_query.filter(time_column.is_(None))
+            if cursor and after_time is None:
+                query = query.filter(id_column < after_id)
+            rows += query.order_by(id_column.desc()).limit(limit + 1 - len(rows)).all()
+
+        if len(rows) <= limit:
+            return rows, None
+        page = rows[:limit]
+        return page, encode_page_cursor(getattr(page[-1], self.listing_time_column), page[-1].id)
+
+    def _row_for_user(self, obj_in: CreateSchemaType, user_id: int) -> Dict[str, Any]:
+        """Column values for a new row owned by `user_id`."""
+        return {**obj_in.dict(), "user_id": user_id}
+
+    def create_many(self, db: Session, *, objs_in: List[CreateSchemaType], user_id: int,
+                    chunk_size: int = 500) -> List[Union[int, SQLAlchemyError]]:
+        """
+        Inserts rows for `user_id` in one transaction, `chunk_size` rows per multi-row INSERT ... RETURNING id.
+        Returns, per input in order, the new id or the database error for that row: a failing chunk is rolled
+        back to its savepoint and retried row by row so only the bad rows are dropped.
+        """
+        rows = [self._row_for_user(obj_in, user_id) for obj_in in objs_in]
+        if sqlite_write_queue is not None and not in_unit_of_work(db):
+            return sqlite_write_queue.run(lambda session: self._insert_rows(session, rows, chunk_size))
+        try:
+            results = self._insert_rows(db, rows, chunk_size)
+            self._commit(db)
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+        return results
+
+    def _insert_rows(self, db: Session, rows: List[Dict[str, Any]],
+                     chunk_size: int) -> List[Union[int, SQLAlchemyError]]:
+        # Multi-row VALUES with RETURNING. SQLite assigns rowids in VALUES order, so sorting the returned ids
+        # lines them up with the rows; asking SQLAlchemy to order RETURNING there makes it fall back to one
+        # INSERT per row. Other dialects (Postgres) don't guarantee RETURNING order, so SQLAlchemy matches
+        # each id to its parameter set itself (sort_by_parameter_order)
+        ids_in_values_order = db.get_bind().dialect.name == "sqlite"
+        statement = insert(self.model).returning(self.model.id, sort_by_parameter_order=not ids_in_values_order)
+        chunk_size = max(1, chunk_size)
+        results: List[Union[int, SQLAlchemyError]] = []
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                with db.begin_nested():
+                    ids = db.execute(statement, chunk).scalars().all()
+                results.extend(sorted(ids) if ids_in_values_order else ids)
+                continue
+            except SQLAlchemyError:
+                pass
+            for row in chunk:  # Isolate the rows that failed the chunk
+                try:
+                    with db.begin_nested():
+                        results.append(db.execute(statement, [row]).scalar_one())
+                except SQLAlchemyError as e:
+                    results.append(e)
+        return results
+
+    def _insert(self, db: Session, db_obj: ModelType) -> ModelType:
+        """
+        Inserts a new row. With the SQLite writer queue enabled the insert is group-committed by the writer
+        thread (see database.SQLiteWriteQueue) and the returned object is detached with its columns loaded.
+        """
+        if sqlite_write_queue is not None and not in_unit_of_work(db):
+            def _job(session: Session) -> ModelType:
+                session.add(db_obj)
+                session.flush()  # Assigns the id; column defaults are Python-side, so no refresh is needed
+                return db_obj
+            return sqlite_write_queue.run(_job)
+
+        db.add(db_obj)
+        try:
+            self._commit(db, db_obj)
+        except IntegrityError as e:
+            db.rollback()
+            raise e
+        return db_obj
+
     def update(
             self, db: Session, *, db_obj: ModelType, obj_in: Union[UpdateSchemaType, Dict[str, Any]]
     ) -> ModelType:
@@ -53,8 +215,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                 setattr(db_obj, field, update_data[field])
         db.add(db_obj)
         try:
-            db.commit()
-            db.refresh(db_obj)
+            self._commit(db, db_obj)
         except IntegrityError as e:
             db.rollback()
             raise e
@@ -64,7 +225,47 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         obj = db.query(self.model).get(id)
         if obj:
             db.delete(obj)
-            db.commit()
+            self._commit(db)
+        return obj
+
+    # --- Async variants, for async routes using an AsyncSession (see database.get_async_db) ---
+    async def aget(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
+        return await db.get(self.model, id)
+
+    async def aget_multi(self, db: AsyncSession, *, skip: int = 0, limit: int = 100) -> List[ModelType]:
+        result = await db.execute(select(self.model).offset(skip).limit(limit))
+        return list(result.scalars().all())
+
+    async def acreate(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
+        db_obj = self.model(**obj_in.dict())
+        db.add(db_obj)
+        try:
+            await self._acommit(db, db_obj)
+        except IntegrityError as e:
+            await db.rollback()
+            raise e
+        return db_obj
+
+    async def aupdate(
+            self, db: AsyncSession, *, db_obj: ModelType, obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> ModelType:
+        update_data = obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)
+        for field in db_obj.__dict__:
+            if field in update_data:
+                setattr(db_obj, field, update_data[field])
+        db.add(db_obj)
+        try:
+            await self._acommit(db, db_obj)
+        except IntegrityError as e:
+            await db.rollback()
+            raise e
+        return db_obj
+
+    async def aremove(self, db: AsyncSession, *, id: int) -> Optional[ModelType]:
+        obj = await db.get(self.model, id)
+        if obj:
+            await db.delete(obj)
+            await db.commit()
         return obj
 
 
@@ -76,6 +277,14 @@ class CRUDUser(CRUDBase[models.User, pydantic_schemas.UserCreate, pydantic_schem
     def get_by_firebase_uid(self, db: Session, *, firebase_uid: str) -> Optional[models.User]:  # New method
         return db.query(models.User).filter(models.User.firebase_uid == firebase_uid).first()
 
+    async def aget_by_email(self, db: AsyncSession, *, email: str) -> Optional[models.User]:
+        result = await db.execute(select(models.User).filter(models.User.email == email).limit(1))
+        return result.scalars().first()
+
+    async def aget_by_firebase_uid(self, db: AsyncSession, *, firebase_uid: str) -> Optional[models.User]:
+        result = await db.execute(select(models.User).filter(models.User.firebase_uid == firebase_uid).limit(1))
+        return result.scalars().first()
+
     def create(self, db: Session, *, obj_in: pydantic_schemas.UserCreate) -> models.User:
         # This is for the old email/password registration.
         # If Firebase is primary, this might be deprecated or used for admin creation.
@@ -94,8 +303,7 @@ class CRUDUser(CRUDBase[models.User, pydantic_schemas.UserCreate, pydantic_schem
         # ... (commit, refresh, error handling as before) ...
         db.add(db_obj)
         try:
-            db.commit()
-            db.refresh(db_obj)
+            self._commit(db, db_obj)
         except IntegrityError as e:
             db.rollback();
             raise e
@@ -120,8 +328,7 @@ class CRUDUser(CRUDBase[models.User, pydantic_schemas.UserCreate, pydantic_schem
         # ... (commit, refresh, error handling as before) ...
         db.add(db_obj)
         try:
-            db.commit()
-            db.refresh(db_obj)
+            self._commit(db, db_obj)
         except IntegrityError as e:  # Could happen if email or firebase_uid is not unique
             db.rollback()
             print(f"CRUD ERROR: IntegrityError creating Firebase user {obj_in.email}: {e}")
@@ -136,8 +343,8 @@ class CRUDUser(CRUDBase[models.User, pydantic_schemas.UserCreate, pydantic_schem
                 if not existing_user_by_email.firebase_uid:
                     existing_user_by_email.firebase_uid = obj_in.firebase_uid
                     db.add(existing_user_by_email);
-                    db.commit();
-                    db.refresh(existing_user_by_email)
+                    self._commit(db, existing_user_by_email)
+                    user_identity_cache.invalidate_user(existing_user_by_email.id)
                     return existing_user_by_email
             raise e  # Re-raise if not resolved
         except SQLAlchemyError as e:
@@ -168,7 +375,30 @@ class CRUDUser(CRUDBase[models.User, pydantic_schemas.UserCreate, pydantic_schem
             db_obj.hashed_password = hashed_password
             del update_data["password"]
 
-        return super().update(db, db_obj=db_obj, obj_in=update_data)
+        updated = super().update(db, db_obj=db_obj, obj_in=update_data)
+        user_identity_cache.invalidate_user(updated.id)  # Covers deactivation (is_active=False) too
+        return updated
+
+    async def aupdate(
+            self, db: AsyncSession, *, db_obj: models.User, obj_in: Union[pydantic_schemas.UserUpdate, Dict[str, Any]]
+    ) -> models.User:
+        update_data = dict(obj_in) if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)
+        if "password" in update_data and update_data["password"]:
+            db_obj.hashed_password = await password_hasher.ahash(update_data["password"])
+            del update_data["password"]
+        updated = await super().aupdate(db, db_obj=db_obj, obj_in=update_data)
+        user_identity_cache.invalidate_user(updated.id)
+        return updated
+
+    def remove(self, db: Session, *, id: int) -> Optional[models.User]:
+        removed = super().remove(db, id=id)
+        user_identity_cache.invalidate_user(id)
+        return removed
+
+    async def aremove(self, db: AsyncSession, *, id: int) -> Optional[models.User]:
+        removed = await super().aremove(db, id=id)
+        user_identity_cache.invalidate_user(id)
+        return removed
 
 
 user = CRUDUser(models.User)
@@ -180,14 +410,17 @@ class CRUDHealthMetric(
     def get_by_user_id(self, db: Session, *, user_id: int) -> Optional[models.HealthMetric]:
         return db.query(models.HealthMetric).filter(models.HealthMetric.user_id == user_id).first()
 
+    async def aget_by_user_id(self, db: AsyncSession, *, user_id: int) -> Optional[models.HealthMetric]:
+        result = await db.execute(select(models.HealthMetric).filter(models.HealthMetric.user_id == user_id).limit(1))
+        return result.scalars().first()
+
     def create_with_user(self, db: Session, *, obj_in: pydantic_schemas.HealthMetricCreate,
                          user_id: int) -> models.HealthMetric:
         obj_in_data = obj_in.dict()
         db_obj = self.model(**obj_in_data, user_id=user_id)
         db.add(db_obj)
         try:
-            db.commit()
-            db.refresh(db_obj)
+            self._commit(db, db_obj)
         except IntegrityError as e:
             db.rollback()
             raise e
@@ -199,22 +432,106 @@ health_metric = CRUDHealthMetric(models.HealthMetric)
 
 # --- Activity CRUD ---
 class CRUDActivity(CRUDBase[models.Activity, pydantic_schemas.ActivityCreate, pydantic_schemas.ActivityUpdate]):
+    """
+    Activities store a simplified GPS track in gps_track (see gps_service.simplify_indices) and, when that
+    dropped any points, the full-resolution track in a separate ActivityTrack row, both binary-encoded
+    (gps_service.encode_track).
+    """
+    listing_time_column = "start_time"
+    # Listings serialize ActivitySummarySchema, so the encoded tracks are never read from the database;
+    # raiseload turns an accidental access into an error instead of a query per row
+    listing_load_options = (
+        defer(models.Activity.gps_track, raiseload=True),
+        defer(models.Activity.gps_data_json, raiseload=True),
+    )
+    # Row key _row_for_user uses to carry the full-resolution PackedTrack; not an Activity column
+    _FULL_TRACK_KEY = "full_track"
+
     def get_multi_by_user(self, db: Session, *, user_id: int, skip: int = 0, limit: int = 100) -> List[models.Activity]:
         return db.query(self.model).filter(models.Activity.user_id == user_id).order_by(
-            models.Activity.start_time.desc()).offset(skip).limit(limit).all()
+            models.Activity.start_time.desc(), models.Activity.id.desc()).offset(skip).limit(limit).all()
+
+    async def aget_multi_by_user(self, db: AsyncSession, *, user_id: int, skip: int = 0,
+                                 limit: int = 100) -> List[models.Activity]:
+        result = await db.execute(select(self.model).filter(models.Activity.user_id == user_id).order_by(
+            models.Activity.start_time.desc(), models.Activity.id.desc()).offset(skip).limit(limit))
+        return list(result.scalars().all())
+
+    def _row_for_user(self, obj_in: pydantic_schemas.ActivityCreate, user_id: int) -> Dict[str, Any]:
+        row = super()._row_for_user(obj_in, user_id)
+        # The DB enum stores member names; the schema carries values ("running")
+        row["activity_type"] = models.ActivityTypeDB(obj_in.activity_type.value)
+        gps_data = row.pop("gps_data", None)
+        if gps_data is not None:
+            row["gps_track"], row[self._FULL_TRACK_KEY] = self._split_track(obj_in.gps_data)
+        return row
+
+    @staticmethod
+    def _split_track(points: List[Any]) -> Tuple[bytes, Optional[gps_service.PackedTrack]]:
+        """(encoded simplified track for the activity, full track for ActivityTrack or None if nothing was dropped)"""
+        track = gps_service.pack_track(points)
+        kept = gps_service.simplify_indices(track, settings.GPS_SIMPLIFY_TOLERANCE_M)
+        if len(kept) == len(track):
+            return gps_service.encode_track(track), None
+        return gps_service.encode_track(track.select(kept)), track
+
+    @staticmethod
+    def _set_full_track(db_obj: models.Activity, track: Optional[gps_service.PackedTrack]):
+        if track is None:
+            db_obj.full_track = None  # delete-orphan removes a previous track
+        elif db_obj.full_track is None:
+            db_obj.full_track = models.ActivityTrack(data=gps_service.encode_track(track), point_count=len(track))
+        else:  # Update in place; replacing the row would violate the unique activity_id before the delete flushes
+            db_obj.full_track.data = gps_service.encode_track(track)
+            db_obj.full_track.point_count = len(track)
 
     def create_with_user(self, db: Session, *, obj_in: pydantic_schemas.ActivityCreate,
                          user_id: int) -> models.Activity:
-        obj_in_data = obj_in.dict()
-        db_obj = self.model(**obj_in_data, user_id=user_id)
-        db.add(db_obj)
-        try:
-            db.commit()
-            db.refresh(db_obj)
-        except IntegrityError as e:
-            db.rollback()
-            raise e
-        return db_obj
+        row = self._row_for_user(obj_in, user_id)
+        full_track = row.pop(self._FULL_TRACK_KEY, None)
+        db_obj = self.model(**row)
+        if full_track is not None:
+            self._set_full_track(db_obj, full_track)
+        return self._insert(db, db_obj)
+
+    def _insert_rows(self, db: Session, rows: List[Dict[str, Any]],
+                     chunk_size: int) -> List[Union[int, SQLAlchemyError]]:
+        full_tracks = [row.pop(self._FULL_TRACK_KEY, None) for row in rows]
+        results = super()._insert_rows(db, rows, chunk_size)
+        track_rows = [
+            {"activity_id": activity_id, "data": gps_service.encode_track(track), "point_count": len(track)}
+            for activity_id, track in zip(results, full_tracks)
+            if track is not None and not isinstance(activity_id, SQLAlchemyError)
+        ]
+        for start in range(0, len(track_rows), max(1, chunk_size)):
+            db.execute(insert(models.ActivityTrack), track_rows[start:start + chunk_size])
+        return results
+
+    def update(
+            self, db: Session, *, db_obj: models.Activity,
+            obj_in: Union[pydantic_schemas.ActivityUpdate, Dict[str, Any]]
+    ) -> models.Activity:
+        update_data = dict(obj_in) if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)
+        gps_data = update_data.pop("gps_data", None)
+        if gps_data is not None:
+            db_obj.gps_track, full_track = self._split_track(gps_data)
+            db_obj.gps_data_json = None
+            self._set_full_track(db_obj, full_track)
+        updated = super().update(db, db_obj=db_obj, obj_in=update_data)
+        if gps_data is not None:
+            # After the commit, so a concurrent route request cannot re-cache the old track
+            route_levels_cache.invalidate(updated.id)
+        return updated
+
+    def remove(self, db: Session, *, id: int) -> Optional[models.Activity]:
+        removed = super().remove(db, id=id)
+        route_levels_cache.invalidate(id)
+        return removed
+
+    @staticmethod
+    def full_track(activity: models.Activity) -> Optional[gps_service.PackedTrack]:
+        """The activity's GPS track at full resolution (its own track when nothing was simplified away)."""
+        return activity.full_track.track if activity.full_track is not None else activity.track
 
 
 activity = CRUDActivity(models.Activity)
@@ -231,6 +548,16 @@ exercise = CRUDExercise(models.Exercise)
 
 # --- Workout CRUD ---
 class CRUDWorkout(CRUDBase[models.Workout, pydantic_schemas.WorkoutCreate, pydantic_schemas.WorkoutUpdate]):
+    listing_time_column = "scheduled_date"
+    # WorkoutSchema nests workout_exercises -> exercise. Listings load both levels for the whole page with
+    # one IN query each; a single workout joins them into one round trip.
+    listing_load_options = (
+        selectinload(models.Workout.workout_exercises_association).selectinload(models.WorkoutExercise.exercise),
+    )
+    detail_load_options = (
+        joinedload(models.Workout.workout_exercises_association).joinedload(models.WorkoutExercise.exercise),
+    )
+
     def create_with_user(self, db: Session, *, obj_in: pydantic_schemas.WorkoutCreate, user_id: int) -> models.Workout:
         workout_data = obj_in.dict(exclude={"workout_exercises"})
         db_workout = models.Workout(**workout_data, user_id=user_id)
@@ -243,16 +570,33 @@ class CRUDWorkout(CRUDBase[models.Workout, pydantic_schemas.WorkoutCreate, pydan
 
         db.add(db_workout)
         try:
-            db.commit()
-            db.refresh(db_workout)
+            self._commit(db, db_workout)
         except IntegrityError as e:
             db.rollback()
             raise e
         return db_workout
 
     def get_multi_by_user(self, db: Session, *, user_id: int, skip: int = 0, limit: int = 100) -> List[models.Workout]:
-        return db.query(self.model).filter(models.Workout.user_id == user_id).order_by(
-            models.Workout.scheduled_date.desc()).offset(skip).limit(limit).all()
+        return db.query(self.model).options(*self.listing_load_options).filter(
+            models.Workout.user_id == user_id).order_by(
+            models.Workout.scheduled_date.desc(), models.Workout.id.desc()).offset(skip).limit(limit).all()
+
+    def get_with_exercises(self, db: Session, *, id: int) -> Optional[models.Workout]:
+        return db.query(self.model).options(*self.detail_load_options).filter(models.Workout.id == id).first()
+
+    def _workout_exercise_query(self, workout_id: int, id: int):
+        # Primary-key lookup scoped to the workout, with the exercise and the owning workout joined in
+        return select(models.WorkoutExercise).options(
+            joinedload(models.WorkoutExercise.exercise), joinedload(models.WorkoutExercise.workout)).filter(
+            models.WorkoutExercise.id == id, models.WorkoutExercise.workout_id == workout_id)
+
+    def get_workout_exercise(self, db: Session, *, workout_id: int, id: int) -> Optional[models.WorkoutExercise]:
+        return db.execute(self._workout_exercise_query(workout_id, id)).scalars().first()
+
+    async def aget_workout_exercise(self, db: AsyncSession, *, workout_id: int,
+                                    id: int) -> Optional[models.WorkoutExercise]:
+        result = await db.execute(self._workout_exercise_query(workout_id, id))
+        return result.scalars().first()
 
     def update(self, db: Session, *, db_obj: models.Workout, obj_in: pydantic_schemas.WorkoutUpdate) -> models.Workout:
         update_data = obj_in.dict(exclude_unset=True, exclude={"workout_exercises"})
@@ -287,8 +631,7 @@ class CRUDWorkout(CRUDBase[models.Workout, pydantic_schemas.WorkoutCreate, pydan
 
         db.add(db_obj)
         try:
-            db.commit()
-            db.refresh(db_obj)
+            self._commit(db, db_obj)
         except IntegrityError as e:
             db.rollback()
             raise e
@@ -301,28 +644,26 @@ workout = CRUDWorkout(models.Workout)
 # --- NutritionLog CRUD ---
 class CRUDNutritionLog(
     CRUDBase[models.NutritionLog, pydantic_schemas.NutritionLogCreate, pydantic_schemas.NutritionLogUpdate]):
+    listing_time_column = "consumed_at"
+
     def get_multi_by_user(self, db: Session, *, user_id: int, date_filter: Optional[datetime.date] = None,
                           skip: int = 0, limit: int = 100) -> List[models.NutritionLog]:
-        query = db.query(self.model).filter(models.NutritionLog.user_id == user_id)
-        if date_filter:
-            start_datetime = datetime.combine(date_filter, datetime.min.time())
-            end_datetime = datetime.combine(date_filter, datetime.max.time())
-            query = query.filter(models.NutritionLog.consumed_at >= start_datetime,
-                                 models.NutritionLog.consumed_at <= end_datetime)
-        return query.order_by(models.NutritionLog.consumed_at.desc()).offset(skip).limit(limit).all()
+        query = db.query(self.model).filter(models.NutritionLog.user_id == user_id, *self.date_filters(date_filter))
+        return query.order_by(models.NutritionLog.consumed_at.desc(), models.NutritionLog.id.desc()).offset(
+            skip).limit(limit).all()
+
+    @staticmethod
+    def date_filters(date_filter: Optional[datetime.date]) -> tuple:
+        if not date_filter:
+            return ()
+        start_datetime = datetime.combine(date_filter, datetime.min.time())
+        end_datetime = datetime.combine(date_filter, datetime.max.time())
+        return (models.NutritionLog.consumed_at >= start_datetime, models.NutritionLog.consumed_at <= end_datetime)
 
     def create_with_user(self, db: Session, *, obj_in: pydantic_schemas.NutritionLogCreate,
                          user_id: int) -> models.NutritionLog:
-        obj_in_data = obj_in.dict()
-        db_obj = self.model(**obj_in_data, user_id=user_id)
-        db.add(db_obj)
-        try:
-            db.commit()
-            db.refresh(db_obj)
-        except IntegrityError as e:
-            db.rollback()
-            raise e
-        return db_obj
+        db_obj = self.model(**self._row_for_user(obj_in, user_id))
+        return self._insert(db, db_obj)
 
 
 nutrition_log = CRUDNutritionLog(models.NutritionLog)
@@ -331,23 +672,17 @@ nutrition_log = CRUDNutritionLog(models.NutritionLog)
 # --- SleepRecord CRUD ---
 class CRUDSleepRecord(
     CRUDBase[models.SleepRecord, pydantic_schemas.SleepRecordCreate, pydantic_schemas.SleepRecordUpdate]):
+    listing_time_column = "start_time"
+
     def get_multi_by_user(self, db: Session, *, user_id: int, skip: int = 0, limit: int = 100) -> List[
         models.SleepRecord]:
         return db.query(self.model).filter(models.SleepRecord.user_id == user_id).order_by(
-            models.SleepRecord.start_time.desc()).offset(skip).limit(limit).all()
+            models.SleepRecord.start_time.desc(), models.SleepRecord.id.desc()).offset(skip).limit(limit).all()
 
     def create_with_user(self, db: Session, *, obj_in: pydantic_schemas.SleepRecordCreate,
                          user_id: int) -> models.SleepRecord:
-        obj_in_data = obj_in.dict()
-        db_obj = self.model(**obj_in_data, user_id=user_id)
-        db.add(db_obj)
-        try:
-            db.commit()
-            db.refresh(db_obj)
-        except IntegrityError as e:
-            db.rollback()
-            raise e
-        return db_obj
+        db_obj = self.model(**self._row_for_user(obj_in, user_id))
+        return self._insert(db, db_obj)
 
 
 sleep_record = CRUDSleepRecord(models.SleepRecord)
@@ -356,6 +691,8 @@ sleep_record = CRUDSleepRecord(models.SleepRecord)
 # --- PaymentRecord CRUD ---
 class CRUDPaymentRecord(
     CRUDBase[models.PaymentRecord, PydanticBaseModel, PydanticBaseModel]):  # Schemas handled by service
+    listing_time_column = "created_at"
+
     def get_by_payment_intent_id(self, db: Session, *, payment_intent_id: str) -> Optional[models.PaymentRecord]:
         return db.query(models.PaymentRecord).filter(
             models.PaymentRecord.payment_intent_id == payment_intent_id).first()
@@ -366,7 +703,7 @@ class CRUDPaymentRecord(
     def get_multi_by_user(self, db: Session, *, user_id: int, skip: int = 0, limit: int = 100) -> List[
         models.PaymentRecord]:
         return db.query(self.model).filter(models.PaymentRecord.user_id == user_id).order_by(
-            models.PaymentRecord.created_at.desc()).offset(skip).limit(limit).all()
+            models.PaymentRecord.created_at.desc(), models.PaymentRecord.id.desc()).offset(skip).limit(limit).all()
 
     def create_payment(self, db: Session, *, user_id: int, amount: float, currency: str,
                        gateway: models.PaymentGatewayDB, status: models.PaymentStatusDB,
@@ -384,8 +721,7 @@ class CRUDPaymentRecord(
         )
         db.add(db_obj)
         try:
-            db.commit()
-            db.refresh(db_obj)
+            self._commit(db, db_obj)
         except IntegrityError as e:
             db.rollback()
             raise e
@@ -398,8 +734,7 @@ class CRUDPaymentRecord(
             db_obj.transaction_id = transaction_id
         db.add(db_obj)
         try:
-            db.commit()
-            db.refresh(db_obj)
+            self._commit(db, db_obj)
         except IntegrityError as e:
             db.rollback()
             raise e
@@ -1,6 +1,16 @@
-from sqlalchemy import create_engine
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.schema import CreateColumn
 from backend.core.config import settings
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
@@ -8,12 +18,56 @@ SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 # For SQLite, connect_args is needed. For PostgreSQL, it's not typically required.
 connect_args = {"check_same_thread": False} if "sqlite" in SQLALCHEMY_DATABASE_URL else {}
 
+
+def _pool_kwargs(database_url: str) -> dict:
+    """Connection pool settings; in-memory SQLite uses a single static connection and takes none of them."""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _is_file_sqlite(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+SQLITE_PRODUCTION_MODE = settings.SQLITE_PRODUCTION_MODE and _is_file_sqlite(SQLALCHEMY_DATABASE_URL)
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    WAL lets readers run alongside the single writer; synchronous=NORMAL only fsyncs at WAL checkpoints
+    (durable across app crashes, may lose the last commits on power loss); busy_timeout waits for the write
+    lock instead of failing with "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA cache_size={-int(settings.SQLITE_CACHE_SIZE_KB)}")  # Negative: size in KiB
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE_BYTES)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args=connect_args,
-    # pool_pre_ping=True # Good for production with PostgreSQL to handle stale connections
+    **_pool_kwargs(SQLALCHEMY_DATABASE_URL),
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if SQLITE_PRODUCTION_MODE:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+# Objects keep their state after commit, so writes needn't be followed by a refresh SELECT (see crud.CRUDBase._commit)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
 
@@ -22,4 +76,293 @@ def get_db() -> Session:
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# --- Async engine (SQLAlchemy asyncio extension) for async routes ---
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def to_async_database_url(database_url: str) -> str:
+    """Maps a sync DATABASE_URL to the same database through an asyncio driver (aiosqlite / asyncpg)."""
+    url = make_url(database_url)
+    backend_name = url.get_backend_name()
+    if backend_name not in _ASYNC_DRIVERS or url.drivername in ("sqlite+aiosqlite", "postgresql+asyncpg"):
+        return database_url
+    return url.set(drivername=_ASYNC_DRIVERS[backend_name]).render_as_string(hide_password=False)
+
+
+SQLALCHEMY_ASYNC_DATABASE_URL = to_async_database_url(SQLALCHEMY_DATABASE_URL)
+
+try:
+    async_engine = create_async_engine(
+        SQLALCHEMY_ASYNC_DATABASE_URL,
+        **_pool_kwargs(SQLALCHEMY_ASYNC_DATABASE_URL),
+    )
+    if SQLITE_PRODUCTION_MODE:
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    # Objects stay usable after commit: expired attributes can't lazy-load outside the event loop's greenlet
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+except ImportError as e:  # e.g. aiosqlite/asyncpg or greenlet not installed
+    async_engine = None
+    AsyncSessionLocal = None
+    print(f"WARNING: Async database engine unavailable ({e}). Install sqlalchemy[asyncio] with aiosqlite or asyncpg.")
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database engine is not available. Install sqlalchemy[asyncio] with aiosqlite or asyncpg.")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def ensure_indexes(bind=None) -> List[str]:
+    """
+    Creates any index declared on the models that the database doesn't have yet and returns their names.
+    create_all() skips tables that already exist, so indexes added to existing tables need this (idempotent).
+    """
+    bind = bind if bind is not None else engine
+    created = []
+    with bind.begin() as connection:
+        existing_tables = set(inspect(connection).get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspect(connection).get_columns(table.name)}
+            existing_indexes = {ix["name"] for ix in inspect(connection).get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                missing_columns = {column.name for column in index.columns} - existing_columns
+                if missing_columns:  # Schema predates the column; needs a migration first
+                    print(f"WARNING: Skipping index {index.name}; {table.name} has no column(s) {sorted(missing_columns)}.")
+                    continue
+                index.create(connection)
+                created.append(index.name)
+    return created
+
+
+def ensure_columns(bind=None) -> List[str]:
+    """
+    Adds columns declared on the models that existing tables don't have yet and returns them as "table.column".
+    Only nullable columns (or ones with a server default) can be added to a table that already has rows;
+    anything else is reported and left for a hand-written migration (idempotent).
+    """
+    bind = bind if bind is not None else engine
+    added = []
+    with bind.begin() as connection:
+        existing_tables = set(inspect(connection).get_table_names())
+        preparer = connection.dialect.identifier_preparer
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspect(connection).get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    print(f"WARNING: Can't add NOT NULL column {table.name}.{column.name} to an existing table; "
+                          f"it needs a migration that backfills it.")
+                    continue
+                column_spec = CreateColumn(column).compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_spec}"))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def ensure_schema(bind=None) -> List[str]:
+    """
+    Idempotent startup migration: creates missing tables, then adds the columns and indexes that tables created
+    by an earlier version lack. Returns a description of each change made.
+    """
+    bind = bind if bind is not None else engine
+    Base.metadata.create_all(bind=bind)
+    changes = [f"column {name}" for name in ensure_columns(bind)]
+    changes += [f"index {name}" for name in ensure_indexes(bind)]
+    return changes
+
+
+_UNIT_OF_WORK_DEPTH = "unit_of_work_depth"
+
+
+def in_unit_of_work(db: Session) -> bool:
+    return db.info.get(_UNIT_OF_WORK_DEPTH, 0) > 0
+
+
+@contextmanager
+def unit_of_work(db: Session) -> Iterator[Session]:
+    """
+    Runs several CRUD writes as one transaction. Inside the block CRUD methods only flush, so ids and
+    defaults are available to later writes; the block commits once on exit and rolls everything back
+    if it raises. Nested blocks join the outermost one.
+    """
+    db.info[_UNIT_OF_WORK_DEPTH] = db.info.get(_UNIT_OF_WORK_DEPTH, 0) + 1
+    try:
+        yield db
+        if db.info[_UNIT_OF_WORK_DEPTH] == 1:
+            db.commit()
+    except Exception:
+        if db.info[_UNIT_OF_WORK_DEPTH] == 1:
+            db.rollback()
+        raise
+    finally:
+        db.info[_UNIT_OF_WORK_DEPTH] -= 1
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(bind=None, max_queries: Optional[int] = None) -> Iterator[QueryCounter]:
+    """
+    Records the SQL statements executed on `bind` (default: the sync engine; an async engine works too)
+    inside the block. With `max_queries`, raises AssertionError on exit if more were issued, so a test can
+    pin an endpoint's query budget and catch N+1 regressions. Counts every connection of the engine.
+    """
+    bind = bind if bind is not None else engine
+    target = getattr(bind, "sync_engine", bind)
+    counter = QueryCounter()
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    event.listen(target, "before_cursor_execute", _record)
+    try:
+        yield counter
+    finally:
+        event.remove(target, "before_cursor_execute", _record)
+    if max_queries is not None and counter.count > max_queries:
+        raise AssertionError(f"Expected at most {max_queries} queries, got {counter.count}:\n"
+                             + "\n".join(counter.statements))
+
+
+# --- SQLite writer queue ---
+class SQLiteWriteQueue:
+    """
+    Serializes writes through one thread and session, group-committing them.
+
+    SQLite allows a single writer at a time, so concurrent request threads committing on their own
+    connections queue up on the write lock (or fail with "database is locked") and each pays an fsync.
+    Here the writer drains up to `max_batch` queued jobs, or whatever arrives within `batch_window_s`,
+    runs each inside its own savepoint (a failing job rolls back alone and gets its exception), and
+    commits the batch once. Reads keep using their own sessions and run concurrently under WAL.
+
+    Jobs receive the writer session and should flush rather than commit. Returned ORM objects are
+    detached after the commit with their loaded attributes intact.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], max_batch: int = 64, batch_window_s: float = 0.002):
+        self._session_factory = session_factory
+        self.max_batch = max(1, max_batch)
+        self.batch_window_s = max(0.0, batch_window_s)
+        self._jobs: "queue.Queue[Optional[Tuple[Callable[[Session], Any], Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        # Metrics
+        self.jobs_committed = 0
+        self.jobs_failed = 0
+        self.commits = 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, job: Callable[[Session], Any]) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        self._jobs.put((job, future))
+        return future
+
+    def run(self, job: Callable[[Session], Any]) -> Any:
+        """Submits `job` and blocks until its batch is committed. Re-raises the job's or the commit's error."""
+        return self.submit(job).result()
+
+    def _next_batch(self) -> List[Tuple[Callable[[Session], Any], Future]]:
+        first_job = self._jobs.get()
+        if first_job is None:
+            return []
+        batch = [first_job]
+        deadline = time.monotonic() + self.batch_window_s
+        while len(batch) < self.max_batch:
+            try:
+                job = self._jobs.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if job is None:
+                self._jobs.put(None)  # Finish this batch, then stop
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        session = self._session_factory()
+        try:
+            while True:
+                batch = self._next_batch()
+                if not batch:
+                    return
+                self._commit_batch(session, batch)
+        finally:
+            session.close()
+
+    def _commit_batch(self, session: Session, batch: List[Tuple[Callable[[Session], Any], Future]]):
+        succeeded: List[Tuple[Future, Any]] = []
+        for job, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with session.begin_nested():
+                    result = job(session)
+                succeeded.append((future, result))
+            except Exception as e:
+                self.jobs_failed += 1
+                future.set_exception(e)
+
+        try:
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            self.jobs_failed += len(succeeded)
+            for future, _ in succeeded:
+                future.set_exception(e)
+            return
+        finally:
+            session.expunge_all()
+
+        self.commits += 1
+        self.jobs_committed += len(succeeded)
+        for future, result in succeeded:
+            future.set_result(result)
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self._jobs.qsize(),
+            "jobs_committed": self.jobs_committed,
+            "jobs_failed": self.jobs_failed,
+            "commits": self.commits,
+            "avg_jobs_per_commit": round(self.jobs_committed / self.commits, 2) if self.commits else 0.0,
+        }
+
+    def stop(self):
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+sqlite_write_queue: Optional[SQLiteWriteQueue] = None
+if SQLITE_PRODUCTION_MODE and settings.SQLITE_WRITE_QUEUE:
+    sqlite_write_queue = SQLiteWriteQueue(
+        sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine),
+        max_batch=settings.SQLITE_WRITE_BATCH_SIZE,
+        batch_window_s=settings.SQLITE_WRITE_BATCH_WINDOW_MS / 1000,
+    )
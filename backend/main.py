@@ -5,18 +5,23 @@ from streamlit import status
 from fastapi import FastAPI, Depends, HTTPException, status as http_status,  APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from backend.database import engine, Base, get_db
+from backend.database import engine, get_db, ensure_schema, sqlite_write_queue
 from backend.routers import (
     auth, users, activities, workouts,
     nutrition, sleep, payments, advanced
 )
 from backend.core.config import settings
 from backend.core.firebase_init import initialize_firebase_app # Import the initializer
+from backend.core.firebase_tokens import firebase_signing_keys
+from backend.services.cv_worker_service import cv_worker_pool
+from backend.core.password_hashing import password_hasher
 
 # Create database tables if they don't exist
 # This should ideally be handled by a migration tool like Alembic in production
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Create database tables, and add the columns and indexes introduced since an existing database was created
+_schema_changes = ensure_schema(engine)
+if _schema_changes:
+    print(f"INFO: Updated database schema: {', '.join(_schema_changes)}")
 
 # Initialize Firebase Admin SDK on startup
 @asynccontextmanager
@@ -25,9 +30,19 @@ async def lifespan(app: FastAPI):
     print("INFO: Application startup...")
     if not initialize_firebase_app():
         print("CRITICAL: Firebase Admin SDK failed to initialize. Some auth features may not work.")
+    else:
+        firebase_signing_keys.start()  # Keeps ID token signing certs warm off the request path
+    if settings.CV_WARM_UP_ON_STARTUP:
+        cv_model_status = await cv_worker_pool.warm_up()
+        print(f"INFO: CV workers warmed up. Pose model state: {cv_model_status['state']}")
     # Any other startup logic
     yield
     # Shutdown
+    cv_worker_pool.shutdown()
+    firebase_signing_keys.stop()
+    password_hasher.shutdown()
+    if sqlite_write_queue is not None:
+        sqlite_write_queue.stop()  # Commits whatever is still queued
     print("INFO: Application shutdown.")
 
 app = FastAPI(
@@ -56,6 +71,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"], # Allows all standard methods
     allow_headers=["*"], # Allows all headers
+    expose_headers=["X-Next-Cursor"], # Keyset pagination cursor on list endpoints
 )
 
 # Include routers
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, JSON, Index, LargeBinary
 from sqlalchemy import Enum as SAEnum  # To avoid conflict with Python's enum
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, synonym
 from backend.database import Base
 from datetime import datetime
 import enum  # Python's enum for defining choices
@@ -86,12 +86,64 @@ class Activity(Base):
     avg_heart_rate = Column(Integer, nullable=True)
     max_heart_rate = Column(Integer, nullable=True)
     hr_zones = Column(JSON, nullable=True)
-    gps_data = Column(JSON,
-                      nullable=True)  # List of {"lat": float, "lon": float, "timestamp": str, "altitude": float, "accuracy": float}
+    # Derived from gps_data when the activity is saved (activity_service.process_activity_data_for_saving)
+    elevation_gain_m = Column(Float, nullable=True)
+    elevation_loss_m = Column(Float, nullable=True)
+    moving_time_minutes = Column(Float, nullable=True)
+    splits = Column(JSON, nullable=True)  # List of {"split": int, "distance_km", "duration_s", "pace_min_per_km"}
+    # Simplified GPS track in gps_service's binary format (encode_track); decoded only when .track/.gps_data is read
+    gps_track = Column(LargeBinary, nullable=True)
+    # Tracks saved before gps_track existed: list of {"lat", "lon", "timestamp": str, "altitude", "accuracy"}
+    gps_data_json = Column("gps_data", JSON(none_as_null=True), nullable=True)  # Cleared to SQL NULL, not JSON null
     notes = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Per-user listings filter on user_id and order by start_time DESC, id DESC (crud get_page_by_user)
+    __table_args__ = (Index("ix_activities_user_id_start_time", "user_id", start_time.desc(), id.desc()),)
+
     user = relationship("User", back_populates="activities")
+    # Loaded only when accessed; listings and the default activity response use the simplified track
+    full_track = relationship("ActivityTrack", back_populates="activity", uselist=False, cascade="all, delete-orphan")
+
+    @property
+    def track(self):
+        """The simplified GPS track as a gps_service.PackedTrack of NumPy arrays, or None."""
+        from backend.services import gps_service  # Avoid importing services when models load
+        if self.gps_track is not None:
+            return gps_service.decode_track(self.gps_track)
+        if self.gps_data_json:
+            return gps_service.pack_track(self.gps_data_json)
+        return None
+
+    @property
+    def gps_data(self):
+        """The simplified GPS track as GPSDataPoint-shaped dicts (ActivitySchema.gps_data)."""
+        from backend.services import gps_service
+        track = self.track
+        return gps_service.track_to_points(track) if track is not None else None
+
+    @gps_data.setter
+    def gps_data(self, points):
+        from backend.services import gps_service
+        self.gps_track = gps_service.encode_track(gps_service.pack_track(points)) if points is not None else None
+        self.gps_data_json = None
+
+
+class ActivityTrack(Base):
+    """Cold storage for an activity's full-resolution GPS track; Activity.gps_track holds the simplified one."""
+    __tablename__ = "activity_tracks"
+    id = Column(Integer, primary_key=True, index=True)
+    activity_id = Column(Integer, ForeignKey("activities.id"), nullable=False, unique=True)
+    point_count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)  # gps_service.encode_track format
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    activity = relationship("Activity", back_populates="full_track")
+
+    @property
+    def track(self):
+        from backend.services import gps_service
+        return gps_service.decode_track(self.data)
 
 
 class Exercise(Base):
@@ -110,7 +162,7 @@ class Exercise(Base):
 class WorkoutExercise(Base):  # Association object for Workout and Exercise
     __tablename__ = "workout_exercises"
     id = Column(Integer, primary_key=True, index=True)
-    workout_id = Column(Integer, ForeignKey("workouts.id"), nullable=False)
+    workout_id = Column(Integer, ForeignKey("workouts.id"), nullable=False, index=True)
     exercise_id = Column(Integer, ForeignKey("exercises.id"), nullable=False)
     sets = Column(Integer, nullable=True)
     reps = Column(String, nullable=True)
@@ -135,10 +187,14 @@ class Workout(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     pose_estimation_feedback = Column(JSON, nullable=True)  # Store CV feedback, perhaps keyed by WorkoutExercise.id
 
+    # Per-user listings filter on user_id and order by scheduled_date DESC, id DESC (crud get_page_by_user)
+    __table_args__ = (Index("ix_workouts_user_id_scheduled_date", "user_id", scheduled_date.desc(), id.desc()),)
+
     user = relationship("User", back_populates="workouts")
     # This association allows a Workout to have many Exercises with specific details for that workout instance
     workout_exercises_association = relationship("WorkoutExercise", back_populates="workout",
                                                  cascade="all, delete-orphan")
+    workout_exercises = synonym("workout_exercises_association")  # Name WorkoutSchema serializes
 
 
 class NutritionLog(Base):
@@ -156,6 +212,9 @@ class NutritionLog(Base):
     meal_type = Column(String, nullable=True)
     consumed_at = Column(DateTime, default=datetime.utcnow)
 
+    # Per-user listings filter on user_id and order by consumed_at DESC, id DESC (crud get_page_by_user)
+    __table_args__ = (Index("ix_nutrition_logs_user_id_consumed_at", "user_id", consumed_at.desc(), id.desc()),)
+
     user = relationship("User", back_populates="nutrition_logs")
 
 
@@ -175,6 +234,9 @@ class SleepRecord(Base):
     notes = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)  # Added for tracking when record was created
 
+    # Per-user listings filter on user_id and order by start_time DESC, id DESC (crud get_page_by_user)
+    __table_args__ = (Index("ix_sleep_records_user_id_start_time", "user_id", start_time.desc(), id.desc()),)
+
     user = relationship("User", back_populates="sleep_records")
 
 
@@ -192,6 +254,9 @@ class PaymentRecord(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Per-user listings filter on user_id and order by created_at DESC, id DESC (crud get_page_by_user)
+    __table_args__ = (Index("ix_payment_records_user_id_created_at", "user_id", created_at.desc(), id.desc()),)
+
     user = relationship("User", back_populates="payment_records")
 
 # --- Conceptual Future Models (Not fully implemented in CRUD/routes for brevity) ---
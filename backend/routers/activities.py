@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from backend import crud, models, schemas as pydantic_schemas, schemas
 from backend.database import get_db
 from backend.core.security import get_current_active_user
 from backend.services import activity_service  # For processing GPS data, etc.
+from backend.services import bulk_service
+from backend.services import gps_service
+from backend.services import polyline_service
 
 router = APIRouter()
 
@@ -22,20 +26,39 @@ def create_activity_for_current_user(
     return crud.activity.create_with_user(db=db, obj_in=processed_activity_in, user_id=current_user.id)
 
 
-@router.get("/", response_model=List[pydantic_schemas.ActivitySchema])
+@router.post("/bulk", response_model=pydantic_schemas.BulkCreateResponse)
+def create_activities_bulk_for_current_user(
+        items: List[Dict[str, Any]] = Body(..., description="ActivityCreate objects, e.g. a wearable's history"),
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_active_user)
+):
+    return bulk_service.bulk_create_for_user(db, crud.activity, items, pydantic_schemas.ActivityCreate,
+                                             current_user.id, prepare=activity_service.process_activity_data_for_saving)
+
+
+@router.get("/", response_model=List[pydantic_schemas.ActivitySummarySchema])
 def read_activities_for_current_user(
-        skip: int = 0,
+        response: Response,
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page; omit for the first page"),
+        skip: int = Query(default=0, ge=0, deprecated=True, description="Offset paging; ignored when cursor is set"),
         limit: int = Query(default=20, ge=1, le=100),
         db: Session = Depends(get_db),
         current_user: models.User = Depends(get_current_active_user)
 ):
-    activities = crud.activity.get_multi_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+    try:
+        activities, next_cursor = crud.activity.get_page_by_user(
+            db, user_id=current_user.id, cursor=cursor, skip=skip, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return activities
 
 
 @router.get("/{activity_id}", response_model=pydantic_schemas.ActivitySchema)
 def read_single_activity(
         activity_id: int,
+        full_resolution: bool = Query(False, description="Return the GPS track as recorded instead of simplified"),
         db: Session = Depends(get_db),
         current_user: models.User = Depends(get_current_active_user)
 ):
@@ -45,9 +68,75 @@ def read_single_activity(
     if db_activity.user_id != current_user.id:
         # Could also return 404 to obscure existence if preferred over 403
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this activity")
+    full_track = crud.activity.full_track(db_activity) if full_resolution else None
+    if full_track is not None:
+        return {**pydantic_schemas.ActivitySchema.from_orm(db_activity).dict(),
+                "gps_data": gps_service.track_to_points(full_track)}
     return db_activity
 
 
+@router.get("/{activity_id}/track", response_model=List[pydantic_schemas.GPSDataPoint])
+def read_activity_track(
+        activity_id: int,
+        resolution_m: float = Query(0, ge=0, description="Simplify so no dropped point is further than this many "
+                                                         "meters from the returned line; 0 returns every point"),
+        bbox: Optional[str] = Query(None, description="Only points inside min_lon,min_lat,max_lon,max_lat"),
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_active_user)
+):
+    db_activity = crud.activity.get(db, id=activity_id)
+    if db_activity is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Activity not found")
+    if db_activity.user_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this activity")
+    try:
+        bounds = gps_service.parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Downsample from the full-resolution track so resolution_m below the stored simplification still applies
+    track = crud.activity.full_track(db_activity)
+    if track is None:
+        return []
+    if resolution_m > 0:
+        track = track.select(gps_service.simplify_indices(track, resolution_m))
+    if bounds is not None:  # After simplifying, so the kept points follow the route's shape, not the box edge
+        track = gps_service.clip_to_bbox(track, bounds)
+    return StreamingResponse(gps_service.iter_points_json(track), media_type="application/json")
+
+
+@router.get("/{activity_id}/polyline", response_model=pydantic_schemas.ActivityPolylineResponse,
+            responses={200: {"content": {"application/octet-stream": {}}}})
+def read_activity_polyline(
+        activity_id: int,
+        zoom: int = Query(14, ge=polyline_service.MIN_ZOOM, le=polyline_service.MAX_ZOOM,
+                          description="Web map zoom level the route is simplified for"),
+        route_format: Literal["polyline", "binary"] = Query(
+            "polyline", alias="format",
+            description="polyline: Google encoded polyline in JSON; binary: little-endian int32 lat/lon pairs "
+                        "in 1e-7 degrees (point count in X-Point-Count)"),
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_active_user)
+):
+    db_activity = crud.activity.get(db, id=activity_id)
+    if db_activity is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Activity not found")
+    if db_activity.user_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this activity")
+
+    # Simplified from the full-resolution track; the stored one is too coarse for the closest zoom levels
+    route = polyline_service.route_levels_cache.get(
+        activity_id, zoom, route_format, lambda: crud.activity.full_track(db_activity))
+    if route is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Activity has no GPS track")
+    payload, point_count = route
+    if route_format == polyline_service.ROUTE_FORMAT_BINARY:
+        return Response(content=payload, media_type="application/octet-stream",
+                        headers={"X-Point-Count": str(point_count)})
+    return {"polyline": payload, "precision": polyline_service.POLYLINE_PRECISION, "zoom": zoom,
+            "point_count": point_count}
+
+
 @router.put("/{activity_id}", response_model=pydantic_schemas.ActivitySchema)
 def update_user_activity(
         activity_id: int,
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Body, UploadFile, File, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Any, Optional, Dict
 from datetime import datetime
 import os  # For file operations with genetic data (conceptual)
 
 from backend import models, schemas as pydantic_schemas, crud
-from backend.database import get_db
+from backend.database import get_db, get_async_db
 from backend.core.security import get_current_active_user
 # Import conceptual services
 from backend.services import (
@@ -25,7 +26,7 @@ router = APIRouter()
 @router.post("/ai/predictive-health", response_model=pydantic_schemas.AIPredictionResponse)
 async def get_predictive_health_insights_endpoint(  # Renamed for clarity
         request_data: pydantic_schemas.AIPredictionRequest,
-        db: Session = Depends(get_db),  # DB might be needed if service fetches more user data
+        db: AsyncSession = Depends(get_async_db),  # DB might be needed if service fetches more user data
         current_user: models.User = Depends(get_current_active_user)
 ):
     # Ensure request_data.user_id matches current_user.id or handle admin access
@@ -36,10 +37,10 @@ async def get_predictive_health_insights_endpoint(  # Renamed for clarity
 
     # If recent_activity_data or current_health_metrics are not in request, fetch them
     if not request_data.recent_activity_data:
-        activities_db = crud.activity.get_multi_by_user(db, user_id=current_user.id, limit=20)
+        activities_db = await crud.activity.aget_multi_by_user(db, user_id=current_user.id, limit=20)
         request_data.recent_activity_data = [pydantic_schemas.ActivitySchema.from_orm(a) for a in activities_db]
     if not request_data.current_health_metrics:
-        health_metrics_db = crud.health_metric.get_by_user_id(db, user_id=current_user.id)
+        health_metrics_db = await crud.health_metric.aget_by_user_id(db, user_id=current_user.id)
         if health_metrics_db:
             request_data.current_health_metrics = pydantic_schemas.HealthMetricSchema.from_orm(health_metrics_db)
 
@@ -211,10 +212,10 @@ async def register_data_on_blockchain_endpoint(
              response_model=pydantic_schemas.ActivityCarbonFootprintResponse)
 async def track_activity_carbon_footprint_endpoint(
         request_data: pydantic_schemas.ActivityCarbonFootprintRequest,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: models.User = Depends(get_current_active_user)
 ):
-    db_activity = crud.activity.get(db, id=request_data.activity_id)
+    db_activity = await crud.activity.aget(db, id=request_data.activity_id)
     if not db_activity or db_activity.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Activity not found or not authorized")
 
@@ -2,12 +2,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
+from typing import Any, Dict
 
 from backend import crud, models, schemas as pydantic_schemas
 from backend.core import security
 from backend.core.firebase_init import get_current_firebase_user
-from backend.database import get_db
+from backend.database import get_db, get_async_db
 from backend.core.config import settings
 from backend.services import user_service
 
@@ -15,7 +17,7 @@ router = APIRouter()
 
 
 @router.post("/firebase-signin", response_model=pydantic_schemas.UserSchema)
-async def firebase_signin(
+def firebase_signin(  # Plain def: the health metrics update below is blocking DB I/O
         current_user: models.User = Depends(get_current_firebase_user),
         # This dependency handles token verification and user creation/retrieval
         db: Session = Depends(get_db)  # Ensure db session is available if health metrics update is needed
@@ -90,13 +92,16 @@ def register_user(user_in: pydantic_schemas.UserCreate, db: Session = Depends(ge
 
 
 @router.post("/login", response_model=pydantic_schemas.Token)
-def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(db: AsyncSession = Depends(get_async_db),
+                                 form_data: OAuth2PasswordRequestForm = Depends()):
+    # Async so a login waiting on the bcrypt pool holds no threadpool thread (see security.password_hasher)
     print(f"DEBUG: Login attempt for username (email): '{form_data.username}'")
     print(f"DEBUG: Password received for login (length): {len(form_data.password) if form_data.password else 0}")
 
-    user = crud.user.get_by_email(db, email=form_data.username)
+    user = await crud.user.aget_by_email(db, email=form_data.username)
 
     if not user:
+        security.password_hasher.record_login(False)
         print(f"DEBUG: Login failed. User not found for email: '{form_data.username}'")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -108,7 +113,10 @@ def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2Passw
     print(
         f"DEBUG: Stored hashed password (first 10 chars): {user.hashed_password[:10] if user.hashed_password else 'None'}")
 
-    is_password_correct = security.verify_password(form_data.password, user.hashed_password)
+    is_password_correct, new_hash = await security.password_hasher.averify_and_update(
+        form_data.password, user.hashed_password
+    )
+    security.password_hasher.record_login(is_password_correct)
     print(f"DEBUG: Password verification result for '{form_data.username}': {is_password_correct}")
 
     if not is_password_correct:
@@ -123,6 +131,10 @@ def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2Passw
         print(f"DEBUG: Login failed. User '{form_data.username}' is inactive.")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user account.")
 
+    if new_hash:  # Stored hash used an outdated bcrypt cost
+        await crud.user.aupdate(db, db_obj=user, obj_in={"hashed_password": new_hash})
+        print(f"DEBUG: Rehashed password for user '{user.email}' at the current bcrypt cost.")
+
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
@@ -131,6 +143,12 @@ def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2Passw
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+@router.get("/metrics", response_model=Dict[str, Any])
+def get_password_hashing_metrics(current_user: models.User = Depends(security.get_current_active_user)):
+    """Queue depth, wait and hash latency of the bcrypt pool, plus login counts and logins in the last minute."""
+    return security.password_hasher.metrics()
+
+
 @router.get("/me", response_model=pydantic_schemas.UserSchema)
 async def read_users_me(current_user: models.User = Depends(security.get_current_active_user)):
     return current_user
@@ -1,13 +1,13 @@
 # backend/routers/nutrition.py
-from fastapi import APIRouter, Depends, HTTPException, Query, status, Path
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response, status, Path
 from sqlalchemy.orm import Session
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Dict
 from datetime import datetime as dt_datetime  # Alias to avoid conflict with schema's datetime
 
 from backend import crud, models, schemas as pydantic_schemas
 from backend.database import get_db
 from backend.core.security import get_current_active_user
-from backend.services import nutrition_service
+from backend.services import bulk_service, nutrition_service
 
 router = APIRouter()
 
@@ -21,9 +21,21 @@ def log_nutrition_item_for_current_user(
     return crud.nutrition_log.create_with_user(db=db, obj_in=nutrition_log_in, user_id=current_user.id)
 
 
+@router.post("/bulk", response_model=pydantic_schemas.BulkCreateResponse)
+def log_nutrition_items_bulk_for_current_user(
+        items: List[Dict[str, Any]] = Body(..., description="NutritionLogCreate objects"),
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_active_user)
+):
+    return bulk_service.bulk_create_for_user(db, crud.nutrition_log, items, pydantic_schemas.NutritionLogCreate,
+                                             current_user.id)
+
+
 @router.get("/", response_model=List[pydantic_schemas.NutritionLogSchema])
 def read_nutrition_logs_for_current_user(
-        skip: int = 0,
+        response: Response,
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page; omit for the first page"),
+        skip: int = Query(default=0, ge=0, deprecated=True, description="Offset paging; ignored when cursor is set"),
         limit: int = Query(default=20, ge=1, le=100),
         date_filter_str: Optional[str] = Query(None, alias="date", description="Filter by date YYYY-MM-DD"),
         db: Session = Depends(get_db),
@@ -36,8 +48,14 @@ def read_nutrition_logs_for_current_user(
         except ValueError:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date format. Use YYYY-MM-DD.")
 
-    logs = crud.nutrition_log.get_multi_by_user(db, user_id=current_user.id, date_filter=date_obj, skip=skip,
-                                                limit=limit)
+    try:
+        logs, next_cursor = crud.nutrition_log.get_page_by_user(
+            db, user_id=current_user.id, cursor=cursor, skip=skip, limit=limit,
+            filters=crud.nutrition_log.date_filters(date_obj))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return logs
 
 
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Header, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Header, Response, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Any, Dict, Optional
 import json # For webhook payload parsing
@@ -153,10 +153,18 @@ async def check_crypto_payment_status_endpoint( # Renamed for clarity
 # --- Payment History for Current User ---
 @router.get("/history", response_model=List[pydantic_schemas.PaymentRecordSchema])
 def get_user_payment_history(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page; omit for the first page"),
+    skip: int = Query(default=0, ge=0, deprecated=True, description="Offset paging; ignored when cursor is set"),
     limit: int = Query(default=10, ge=1, le=50),
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_active_user)
 ):
-    records = crud.payment_record.get_multi_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+    try:
+        records, next_cursor = crud.payment_record.get_page_by_user(
+            db, user_id=current_user.id, cursor=cursor, skip=skip, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return records
\ No newline at end of file
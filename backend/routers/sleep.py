@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime as dt_datetime  # Alias
 
 from backend import crud, models, schemas as pydantic_schemas
 from backend.database import get_db
 from backend.core.security import get_current_active_user
+from backend.services import bulk_service
 
 router = APIRouter()
 
@@ -17,15 +18,20 @@ def _calculate_total_duration(start_time: dt_datetime, end_time: dt_datetime) ->
     return None
 
 
+def _prepare_sleep_record(sleep_in: pydantic_schemas.SleepRecordCreate) -> pydantic_schemas.SleepRecordCreate:
+    # Calculate total duration if not provided but start/end times are
+    if sleep_in.total_duration_minutes is None and sleep_in.start_time and sleep_in.end_time:
+        sleep_in.total_duration_minutes = _calculate_total_duration(sleep_in.start_time, sleep_in.end_time)
+    return sleep_in
+
+
 @router.post("/", response_model=pydantic_schemas.SleepRecordSchema, status_code=status.HTTP_201_CREATED)
 def create_sleep_record_for_current_user(
         sleep_in: pydantic_schemas.SleepRecordCreate,
         db: Session = Depends(get_db),
         current_user: models.User = Depends(get_current_active_user)
 ):
-    # Calculate total duration if not provided but start/end times are
-    if sleep_in.total_duration_minutes is None and sleep_in.start_time and sleep_in.end_time:
-        sleep_in.total_duration_minutes = _calculate_total_duration(sleep_in.start_time, sleep_in.end_time)
+    sleep_in = _prepare_sleep_record(sleep_in)
 
     # Placeholder for smart rest/recovery suggestions based on this sleep record
     # e.g., if sleep_score is low, suggest lighter activity next day via a notification system (not implemented here)
@@ -36,14 +42,32 @@ def create_sleep_record_for_current_user(
     return crud.sleep_record.create_with_user(db=db, obj_in=sleep_in, user_id=current_user.id)
 
 
+@router.post("/bulk", response_model=pydantic_schemas.BulkCreateResponse)
+def create_sleep_records_bulk_for_current_user(
+        items: List[Dict[str, Any]] = Body(..., description="SleepRecordCreate objects"),
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_active_user)
+):
+    return bulk_service.bulk_create_for_user(db, crud.sleep_record, items, pydantic_schemas.SleepRecordCreate,
+                                             current_user.id, prepare=_prepare_sleep_record)
+
+
 @router.get("/", response_model=List[pydantic_schemas.SleepRecordSchema])
 def read_sleep_records_for_current_user(
-        skip: int = 0,
+        response: Response,
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page; omit for the first page"),
+        skip: int = Query(default=0, ge=0, deprecated=True, description="Offset paging; ignored when cursor is set"),
         limit: int = Query(default=10, ge=1, le=30),  # Typically users view sleep over a month
         db: Session = Depends(get_db),
         current_user: models.User = Depends(get_current_active_user)
 ):
-    sleep_records = crud.sleep_record.get_multi_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+    try:
+        sleep_records, next_cursor = crud.sleep_record.get_page_by_user(
+            db, user_id=current_user.id, cursor=cursor, skip=skip, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return sleep_records
 
 
@@ -13,7 +13,7 @@ router = APIRouter()
 
 @router.get("/me/full-profile",
             response_model=pydantic_schemas.UserSchema)  # Example of getting user with health metrics
-async def read_user_me_with_health_metrics(
+def read_user_me_with_health_metrics(  # Plain def: may write health metrics through the sync session
         db: Session = Depends(get_db),
         current_user: models.User = Depends(security.get_current_active_user)
 ):
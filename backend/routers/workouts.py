@@ -1,16 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status, Body, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, Body, UploadFile, File, \
+    WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
+from sqlalchemy.orm.attributes import flag_modified
+from typing import List, Dict, Any, Optional, Tuple, Literal
 from datetime import datetime
+import asyncio
+import base64
+import os
+import time
+import shutil
+import tempfile
 from pydantic import BaseModel  # For simple request bodies not in main schemas
 
 from backend import crud, models, schemas as pydantic_schemas
-from backend.database import get_db
-from backend.core.security import get_current_active_user
+from backend.database import SessionLocal, get_db, get_async_db
+from backend.core.config import settings
+from backend.core.security import get_current_active_user, get_user_from_token
 from backend.services import workout_service, cv_service
+from backend.services.cv_worker_service import cv_worker_pool
 
 router = APIRouter()
 
+UPLOAD_SPOOL_CHUNK_BYTES = 1024 * 1024
+
 
 # --- Exercises (Admin/Shared resource, or could be user-specific) ---
 @router.post("/exercises", response_model=pydantic_schemas.ExerciseSchema, status_code=status.HTTP_201_CREATED)
@@ -44,6 +59,46 @@ def get_exercise_definition(exercise_id: int, db: Session = Depends(get_db)):
     return db_exercise
 
 
+@router.get("/cv/metrics", response_model=Dict[str, Any])
+def get_cv_worker_metrics(current_user: models.User = Depends(get_current_active_user)):
+    """
+    Queue depth, wait times and throughput of the CV form-analysis worker pool; keypoint cache hit/miss
+    counters summed over the worker processes (each keeps its own memory tier; the disk tier is shared) and
+    of this API process, which runs live form feedback; and the state and measured per-frame latency of each
+    pose model, aggregated live over the worker processes and for this process. Each analysis response also
+    reports the model it used and that model's latency in the worker.
+    """
+    return {
+        **cv_worker_pool.metrics(),
+        "keypoint_cache": {
+            "cv_workers": cv_worker_pool.keypoint_cache_stats(),
+            "api_process": cv_service.keypoint_cache.stats() if cv_service.keypoint_cache else None,
+        },
+        "pose_models": {
+            "cv_workers": cv_worker_pool.pose_model_latency(),
+            "api_process": cv_service.pose_model_registry.status()["variants"],
+        },
+    }
+
+
+@router.get("/cv/ready", response_model=Dict[str, Any])
+def get_cv_readiness():
+    """
+    Readiness of pose estimation, without loading anything: the model state in the CV worker processes
+    (known once they have started) and in this API process (used by live form feedback). 503 until ready.
+    """
+    worker_status = cv_worker_pool.worker_model_status
+    api_process_status = cv_service.pose_model_registry.status()
+    readiness = {
+        "ready": bool(worker_status and worker_status["state"] == "ready") or api_process_status["state"] == "ready",
+        "cv_workers": worker_status or {"state": "not_started"},
+        "api_process": api_process_status,
+    }
+    if not readiness["ready"]:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=readiness)
+    return readiness
+
+
 # --- Workouts for current user ---
 @router.post("/", response_model=pydantic_schemas.WorkoutSchema, status_code=status.HTTP_201_CREATED)
 def create_workout_plan_for_current_user(
@@ -56,12 +111,20 @@ def create_workout_plan_for_current_user(
 
 @router.get("/", response_model=List[pydantic_schemas.WorkoutSchema])
 def read_workout_plans_for_current_user(
-        skip: int = 0,
+        response: Response,
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page; omit for the first page"),
+        skip: int = Query(default=0, ge=0, deprecated=True, description="Offset paging; ignored when cursor is set"),
         limit: int = Query(default=10, ge=1, le=50),
         db: Session = Depends(get_db),
         current_user: models.User = Depends(get_current_active_user)
 ):
-    workouts = crud.workout.get_multi_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+    try:
+        workouts, next_cursor = crud.workout.get_page_by_user(
+            db, user_id=current_user.id, cursor=cursor, skip=skip, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return workouts
 
 
@@ -71,7 +134,7 @@ def read_single_workout_plan(
         db: Session = Depends(get_db),
         current_user: models.User = Depends(get_current_active_user)
 ):
-    db_workout = crud.workout.get(db, id=workout_id)
+    db_workout = crud.workout.get_with_exercises(db, id=workout_id)
     if db_workout is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workout plan not found")
     if db_workout.user_id != current_user.id:
@@ -86,7 +149,7 @@ def update_user_workout_plan(
         db: Session = Depends(get_db),
         current_user: models.User = Depends(get_current_active_user)
 ):
-    db_workout = crud.workout.get(db, id=workout_id)
+    db_workout = crud.workout.get_with_exercises(db, id=workout_id)
     if db_workout is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workout plan not found")
     if db_workout.user_id != current_user.id:
@@ -155,39 +218,33 @@ def get_ai_workout_recommendations(
 
 
 # --- CV Pose Estimation Feedback ---
-@router.post(
-    "/{workout_id}/workout-exercise/{workout_exercise_id}/analyze-form",
-    response_model=pydantic_schemas.PoseEstimationFeedback
-)
-async def analyze_exercise_form_with_cv(
-        workout_id: int,
-        workout_exercise_id: int,  # This is the ID of the models.WorkoutExercise instance
-        request_data: pydantic_schemas.PoseEstimationRequest,  # Contains exercise_type and base64 frames
-        db: Session = Depends(get_db),
-        current_user: models.User = Depends(get_current_active_user)
-):
-    db_workout = crud.workout.get(db, id=workout_id)
-    if not db_workout or db_workout.user_id != current_user.id:
+def _check_workout_exercise_for_cv(target_wo_exercise_assoc: Optional[models.WorkoutExercise],
+                                   workout_exercise_id: int,
+                                   current_user: models.User) -> Tuple[models.Workout, models.WorkoutExercise]:
+    if target_wo_exercise_assoc and target_wo_exercise_assoc.workout.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workout not found or not authorized")
 
-    target_wo_exercise_assoc: Optional[models.WorkoutExercise] = None
-    for wea in db_workout.workout_exercises_association:
-        if wea.id == workout_exercise_id:
-            target_wo_exercise_assoc = wea
-            break
-
     if not target_wo_exercise_assoc or not target_wo_exercise_assoc.exercise:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Workout Exercise with ID {workout_exercise_id} not found in this workout, or exercise definition missing.")
+    return target_wo_exercise_assoc.workout, target_wo_exercise_assoc
 
-    # Use exercise name from DB if exercise_type in request_data is just a fallback
-    exercise_name_for_cv = target_wo_exercise_assoc.exercise.name
 
-    analysis_result_dict = cv_service.analyze_exercise_form_from_frames(
-        video_frames_base64=request_data.video_frames_base64,
-        exercise_type=exercise_name_for_cv  # Use name from DB for consistency
-    )
+def _get_workout_exercise_for_cv(db: Session, workout_id: int, workout_exercise_id: int,
+                                 current_user: models.User) -> Tuple[models.Workout, models.WorkoutExercise]:
+    wo_exercise = crud.workout.get_workout_exercise(db, workout_id=workout_id, id=workout_exercise_id)
+    return _check_workout_exercise_for_cv(wo_exercise, workout_exercise_id, current_user)
 
+
+async def _aget_workout_exercise_for_cv(db: AsyncSession, workout_id: int, workout_exercise_id: int,
+                                        current_user: models.User) -> Tuple[models.Workout, models.WorkoutExercise]:
+    wo_exercise = await crud.workout.aget_workout_exercise(db, workout_id=workout_id, id=workout_exercise_id)
+    return _check_workout_exercise_for_cv(wo_exercise, workout_exercise_id, current_user)
+
+
+def _record_pose_feedback(db_workout: models.Workout, workout_exercise_id: int,
+                          analysis_result_dict: Dict[str, Any]) -> pydantic_schemas.PoseEstimationFeedback:
+    """Adds the analysis to the workout's feedback JSON (not yet committed) and builds the response."""
     if "error" in analysis_result_dict:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=analysis_result_dict["error"])
 
@@ -202,15 +259,303 @@ async def analyze_exercise_form_with_cv(
     db_workout.pose_estimation_feedback[str(workout_exercise_id)] = feedback_list_for_exercise[
                                                                     -3:]  # Keep last 3 analyses
 
-    from sqlalchemy.orm.attributes import flag_modified
     flag_modified(db_workout, "pose_estimation_feedback")  # Important for JSON field changes
 
+    return pydantic_schemas.PoseEstimationFeedback(
+        exercise_type_analyzed=analysis_result_dict["exercise_type_analyzed"],
+        frames_processed=analysis_result_dict["frames_processed_successfully"],
+        form_score=analysis_result_dict["overall_form_score"],
+        corrective_feedback=analysis_result_dict["corrective_feedback"],
+        key_metrics_summary=analysis_result_dict.get("key_metrics_summary"),
+        frames_per_second=analysis_result_dict.get("frames_per_second"),
+        frames_from_cache=analysis_result_dict.get("frames_from_cache"),
+        rep_count=analysis_result_dict.get("rep_count"),
+        reps=analysis_result_dict.get("reps"),
+        pose_model=analysis_result_dict.get("pose_model"),
+        inference_ms_per_frame=analysis_result_dict.get("inference_ms_per_frame"),
+    )
+
+
+def _authorize_live_form_session(token: str, workout_id: int, workout_exercise_id: int) -> str:
+    """
+    Authenticates a live form session and returns the exercise name. Runs in a session of its own, closed
+    before the socket is accepted, so a live session holds no pooled connection while it streams.
+    """
+    db = SessionLocal()
+    try:
+        current_user = get_user_from_token(db, token)
+        if not current_user.is_active:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+        _, target_wo_exercise_assoc = _get_workout_exercise_for_cv(db, workout_id, workout_exercise_id, current_user)
+        return target_wo_exercise_assoc.exercise.name
+    finally:
+        db.close()
+
+
+def _save_pose_feedback(workout_id: int, workout_exercise_id: int,
+                        analysis_result_dict: Dict[str, Any]) -> pydantic_schemas.PoseEstimationFeedback:
+    """Stores a live session's summary in a short-lived session, reloading the workout's current feedback."""
+    db = SessionLocal()
+    try:
+        db_workout = crud.workout.get(db, id=workout_id)
+        if db_workout is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workout not found")
+        feedback = _record_pose_feedback(db_workout, workout_exercise_id, analysis_result_dict)
+        try:
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail=f"Failed to save CV feedback: {e}")
+        return feedback
+    finally:
+        db.close()
+
+
+async def _asave_pose_feedback(db: AsyncSession, db_workout: models.Workout, workout_exercise_id: int,
+                               analysis_result_dict: Dict[str, Any]) -> pydantic_schemas.PoseEstimationFeedback:
+    feedback = _record_pose_feedback(db_workout, workout_exercise_id, analysis_result_dict)
     try:
-        db.commit()
-        db.refresh(db_workout)
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Failed to save CV feedback: {e}")
+    return feedback
 
-    return pydantic_schemas.PoseEstimationFeedback(**analysis_result_dict)
\ No newline at end of file
+
+def _spool_upload_to_disk(upload: UploadFile, target_path: str):
+    upload.file.seek(0)
+    with open(target_path, "wb") as target_file:
+        shutil.copyfileobj(upload.file, target_file, length=UPLOAD_SPOOL_CHUNK_BYTES)
+
+
+@router.post(
+    "/{workout_id}/workout-exercise/{workout_exercise_id}/analyze-form",
+    response_model=pydantic_schemas.PoseEstimationFeedback
+)
+async def analyze_exercise_form_with_cv(
+        workout_id: int,
+        workout_exercise_id: int,  # This is the ID of the models.WorkoutExercise instance
+        request_data: pydantic_schemas.PoseEstimationRequest,  # Contains exercise_type and base64 frames
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_active_user)
+):
+    db_workout, target_wo_exercise_assoc = await _aget_workout_exercise_for_cv(db, workout_id, workout_exercise_id,
+                                                                               current_user)
+
+    # Use exercise name from DB if exercise_type in request_data is just a fallback
+    exercise_name_for_cv = target_wo_exercise_assoc.exercise.name
+
+    # CPU-bound: runs in the CV process pool so the event loop keeps serving other requests
+    analysis_result_dict = await cv_worker_pool.submit(
+        cv_service.analyze_exercise_form_from_frames,
+        video_frames_base64=request_data.video_frames_base64,
+        exercise_type=exercise_name_for_cv,  # Use name from DB for consistency
+        source_fps=request_data.source_fps,
+        model_policy=request_data.inference_policy,
+    )
+    return await _asave_pose_feedback(db, db_workout, workout_exercise_id, analysis_result_dict)
+
+
+@router.post(
+    "/{workout_id}/workout-exercise/{workout_exercise_id}/analyze-form/upload",
+    response_model=pydantic_schemas.PoseEstimationFeedback
+)
+async def analyze_exercise_form_from_upload(
+        workout_id: int,
+        workout_exercise_id: int,
+        frames: Optional[List[UploadFile]] = File(None, description="Raw JPEG/PNG frames, in order"),
+        video: Optional[UploadFile] = File(None, description="A single video clip, decoded server-side"),
+        video_frame_stride: int = Query(default=1, ge=1, le=30, description="Analyze every Nth video frame"),
+        source_fps: Optional[float] = Query(default=None, gt=0, description="Capture rate of the image frames"),
+        inference_policy: Literal["interactive", "batch"] = Query(
+            default="batch", description="'interactive' for the fastest pose model, 'batch' for the most accurate"),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Multipart alternative to analyze-form: frames are sent as binary files instead of base64 JSON.
+    Uploads are spooled to disk and the CV worker reads and analyzes them one frame at a time.
+    """
+    if not frames and not video:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Provide image files in 'frames' and/or a video file in 'video'.")
+
+    db_workout, target_wo_exercise_assoc = await _aget_workout_exercise_for_cv(db, workout_id, workout_exercise_id,
+                                                                               current_user)
+
+    with tempfile.TemporaryDirectory(prefix="cv-upload-") as spool_dir:
+        frame_paths: List[str] = []
+        for frame_index, frame_upload in enumerate(frames or []):
+            frame_path = os.path.join(spool_dir, f"frame_{frame_index:06d}")
+            await run_in_threadpool(_spool_upload_to_disk, frame_upload, frame_path)
+            frame_paths.append(frame_path)
+
+        video_path: Optional[str] = None
+        if video:
+            video_suffix = os.path.splitext(video.filename or "")[1] or ".mp4"
+            video_path = os.path.join(spool_dir, f"clip{video_suffix}")
+            await run_in_threadpool(_spool_upload_to_disk, video, video_path)
+
+        analysis_result_dict = await cv_worker_pool.submit(
+            cv_service.analyze_exercise_form_from_files,
+            exercise_type=target_wo_exercise_assoc.exercise.name,
+            frame_paths=frame_paths,
+            video_path=video_path,
+            video_frame_stride=video_frame_stride,
+            source_fps=source_fps,
+            model_policy=inference_policy,
+        )
+
+    return await _asave_pose_feedback(db, db_workout, workout_exercise_id, analysis_result_dict)
+
+
+@router.websocket("/{workout_id}/workout-exercise/{workout_exercise_id}/live-form")
+async def live_exercise_form_feedback(
+        websocket: WebSocket,
+        workout_id: int,
+        workout_exercise_id: int,
+        token: str = Query(..., description="JWT access token (browsers cannot set headers on WebSockets)"),
+):
+    """
+    Real-time form feedback. The client streams frames as binary messages (JPEG/PNG bytes) or as
+    WebSocketMessage JSON {"type": "frame", "payload": {"image_base64": ...}} and sends {"type": "end"}
+    to receive and store the session summary.
+
+    Only the newest frame is kept while inference is busy; older ones are dropped, as are frames that
+    waited longer than CV_LIVE_LATENCY_BUDGET_MS, so a fast camera never builds a backlog.
+
+    The summary is only stored when the client ends the session with "end". If the client disconnects
+    first, the partial summary is discarded (and logged), so an interrupted set never replaces stored
+    feedback. If analysis fails mid-session, the client gets an error message and the socket is closed
+    with code 1011; nothing is stored.
+
+    No database session is held while the socket is open: authorization and saving the summary each use
+    their own, so long-lived sessions don't tie up the connection pool.
+    """
+    try:
+        exercise_name = await run_in_threadpool(_authorize_live_form_session, token, workout_id,
+                                                workout_exercise_id)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail)[:120])
+        return
+
+    await websocket.accept()
+    # Live feedback always takes the fastest model; the first live session loads the models
+    engine = await run_in_threadpool(cv_service.get_pose_engine, cv_service.POSE_POLICY_INTERACTIVE)
+    if not engine or not engine.is_ready:
+        await websocket.send_json(pydantic_schemas.WebSocketMessage(
+            type="error", payload={"detail": "Pose estimation model not loaded."}).dict())
+        await websocket.close(code=1011)
+        return
+
+    accumulator = cv_service.FormAnalysisAccumulator(exercise_name)
+    latency_budget_s = settings.CV_LIVE_LATENCY_BUDGET_MS / 1000
+    latest_frame: Dict[str, Any] = {}  # Single-slot mailbox: {"frame": ..., "received_at": ...}
+    frame_available = asyncio.Event()
+    session_ended = asyncio.Event()
+    frames_dropped = 0
+    session_started_at = time.perf_counter()
+
+    async def receive_frames():
+        nonlocal frames_dropped
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            frame = message.get("bytes")
+            if frame is None and message.get("text"):
+                try:
+                    incoming = pydantic_schemas.WebSocketMessage.parse_raw(message["text"])
+                except Exception:
+                    await websocket.send_json(pydantic_schemas.WebSocketMessage(
+                        type="error", payload={"detail": "Expected binary frame or WebSocketMessage JSON."}).dict())
+                    continue
+                if incoming.type == "end":
+                    session_ended.set()
+                    frame_available.set()
+                    return
+                frame = incoming.payload.get("image_base64")
+            if not frame:
+                continue
+            if latest_frame:
+                frames_dropped += 1  # Inference hasn't picked up the previous frame yet
+            latest_frame.update(frame=frame, received_at=time.perf_counter())
+            frame_available.set()
+
+    async def process_frames():
+        nonlocal frames_dropped
+        while True:
+            await frame_available.wait()
+            frame_available.clear()
+            if not latest_frame:
+                if session_ended.is_set():
+                    return
+                continue
+            frame, received_at = latest_frame.pop("frame"), latest_frame.pop("received_at")
+            if time.perf_counter() - received_at > latency_budget_s:
+                frames_dropped += 1
+                continue
+            if isinstance(frame, str):
+                try:
+                    frame = base64.b64decode(frame)
+                except Exception:
+                    frame = b""
+
+            inference_result = (await asyncio.wrap_future(engine.submit([frame])))[0]
+            frame_analysis = accumulator.add(inference_result, frame_time=received_at - session_started_at)
+            latency_ms = (time.perf_counter() - received_at) * 1000
+            await websocket.send_json(pydantic_schemas.WebSocketMessage(type="form_feedback", payload={
+                "frame_index": accumulator.frames_input - 1,
+                "feedback": frame_analysis["feedback"] if frame_analysis else [],
+                "form_score_frame": frame_analysis["form_score_frame"] if frame_analysis else None,
+                "angles": frame_analysis["angles"] if frame_analysis else {},
+                "running_form_score": round(accumulator.overall_form_score, 2),
+                "rep_count": len(accumulator.reps),
+                "running_metrics": accumulator.key_metrics_summary(),
+                "frames_processed": accumulator.frames_successfully_processed,
+                "frames_dropped": frames_dropped,
+                "latency_ms": round(latency_ms, 1),
+                "within_latency_budget": latency_ms <= settings.CV_LIVE_LATENCY_BUDGET_MS,
+            }).dict())
+            if session_ended.is_set() and not latest_frame:
+                return
+
+    receiver = asyncio.create_task(receive_frames())
+    processor = asyncio.create_task(process_frames())
+    # Either task failing (a disconnect, an inference error, a send on a dead socket) ends the session at
+    # once; waiting on the receiver alone would leave a failed processor unnoticed until the client sends "end"
+    done, pending = await asyncio.wait({receiver, processor}, return_when=asyncio.FIRST_EXCEPTION)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    failure = next((task.exception() for task in (receiver, processor) if task in done and task.exception()), None)
+    if isinstance(failure, WebSocketDisconnect):
+        print(f"INFO: Live form session for workout exercise {workout_exercise_id} disconnected before 'end'; "
+              f"discarding partial summary ({accumulator.frames_successfully_processed} frames analyzed, "
+              f"{frames_dropped} dropped).")
+        return
+    if failure is not None:
+        print(f"ERROR: Live form session for workout exercise {workout_exercise_id} failed: {failure!r}")
+        try:
+            await websocket.send_json(pydantic_schemas.WebSocketMessage(
+                type="error", payload={"detail": "Form analysis failed; session ended."}).dict())
+            await websocket.close(code=1011)
+        except Exception:
+            pass  # The socket is already gone
+        return
+
+    elapsed_s = time.perf_counter() - session_started_at
+    analysis_result_dict = accumulator.summary(
+        frames_per_second=accumulator.frames_input / elapsed_s if elapsed_s > 0 else None)
+    analysis_result_dict["frames_dropped"] = frames_dropped
+    try:
+        feedback = await run_in_threadpool(_save_pose_feedback, workout_id, workout_exercise_id,
+                                           analysis_result_dict)
+        await websocket.send_json(pydantic_schemas.WebSocketMessage(
+            type="form_summary", payload={**feedback.dict(), "frames_dropped": frames_dropped}).dict())
+    except HTTPException as e:
+        await websocket.send_json(pydantic_schemas.WebSocketMessage(
+            type="error", payload={"detail": e.detail}).dict())
+    await websocket.close()
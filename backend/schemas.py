@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, HttpUrl, ConfigDict # Import ConfigDict
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Union, Literal
 from datetime import datetime
 import enum
 
@@ -96,7 +96,7 @@ class GPSDataPoint(BaseModel):
     altitude: Optional[float] = None
     accuracy: Optional[float] = None
 
-class ActivityBase(BaseModel):
+class ActivitySummaryBase(BaseModel):
     activity_type: ActivityTypeSchema
     start_time: datetime
     end_time: Optional[datetime] = None
@@ -106,9 +106,15 @@ class ActivityBase(BaseModel):
     avg_heart_rate: Optional[int] = Field(None, ge=0)
     max_heart_rate: Optional[int] = Field(None, ge=0)
     hr_zones: Optional[Dict[str, float]] = None # e.g., {"zone1_time_mins": 10, "zone2_time_mins": 20}
-    gps_data: Optional[List[GPSDataPoint]] = None
+    elevation_gain_m: Optional[float] = Field(None, ge=0)
+    elevation_loss_m: Optional[float] = Field(None, ge=0)
+    moving_time_minutes: Optional[float] = Field(None, ge=0)
+    splits: Optional[List[Dict[str, Any]]] = None # Per-km splits, derived from gps_data when not given
     notes: Optional[str] = None
 
+class ActivityBase(ActivitySummaryBase):
+    gps_data: Optional[List[GPSDataPoint]] = None
+
 class ActivityCreate(ActivityBase):
     pass
 
@@ -122,6 +128,17 @@ class ActivitySchema(OrmBaseModel, ActivityBase):
     user_id: int
     created_at: datetime
 
+class ActivitySummarySchema(OrmBaseModel, ActivitySummaryBase): # Listings; the track is at /activities/{id}/track
+    id: int
+    user_id: int
+    created_at: datetime
+
+class ActivityPolylineResponse(BaseModel):
+    polyline: str # Google encoded polyline
+    precision: int # Decimal places of the encoded coordinates
+    zoom: int
+    point_count: int
+
 # --- Exercise Schemas ---
 class ExerciseBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=100)
@@ -231,6 +248,18 @@ class SleepRecordSchema(OrmBaseModel, SleepRecordBase):
     id: int
     user_id: int
 
+# --- Bulk Ingestion Schemas ---
+class BulkItemResult(BaseModel):
+    index: int # Position in the request array
+    status: Literal["created", "invalid", "failed"]
+    id: Optional[int] = None
+    errors: List[str] = []
+
+class BulkCreateResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
 # --- Payment Schemas ---
 class PaymentIntentCreate(BaseModel):
     amount: float = Field(..., gt=0, description="Amount in major currency unit, e.g., USD dollars")
@@ -282,6 +311,16 @@ class Message(BaseModel):
 class PoseEstimationRequest(BaseModel):
     exercise_type: str
     video_frames_base64: List[str] = Field(..., min_items=1) # List of base64 encoded image frames
+    source_fps: Optional[float] = Field(None, gt=0) # Capture rate of the frames, for rep tempo
+    inference_policy: Literal["interactive", "batch"] = "batch" # Fastest vs most accurate pose model
+
+class RepMetrics(BaseModel):
+    rep: int
+    depth_angle: float # Smallest tracked joint angle reached during the rep, in degrees
+    range_of_motion: float # Degrees between the smallest and largest tracked angle
+    eccentric_s: float # Lowering phase duration
+    concentric_s: float # Lifting phase duration
+    form_score: float = Field(ge=0, le=1)
 
 class PoseEstimationFeedback(BaseModel):
     exercise_type_analyzed: str
@@ -289,6 +328,12 @@ class PoseEstimationFeedback(BaseModel):
     form_score: float = Field(ge=0, le=1)
     corrective_feedback: List[str]
     key_metrics_summary: Optional[Dict[str, Any]] = None # e.g., min/max angles
+    frames_per_second: Optional[float] = None # Inference throughput for this request
+    frames_from_cache: Optional[int] = None # Frames whose keypoints came from the keypoint cache
+    rep_count: Optional[int] = None # None when the exercise has no spec to segment reps with
+    reps: Optional[List[RepMetrics]] = None
+    pose_model: Optional[str] = None # Pose model variant that produced the keypoints
+    inference_ms_per_frame: Optional[float] = None # That model's recent per-frame inference latency
 
 # --- External API Schemas (for responses from nutrition_service) ---
 class USDANutrient(BaseModel):
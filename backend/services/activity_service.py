@@ -1,4 +1,6 @@
 from backend import models, schemas
+from backend.core.config import settings
+from backend.services import gps_service
 from typing import Optional, Dict, Any, List
 
 
@@ -19,40 +21,23 @@ def recognize_workout_type_from_sensor_data(sensor_data: Dict[str, Any]) -> Opti
 
 
 # --- GPS Data Processing ---
-def simplify_gps_track(gps_data: List[schemas.GPSDataPoint], tolerance_meters: float = 10.0) -> List[
+def simplify_gps_track(gps_data: List[schemas.GPSDataPoint], tolerance_meters: Optional[float] = None) -> List[
     schemas.GPSDataPoint]:
     """
-    CONCEPTUAL: Simplifies a GPS track using an algorithm like Ramer-Douglas-Peucker.
-    This is useful for reducing storage size and improving rendering performance.
-    The actual implementation is non-trivial.
+    Simplifies a GPS track with Ramer-Douglas-Peucker: no dropped point is further than `tolerance_meters`
+    (default GPS_SIMPLIFY_TOLERANCE_M) from the simplified line. Typical 1 Hz tracks shrink ~10x.
     """
-    if len(gps_data) < 3:
-        return gps_data  # Not enough points to simplify
-    print(f"Conceptual: Simplifying GPS track with {len(gps_data)} points. Tolerance: {tolerance_meters}m.")
-    # Placeholder: return first, middle, and last point for extreme simplification
-    # return [gps_data[0], gps_data[len(gps_data)//2], gps_data[-1]] if len(gps_data) > 2 else gps_data
-    return gps_data  # For now, return original
+    if tolerance_meters is None:
+        tolerance_meters = settings.GPS_SIMPLIFY_TOLERANCE_M
+    return gps_service.simplify_points(gps_data, tolerance_meters)
 
 
-def calculate_gps_distance_and_elevation(gps_data: List[schemas.GPSDataPoint]) -> Dict[str, float]:
+def calculate_gps_distance_and_elevation(gps_data: List[schemas.GPSDataPoint]) -> Dict[str, Any]:
     """
-    CONCEPTUAL: Calculates total distance and elevation gain/loss from a list of GPS points.
-    Requires Haversine formula for distance and summing altitude differences.
+    Calculates distance, elevation gain/loss, elapsed and moving time, and per-km splits from GPS points.
+    Fixes with poor accuracy are dropped and small altitude changes are ignored (see gps_service).
     """
-    total_distance_km = 0.0
-    total_elevation_gain_m = 0.0
-    total_elevation_loss_m = 0.0
-    # ... implementation using Haversine and altitude diffs ...
-    print(f"Conceptual: Calculating distance/elevation for GPS track with {len(gps_data)} points.")
-    # Mock result for now
-    if len(gps_data) > 1:
-        total_distance_km = len(gps_data) * 0.1  # Mock 100m per point
-        total_elevation_gain_m = len(gps_data) * 1.0  # Mock 1m gain per point
-    return {
-        "total_distance_km": round(total_distance_km, 2),
-        "total_elevation_gain_m": round(total_elevation_gain_m, 2),
-        "total_elevation_loss_m": round(total_elevation_loss_m, 2)
-    }
+    return gps_service.compute_track_metrics(gps_service.pack_track(gps_data))
 
 
 def process_activity_data_for_saving(activity_in: schemas.ActivityCreate) -> schemas.ActivityCreate:
@@ -68,15 +53,21 @@ def process_activity_data_for_saving(activity_in: schemas.ActivityCreate) -> sch
         processed_activity.duration_minutes = round(duration_delta.total_seconds() / 60, 2)
 
     if processed_activity.gps_data:
-        # Simplify GPS track (conceptual)
-        # processed_activity.gps_data = simplify_gps_track(processed_activity.gps_data)
+        # The track stays at full resolution here: crud.activity stores the simplified track on the
+        # activity and the full one in ActivityTrack. Metrics below use the full track.
 
-        # Calculate distance and elevation from GPS if not manually provided or to override
-        # This is a good place to do it if distance_km is None
+        # Fill in distance and the other track metrics from GPS unless they were provided
+        gps_metrics = calculate_gps_distance_and_elevation(processed_activity.gps_data)
         if processed_activity.distance_km is None or processed_activity.distance_km == 0:
-            gps_metrics = calculate_gps_distance_and_elevation(processed_activity.gps_data)
-            processed_activity.distance_km = gps_metrics.get("total_distance_km", 0.0)
-            # Could also update elevation gain/loss fields if they exist on the model/schema
+            processed_activity.distance_km = gps_metrics["total_distance_km"]
+        if processed_activity.elevation_gain_m is None:
+            processed_activity.elevation_gain_m = gps_metrics["total_elevation_gain_m"]
+        if processed_activity.elevation_loss_m is None:
+            processed_activity.elevation_loss_m = gps_metrics["total_elevation_loss_m"]
+        if processed_activity.moving_time_minutes is None:
+            processed_activity.moving_time_minutes = round(gps_metrics["moving_time_s"] / 60, 2)
+        if processed_activity.splits is None:
+            processed_activity.splits = gps_metrics["splits"]
 
     # Conceptual: Workout type recognition if raw sensor data was part of input
     # if hasattr(processed_activity, 'raw_sensor_data') and processed_activity.raw_sensor_data:
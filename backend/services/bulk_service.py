@@ -0,0 +1,66 @@
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from backend import schemas
+from backend.core.config import settings
+
+
+def _validation_messages(e: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in err['loc']) or 'item'}: {err['msg']}" for err in e.errors()]
+
+
+def bulk_create_for_user(
+        db: Session,
+        crud_obj: Any,
+        items: List[Dict[str, Any]],
+        create_schema: Type[BaseModel],
+        user_id: int,
+        prepare: Optional[Callable[[BaseModel], BaseModel]] = None,
+) -> schemas.BulkCreateResponse:
+    """
+    Validates every item against `create_schema` (then `prepare`, e.g. derived fields) and inserts the valid
+    ones through `crud_obj.create_many` in one transaction. Invalid or rejected items don't fail the request;
+    each gets its own result, in request order.
+    """
+    if len(items) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"At most {settings.BULK_MAX_ITEMS} items per bulk request.")
+
+    results: List[schemas.BulkItemResult] = []
+    valid_indexes: List[int] = []
+    valid_objs: List[BaseModel] = []
+    for index, item in enumerate(items):
+        try:
+            obj_in = create_schema.parse_obj(item)
+            if prepare is not None:
+                obj_in = prepare(obj_in)
+        except ValidationError as e:
+            results.append(schemas.BulkItemResult(index=index, status="invalid", errors=_validation_messages(e)))
+            continue
+        except (TypeError, ValueError) as e:
+            results.append(schemas.BulkItemResult(index=index, status="invalid", errors=[str(e)]))
+            continue
+        valid_indexes.append(index)
+        valid_objs.append(obj_in)
+
+    if valid_objs:
+        try:
+            inserted = crud_obj.create_many(db, objs_in=valid_objs, user_id=user_id,
+                                            chunk_size=settings.BULK_INSERT_CHUNK_SIZE)
+        except SQLAlchemyError as e:
+            print(f"ERROR: Bulk insert into {crud_obj.model.__tablename__} failed: {e}")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Bulk insert failed.")
+        for index, outcome in zip(valid_indexes, inserted):
+            if isinstance(outcome, SQLAlchemyError):
+                results.append(schemas.BulkItemResult(index=index, status="failed",
+                                                      errors=[str(getattr(outcome, "orig", None) or outcome)]))
+            else:
+                results.append(schemas.BulkItemResult(index=index, status="created", id=outcome))
+
+    results.sort(key=lambda result: result.index)
+    created = sum(1 for result in results if result.status == "created")
+    return schemas.BulkCreateResponse(created=created, failed=len(results) - created, results=results)
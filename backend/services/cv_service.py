@@ -1,33 +1,66 @@
 # backend/services/cv_service.py
-import cv2
 import numpy as np
 import base64
-from typing import List, Dict, Any, Tuple, Optional
-import math
+import hashlib
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator, NamedTuple, Union, Deque
 import os  # For checking model file existence
 
-# Attempt to import TFLite runtime
-try:
-    import tflite_runtime.interpreter as tflite
-
-    print("INFO: TensorFlow Lite runtime (tflite_runtime) imported successfully.")
-except ImportError:
-    try:
-        import tensorflow.lite as tflite  # Fallback for full TensorFlow if tflite_runtime is not installed
-
-        print("INFO: TensorFlow Lite (from tensorflow.lite) imported successfully.")
-    except ImportError:
-        tflite = None
-        print(
-            "CRITICAL WARNING: TensorFlow Lite runtime (tflite_runtime or from tensorflow.lite) NOT FOUND. CV service will be NON-FUNCTIONAL.")
+# OpenCV and the TFLite runtime are heavy to import and only needed for form analysis, so they are
+# loaded on first use (see _import_cv2 / _import_tflite) rather than by every API worker at startup.
+cv2 = None
+tflite = None
+_cv_import_lock = threading.Lock()
+
+
+def _import_cv2():
+    global cv2
+    if cv2 is None:
+        with _cv_import_lock:
+            if cv2 is None:
+                import cv2 as opencv
+                cv2 = opencv
+    return cv2
+
+
+def _import_tflite():
+    global tflite
+    if tflite is None:
+        with _cv_import_lock:
+            if tflite is None:
+                # Attempt to import TFLite runtime
+                try:
+                    import tflite_runtime.interpreter as tflite_module
+
+                    print("INFO: TensorFlow Lite runtime (tflite_runtime) imported successfully.")
+                except ImportError:
+                    try:
+                        import tensorflow.lite as tflite_module  # Fallback for full TensorFlow if tflite_runtime is not installed
+
+                        print("INFO: TensorFlow Lite (from tensorflow.lite) imported successfully.")
+                    except ImportError:
+                        tflite_module = None
+                        print(
+                            "CRITICAL WARNING: TensorFlow Lite runtime (tflite_runtime or from tensorflow.lite) NOT FOUND. CV service will be NON-FUNCTIONAL.")
+                tflite = tflite_module
+    return tflite
 
 from backend.core.config import settings
 
 # --- Pose Estimation Model Constants (Example for MoveNet SinglePose Lightning) ---
-MODEL_INPUT_SIZE = (192, 192)  # (height, width) for MoveNet Lightning. Thunder is (256,256)
+MODEL_INPUT_SIZE = (192, 192)  # Fallback (height, width) only; each model's real input size is read from the model
+POSE_POLICY_INTERACTIVE = "interactive"  # Lowest measured latency, for live feedback
+POSE_POLICY_BATCH = "batch"  # Most accurate model, for recorded clips and reprocessing
 NUM_KEYPOINTS = 17  # MoveNet returns 17 keypoints
 MIN_CROP_KEYPOINT_SCORE = 0.2
 MIN_KEYPOINT_VISIBILITY_SCORE = 0.3  # Threshold for considering a keypoint valid for angle calculations
+ANALYSIS_CHUNK_FRAMES = 256  # Frames analyzed per vectorized pass when streaming
+REP_SMOOTHING_ALPHA = 0.5  # EMA weight of the newest sample when smoothing the rep-tracking angle
 
 KEYPOINT_DICT = {
     'nose': 0, 'left_eye': 1, 'right_eye': 2, 'left_ear': 3, 'right_ear': 4,
@@ -38,16 +71,20 @@ KEYPOINT_DICT = {
 
 
 class PoseEstimator:
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
         self.model_path = model_path
+        self.num_threads = num_threads
         self.interpreter = None
         self.input_details = None
         self.output_details = None
         self.is_input_float = False
         self.model_input_height = MODEL_INPUT_SIZE[0]  # Default, will be overridden
         self.model_input_width = MODEL_INPUT_SIZE[1]  # Default, will be overridden
+        self._allocated_batch_size = 1
+        self.supports_batching: Optional[bool] = None  # Unknown until a batch > 1 is attempted
 
-        if tflite is None:
+        _import_cv2()
+        if _import_tflite() is None:
             print(
                 f"ERROR: TFLite runtime not available. PoseEstimator cannot be initialized for model: {self.model_path}")
             return
@@ -59,7 +96,7 @@ class PoseEstimator:
 
         try:
             print(f"INFO: Attempting to load TFLite model from: {self.model_path}")
-            self.interpreter = tflite.Interpreter(model_path=self.model_path)
+            self.interpreter = tflite.Interpreter(model_path=self.model_path, num_threads=num_threads)
             self.interpreter.allocate_tensors()
             self.input_details = self.interpreter.get_input_details()
             self.output_details = self.interpreter.get_output_details()
@@ -77,10 +114,13 @@ class PoseEstimator:
             print(f"ERROR: Failed to load TFLite model from '{self.model_path}': {e}")
             self.interpreter = None  # Ensure interpreter is None on failure
 
-    def _preprocess_image(self, image_bytes: bytes) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+    def _preprocess_image(self, image: Union[bytes, np.ndarray]) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+        """Accepts encoded image bytes (JPEG/PNG) or an already decoded BGR frame, e.g. from a video."""
         try:
-            image_np = np.frombuffer(image_bytes, np.uint8)
-            image_bgr = cv2.imdecode(image_np, cv2.IMREAD_COLOR)
+            if isinstance(image, np.ndarray):
+                image_bgr = image
+            else:
+                image_bgr = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
             if image_bgr is None:
                 print("Warning: Could not decode image bytes.")
                 return None
@@ -102,6 +142,27 @@ class PoseEstimator:
             print(f"Error during image preprocessing: {e}")
             return None
 
+    def _resize_input_batch(self, batch_size: int) -> bool:
+        """Resizes the input tensor's batch dimension. MoveNet SinglePose exports are usually fixed at 1."""
+        if batch_size == self._allocated_batch_size:
+            return True
+        try:
+            input_shape = list(self.input_details[0]['shape'])
+            input_shape[0] = batch_size
+            self.interpreter.resize_tensor_input(self.input_details[0]['index'], input_shape)
+            self.interpreter.allocate_tensors()
+            self.input_details = self.interpreter.get_input_details()
+            self.output_details = self.interpreter.get_output_details()
+            self._allocated_batch_size = batch_size
+            return True
+        except Exception as e:
+            print(f"INFO: Model '{self.model_path}' does not accept batch size {batch_size} ({e}). "
+                  f"Falling back to per-frame invocation.")
+            self.supports_batching = False
+            if batch_size != 1:
+                self._resize_input_batch(1)
+            return False
+
     def run_inference(self, image_bytes: bytes) -> Optional[np.ndarray]:
         if not self.interpreter:
             print("Warning: Pose estimator model not loaded or initialized correctly. Cannot run inference.")
@@ -111,266 +172,1110 @@ class PoseEstimator:
         if preprocess_result is None:
             return None
         input_data, _ = preprocess_result
-
-        self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
-        self.interpreter.invoke()
-
-        keypoints_with_scores = self.interpreter.get_tensor(self.output_details[0]['index'])
-        return keypoints_with_scores.squeeze() if keypoints_with_scores.ndim > 2 else keypoints_with_scores
-
-
-pose_estimator_instance: Optional[PoseEstimator] = None
-if tflite is not None:
-    model_file_path_from_settings = settings.POSE_ESTIMATION_MODEL_PATH
-    if model_file_path_from_settings and model_file_path_from_settings != "backend/models/movenet_lightning.tflite" and model_file_path_from_settings != "models/posenet_mobilenet_v1_100_257x257_multi_kpt_stripped.tflite":  # Check not default placeholder
-        print(f"INFO: POSE_ESTIMATION_MODEL_PATH is set to: '{model_file_path_from_settings}'")
-        pose_estimator_instance = PoseEstimator(model_file_path_from_settings)
-    else:
-        # Attempt to load with the new default if placeholder was used
-        new_default_path = "backend/models/movenet_lightning.tflite"  # Consistent with README
-        print(
-            f"INFO: POSE_ESTIMATION_MODEL_PATH is using a default or placeholder. Attempting to load from '{new_default_path}' if it exists.")
-        if os.path.exists(new_default_path):
-            pose_estimator_instance = PoseEstimator(new_default_path)
+        return self.run_inference_on_batch(input_data)[0]
+
+    def run_inference_on_batch(self, input_batch: np.ndarray) -> List[np.ndarray]:
+        """
+        Runs inference on already preprocessed input of shape [B, height, width, 3] and returns
+        one (NUM_KEYPOINTS, 3) array per frame. Uses a single invoke when the model accepts a
+        dynamic batch dimension, otherwise invokes once per frame.
+        """
+        batch_size = input_batch.shape[0]
+        if batch_size > 1 and self.supports_batching is not False and self._resize_input_batch(batch_size):
+            self.interpreter.set_tensor(self.input_details[0]['index'], input_batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output_details[0]['index'])
+            self.supports_batching = True
+            # MoveNet output is [B, 1, 17, 3]
+            return [frame_output.reshape(-1, 3) for frame_output in output]
+
+        if self._allocated_batch_size != 1:
+            self._resize_input_batch(1)
+        keypoints_per_frame = []
+        for frame_input in input_batch:
+            self.interpreter.set_tensor(self.input_details[0]['index'], np.expand_dims(frame_input, axis=0))
+            self.interpreter.invoke()
+            keypoints_with_scores = self.interpreter.get_tensor(self.output_details[0]['index'])
+            keypoints_per_frame.append(
+                keypoints_with_scores.squeeze() if keypoints_with_scores.ndim > 2 else keypoints_with_scores)
+        return keypoints_per_frame
+
+
+# Encoded image bytes, a base64 string of them, or a decoded BGR frame
+Frame = Union[bytes, str, np.ndarray]
+
+
+class PoseInferenceResult(NamedTuple):
+    keypoints: Optional[np.ndarray]
+    error: Optional[str] = None
+    from_cache: bool = False
+
+
+def model_identity(model_path: str) -> str:
+    """Content hash of a model file, so cached keypoints are never reused across different models."""
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as model_file:
+        for chunk in iter(lambda: model_file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class KeypointCache:
+    """
+    Content-addressed cache of pose keypoints, keyed by a hash of the decoded frame bytes plus the model
+    identity. A bounded in-memory LRU tier sits in front of an optional on-disk tier (one .npy file per
+    frame) that survives restarts and is shared by all CV worker processes.
+    """
+
+    def __init__(self, max_entries: int, disk_dir: Optional[str] = None):
+        self.max_entries = max(0, max_entries)
+        self.disk_dir = disk_dir
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model_id: str, frame: Union[bytes, np.ndarray]) -> str:
+        digest = hashlib.sha256(model_id.encode())
+        if isinstance(frame, np.ndarray):
+            digest.update(str(frame.shape).encode())
+            digest.update(np.ascontiguousarray(frame).data)
         else:
-            print(f"WARNING: Default model path '{new_default_path}' not found. CV Form Analysis will be limited.")
-            print(f"  Please set POSE_ESTIMATION_MODEL_PATH in .env and ensure the model file exists.")
-            print(
-                f"  You can download a MoveNet TFLite model from TensorFlow Hub (e.g., search 'movenet singlepose lightning tflite').")
-
-    if pose_estimator_instance and not pose_estimator_instance.interpreter:  # If PoseEstimator init failed
-        pose_estimator_instance = None  # Ensure it's None so app knows it's not usable
-else:
-    print("INFO: Skipping PoseEstimator initialization as TFLite runtime is not available.")
+            digest.update(frame)
+        return digest.hexdigest()
 
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.npy")
 
-def get_landmark(keypoints: np.ndarray, landmark_name: str) -> Optional[Tuple[float, float, float]]:
-    idx = KEYPOINT_DICT.get(landmark_name)
-    if idx is None or keypoints is None or not isinstance(keypoints, np.ndarray) or keypoints.ndim != 2 or \
-            keypoints.shape[0] != NUM_KEYPOINTS or keypoints.shape[1] != 3:
-        # print(f"Warning: Invalid keypoints array or landmark '{landmark_name}' not found.")
-        return None
-    y, x, score = keypoints[idx]
-    if score < MIN_KEYPOINT_VISIBILITY_SCORE:
+    def _remember(self, key: str, keypoints: np.ndarray):
+        if self.max_entries == 0:
+            return
+        self._entries[key] = keypoints
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            keypoints = self._entries.get(key)
+            if keypoints is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return keypoints
+
+        if self.disk_dir:
+            try:
+                keypoints = np.load(self._disk_path(key), allow_pickle=False)
+            except (OSError, ValueError):
+                keypoints = None
+            if keypoints is not None:
+                with self._lock:
+                    self._remember(key, keypoints)
+                    self.disk_hits += 1
+                return keypoints
+
+        with self._lock:
+            self.misses += 1
         return None
-    return float(y), float(x), float(score)
-
-
-def calculate_angle(p1_coords: Tuple[float, float], p2_vertex_coords: Tuple[float, float],
-                    p3_coords: Tuple[float, float]) -> float:
-    v21 = (p1_coords[0] - p2_vertex_coords[0], p1_coords[1] - p2_vertex_coords[1])
-    v23 = (p3_coords[0] - p2_vertex_coords[0], p3_coords[1] - p2_vertex_coords[1])
-    dot_product = v21[0] * v23[0] + v21[1] * v23[1]
-    mag_v21 = math.sqrt(v21[0] ** 2 + v21[1] ** 2)
-    mag_v23 = math.sqrt(v23[0] ** 2 + v23[1] ** 2)
-    if mag_v21 * mag_v23 == 0: return 180.0
-
-    cos_angle = np.clip(dot_product / (mag_v21 * mag_v23), -1.0, 1.0)
-    angle_rad = math.acos(cos_angle)
-    return math.degrees(angle_rad)
-
-
-def analyze_squat_frame(keypoints: np.ndarray) -> Dict[str, Any]:
-    feedback = []
-    issues = 0
-    angles = {}
-
-    left_hip_kp = get_landmark(keypoints, 'left_hip')
-    right_hip_kp = get_landmark(keypoints, 'right_hip')
-    left_knee_kp = get_landmark(keypoints, 'left_knee')
-    right_knee_kp = get_landmark(keypoints, 'right_knee')
-    left_ankle_kp = get_landmark(keypoints, 'left_ankle')
-    right_ankle_kp = get_landmark(keypoints, 'right_ankle')
-
-    hip_kp = left_hip_kp if left_hip_kp else right_hip_kp
-    knee_kp = left_knee_kp if left_knee_kp else right_knee_kp
-    ankle_kp = left_ankle_kp if left_ankle_kp else right_ankle_kp
-
-    if hip_kp and knee_kp and ankle_kp:
-        knee_angle = calculate_angle((hip_kp[0], hip_kp[1]), (knee_kp[0], knee_kp[1]), (ankle_kp[0], ankle_kp[1]))
-        angles['knee_angle'] = round(knee_angle, 1)
-        if knee_angle < 90:
-            feedback.append("Good squat depth (thighs parallel or below).")
-        elif knee_angle < 110:
-            feedback.append("Try to squat deeper; aim for thighs parallel to the ground.")
-            issues += 1
+
+    def put(self, key: str, keypoints: np.ndarray):
+        with self._lock:
+            self._remember(key, keypoints)
+        if self.disk_dir:
+            disk_path = self._disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+                tmp_path = f"{disk_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as tmp_file:
+                    np.save(tmp_file, keypoints, allow_pickle=False)
+                os.replace(tmp_path, disk_path)  # Atomic, so concurrent workers never read a partial file
+            except OSError as e:
+                print(f"Warning: Could not write keypoint cache entry to disk: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries_in_memory": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_dir": self.disk_dir,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+
+class PoseInferenceEngine:
+    """
+    Pool of TFLite interpreters serving pose inference for many frames and many requests at once.
+
+    Each worker thread checks an interpreter out of the pool, decodes (base64 + image) and preprocesses
+    its batch of frames, then runs them through the model. OpenCV and the TFLite invoke both release
+    the GIL, so batches from one clip - and from concurrent requests - run on separate cores.
+    """
+
+    def __init__(self, model_path: str, num_workers: int = 2, num_threads: Optional[int] = None,
+                 batch_size: int = 8, keypoint_cache: Optional[KeypointCache] = None,
+                 model_name: Optional[str] = None):
+        self.model_path = model_path
+        self.model_name = model_name or os.path.splitext(os.path.basename(model_path))[0]
+        self.keypoint_cache = keypoint_cache
+        self.model_id = model_identity(model_path) if os.path.exists(model_path) else model_path
+        self.num_workers = max(1, num_workers)
+        self.batch_size = max(1, batch_size)
+        self._interpreters: "queue.Queue[PoseEstimator]" = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.input_size = MODEL_INPUT_SIZE
+        self.input_dtype = None
+
+        # Measured model latency (interpreter invoke only, per frame)
+        self._stats_lock = threading.Lock()
+        self.frames_inferred = 0
+        self.total_inference_s = 0.0
+        self.latency_ema_ms: Optional[float] = None
+
+        for _ in range(self.num_workers):
+            estimator = PoseEstimator(model_path, num_threads=num_threads)
+            if not estimator.interpreter:
+                break
+            self.input_size = (int(estimator.model_input_height), int(estimator.model_input_width))
+            self.input_dtype = estimator.input_details[0]['dtype']
+            self._interpreters.put(estimator)
+
+        if self._interpreters.qsize() == self.num_workers:
+            self._executor = ThreadPoolExecutor(max_workers=self.num_workers,
+                                                thread_name_prefix="pose-inference")
+            print(f"INFO: Pose inference engine '{self.model_name}' ready: {self.num_workers} interpreter(s), "
+                  f"{num_threads} thread(s) each, batch size {self.batch_size}.")
+
+    @property
+    def is_ready(self) -> bool:
+        return self._executor is not None
+
+    def _record_latency(self, frame_count: int, elapsed_s: float):
+        per_frame_ms = elapsed_s * 1000 / frame_count
+        with self._stats_lock:
+            self.frames_inferred += frame_count
+            self.total_inference_s += elapsed_s
+            self.latency_ema_ms = per_frame_ms if self.latency_ema_ms is None else (
+                    0.2 * per_frame_ms + 0.8 * self.latency_ema_ms)
+
+    def latency_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "frames_inferred": self.frames_inferred,
+                "avg_ms_per_frame": round(self.total_inference_s * 1000 / self.frames_inferred, 2)
+                if self.frames_inferred else None,
+                "recent_ms_per_frame": round(self.latency_ema_ms, 2) if self.latency_ema_ms is not None else None,
+            }
+
+    def latency_counters(self) -> Dict[str, Any]:
+        """Unrounded latency_stats() inputs, so several processes' counters can be combined."""
+        with self._stats_lock:
+            return {"frames_inferred": self.frames_inferred, "total_inference_s": self.total_inference_s,
+                    "latency_ema_ms": self.latency_ema_ms}
+
+    def warm_up(self):
+        """Runs one blank frame through every interpreter so first requests don't pay tensor allocation."""
+        estimators = [self._interpreters.get() for _ in range(self.num_workers)]
+        try:
+            for estimator in estimators:
+                dtype = np.float32 if estimator.is_input_float else np.uint8
+                blank_input = np.zeros((1, estimator.model_input_height, estimator.model_input_width, 3), dtype=dtype)
+                estimator.run_inference_on_batch(blank_input)  # First invoke pays allocation; not measured
+                inference_started_at = time.perf_counter()
+                estimator.run_inference_on_batch(blank_input)
+                self._record_latency(1, time.perf_counter() - inference_started_at)
+        finally:
+            for estimator in estimators:
+                self._interpreters.put(estimator)
+
+    def _infer_batch(self, frames: List[Frame]) -> List[PoseInferenceResult]:
+        estimator = self._interpreters.get()
+        try:
+            results: List[Optional[PoseInferenceResult]] = [None] * len(frames)
+            inputs, input_positions, cache_keys = [], [], []
+            for position, frame in enumerate(frames):
+                if isinstance(frame, str):
+                    try:
+                        frame = base64.b64decode(frame)
+                    except Exception as e:
+                        results[position] = PoseInferenceResult(None, f"Decoding error: {e}")
+                        continue
+                cache_key = None
+                if self.keypoint_cache is not None:
+                    cache_key = KeypointCache.make_key(self.model_id, frame)
+                    cached_keypoints = self.keypoint_cache.get(cache_key)
+                    if cached_keypoints is not None:
+                        results[position] = PoseInferenceResult(cached_keypoints, from_cache=True)
+                        continue
+                preprocess_result = estimator._preprocess_image(frame)
+                if preprocess_result is None:
+                    results[position] = PoseInferenceResult(None, "Image could not be decoded or preprocessed.")
+                    continue
+                inputs.append(preprocess_result[0][0])
+                input_positions.append(position)
+                cache_keys.append(cache_key)
+
+            if inputs:
+                inference_started_at = time.perf_counter()
+                batch_keypoints = estimator.run_inference_on_batch(np.stack(inputs))
+                self._record_latency(len(inputs), time.perf_counter() - inference_started_at)
+                for position, cache_key, keypoints in zip(input_positions, cache_keys, batch_keypoints):
+                    if cache_key is not None:
+                        self.keypoint_cache.put(cache_key, keypoints)
+                    results[position] = PoseInferenceResult(keypoints)
+            return results
+        finally:
+            self._interpreters.put(estimator)
+
+    def iter_keypoints(self, frames: Iterable[Frame]) -> Iterator[PoseInferenceResult]:
+        """
+        Yields one PoseInferenceResult per input frame, in input order. Frames may be raw image bytes,
+        base64 strings or decoded BGR arrays. At most two batches per worker are in flight, so memory stays bounded for long clips.
+        """
+        if not self.is_ready:
+            raise RuntimeError("Pose inference engine is not initialized.")
+
+        max_in_flight = self.num_workers * 2
+        pending: Deque[Future] = deque()
+        batch: List[Frame] = []
+        for frame in frames:
+            batch.append(frame)
+            if len(batch) == self.batch_size:
+                pending.append(self._executor.submit(self._infer_batch, batch))
+                batch = []
+                if len(pending) >= max_in_flight:
+                    yield from pending.popleft().result()
+        if batch:
+            pending.append(self._executor.submit(self._infer_batch, batch))
+        while pending:
+            yield from pending.popleft().result()
+
+    def submit(self, frames: List[Frame]) -> Future:
+        """Schedules one batch and returns a Future of its results, e.g. for awaiting via asyncio.wrap_future."""
+        if not self.is_ready:
+            raise RuntimeError("Pose inference engine is not initialized.")
+        return self._executor.submit(self._infer_batch, frames)
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+keypoint_cache: Optional[KeypointCache] = None
+if settings.POSE_KEYPOINT_CACHE_SIZE > 0 or settings.POSE_KEYPOINT_CACHE_DIR:
+    keypoint_cache = KeypointCache(settings.POSE_KEYPOINT_CACHE_SIZE, settings.POSE_KEYPOINT_CACHE_DIR or None)
+
+class PoseModelVariant:
+    """One configured pose model (e.g. MoveNet Lightning, Thunder, or an int8-quantized build)."""
+
+    def __init__(self, name: str, model_path: str):
+        self.name = name
+        self.model_path = model_path
+        self.quantized = "int8" in name.lower() or "quant" in name.lower()
+        self.engine: Optional[PoseInferenceEngine] = None
+        self.state = "not_loaded"  # not_loaded -> ready | unavailable
+        self.load_time_ms: Optional[float] = None
+
+    @property
+    def accuracy_rank(self) -> Tuple[int, int]:
+        """Higher is more accurate: larger input resolution first, then full precision over quantized."""
+        height, width = self.engine.input_size if self.engine else MODEL_INPUT_SIZE
+        return height * width, 0 if self.quantized else 1
+
+    @property
+    def expected_latency_ms(self) -> float:
+        """Measured per-frame latency once known; before that, a relative estimate from input size."""
+        if self.engine and self.engine.latency_ema_ms is not None:
+            return self.engine.latency_ema_ms
+        height, width = self.engine.input_size if self.engine else MODEL_INPUT_SIZE
+        return height * width / 1000 * (0.5 if self.quantized else 1.0)
+
+    def load(self):
+        load_started_at = time.perf_counter()
+        if not os.path.exists(self.model_path):
+            print(f"WARNING: Pose model '{self.name}' not found at '{self.model_path}'.")
         else:
-            feedback.append("Squat depth is shallow. Focus on lowering hips further.")
-            issues += 2
-
-        # Check if knees go too far past toes (relative to hip-knee-ankle line) - very simplified.
-        # A better check involves comparing x-coordinates if camera angle is known.
-        # If ankle_kp[1] (x of ankle) is significantly less than knee_kp[1] (x of knee)
-        # and hip_kp[1] is also less, it might indicate knees past toes.
-        # This is highly dependent on view and not robust.
-        # if knee_kp[1] > ankle_kp[1] + 0.05: # knee x > ankle x + threshold (assuming side view, facing right)
-        #     feedback.append("Watch for knees extending too far past toes.")
-        #     issues += 0.5
-
-    else:
-        feedback.append("Could not determine knee angle (hip, knee, or ankle not clearly visible).")
-        issues += 1
-
-    # Back straightness is hard to judge from 2D without torso keypoints (e.g. mid-spine)
-    # or assuming a very specific camera angle. Shoulder-hip alignment with vertical could be a proxy.
-    # For now, this is omitted for simplicity.
-
-    form_score = max(0, 1.0 - issues * 0.2)  # Each major issue reduces score by 20%
-    return {"feedback": feedback, "form_score_frame": form_score, "angles": angles}
-
-
-def analyze_pushup_frame(keypoints: np.ndarray) -> Dict[str, Any]:
-    feedback = []
-    issues = 0
-    angles = {}
-
-    shoulder_kp = get_landmark(keypoints, 'left_shoulder') or get_landmark(keypoints, 'right_shoulder')
-    elbow_kp = get_landmark(keypoints, 'left_elbow') or get_landmark(keypoints, 'right_elbow')
-    wrist_kp = get_landmark(keypoints, 'left_wrist') or get_landmark(keypoints, 'right_wrist')
-    hip_kp = get_landmark(keypoints, 'left_hip') or get_landmark(keypoints, 'right_hip')
-    ankle_kp = get_landmark(keypoints, 'left_ankle') or get_landmark(keypoints, 'right_ankle')
-    knee_kp = get_landmark(keypoints, 'left_knee') or get_landmark(keypoints, 'right_knee')
-
-    end_body_point_kp = ankle_kp  # Assume full pushup
-    if not end_body_point_kp and knee_kp:  # If ankles not visible, check for knee pushup
-        end_body_point_kp = knee_kp
-
-    if shoulder_kp and elbow_kp and wrist_kp:
-        elbow_angle = calculate_angle((shoulder_kp[0], shoulder_kp[1]), (elbow_kp[0], elbow_kp[1]),
-                                      (wrist_kp[0], wrist_kp[1]))
-        angles['elbow_angle'] = round(elbow_angle, 1)
-        # Assuming lower is better for push-up depth, meaning smaller elbow angle at bottom
-        if elbow_angle < 95:  # Good depth if this is the bottom of the movement
-            feedback.append("Good elbow flexion, likely good depth.")
-        elif elbow_angle < 120 and elbow_kp[0] > shoulder_kp[0]:  # elbow y > shoulder y = body lowered
-            feedback.append("Aim for more depth; elbows to at least 90 degrees.")
-            issues += 1
-        # If elbow_angle is large (e.g. > 150), it's likely top of pushup, which is fine.
-    else:
-        feedback.append("Could not determine elbow angle (shoulder, elbow, or wrist not clearly visible).")
-        issues += 1
-
-    if shoulder_kp and hip_kp and end_body_point_kp:
-        # Angle shoulder-hip-end_body_point (ankle or knee)
-        body_line_angle = calculate_angle((shoulder_kp[0], shoulder_kp[1]), (hip_kp[0], hip_kp[1]),
-                                          (end_body_point_kp[0], end_body_point_kp[1]))
-        angles['body_line_angle'] = round(body_line_angle, 1)
-        if body_line_angle < 160:  # Significant deviation from straight
-            feedback.append("Keep your body straighter from shoulders to ankles/knees. Avoid hip sag or pike.")
-            issues += 1
-        elif body_line_angle > 170:  # Good alignment
-            feedback.append("Good straight body line maintained.")
-    else:
-        feedback.append("Could not determine body alignment (shoulder, hip, or ankle/knee not clearly visible).")
-        issues += 1
-
-    form_score = max(0, 1.0 - issues * 0.25)
-    return {"feedback": feedback, "form_score_frame": form_score, "angles": angles}
+            engine = PoseInferenceEngine(
+                self.model_path,
+                num_workers=settings.POSE_INFERENCE_NUM_WORKERS,
+                num_threads=settings.POSE_INTERPRETER_NUM_THREADS,
+                batch_size=settings.POSE_INFERENCE_BATCH_SIZE,
+                keypoint_cache=keypoint_cache,
+                model_name=self.name,
+            )
+            if engine.is_ready:  # If interpreter init failed, the variant stays unusable
+                self.engine = engine
+        self.load_time_ms = round((time.perf_counter() - load_started_at) * 1000, 1)
+        self.state = "ready" if self.engine else "unavailable"
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "model_path": self.model_path,
+            "input_size": list(self.engine.input_size) if self.engine else None,
+            "quantized": self.quantized,
+            "load_time_ms": self.load_time_ms,
+            **(self.engine.latency_stats() if self.engine else {}),
+        }
+
+
+class PoseModelRegistry:
+    """
+    The configured pose model variants of this process. All variants load together on first use; each
+    request then picks one by policy: the lowest measured latency for interactive use, or the most accurate
+    model for batch work. Keypoint cache keys include each model's hash, so variants never share results.
+
+    `variants` maps names to model paths; without it they are read from the settings on first load.
+    """
+
+    def __init__(self, variants: Optional[Dict[str, str]] = None):
+        self.variants: Dict[str, PoseModelVariant] = {}
+        if variants is not None:
+            self.variants = {name: PoseModelVariant(name, path) for name, path in variants.items()}
+        self.state = "not_loaded"  # not_loaded -> loading -> ready | unavailable
+        self.warmed_up = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self.state in ("ready", "unavailable"):
+            return
+        with self._lock:
+            if self.state in ("ready", "unavailable"):
+                return
+            if not self.variants:
+                self.variants = {name: PoseModelVariant(name, path)
+                                 for name, path in _configured_model_variants().items()}
+            self.state = "loading"
+            if _import_tflite() is None:
+                print("INFO: Skipping PoseEstimator initialization as TFLite runtime is not available.")
+            else:
+                for variant in self.variants.values():
+                    variant.load()
+            self.state = "ready" if self.ready_variants() else "unavailable"
+
+    def ready_variants(self) -> List[PoseModelVariant]:
+        return [variant for variant in self.variants.values() if variant.engine is not None]
+
+    def select(self, policy: str = POSE_POLICY_BATCH) -> Optional[PoseModelVariant]:
+        self.load()
+        candidates = self.ready_variants()
+        if not candidates:
+            return None
+        if policy == POSE_POLICY_INTERACTIVE:
+            return min(candidates, key=lambda variant: variant.expected_latency_ms)
+        return max(candidates, key=lambda variant: variant.accuracy_rank)
+
+    def warm_up(self):
+        self.load()
+        if not self.warmed_up:
+            for variant in self.ready_variants():
+                variant.engine.warm_up()
+                print(f"INFO: Pose model '{variant.name}' warmed up "
+                      f"({variant.engine.latency_stats()['avg_ms_per_frame']} ms/frame).")
+            self.warmed_up = True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "warmed_up": self.warmed_up,
+            "variants": {name: variant.status() for name, variant in self.variants.items()},
+        }
+
+    def latency_counters(self) -> Dict[str, Dict[str, Any]]:
+        return {name: {"state": variant.state, **(variant.engine.latency_counters() if variant.engine else {})}
+                for name, variant in self.variants.items()}
+
+
+def _configured_model_variants() -> Dict[str, str]:
+    """
+    POSE_MODEL_VARIANTS ("lightning=path,thunder=path,lightning_int8=path") when set; otherwise the single
+    model at POSE_ESTIMATION_MODEL_PATH, falling back to the bundled Lightning path named in the README.
+    """
+    if settings.POSE_MODEL_VARIANTS:
+        variants = {}
+        for entry in settings.POSE_MODEL_VARIANTS.split(","):
+            name, separator, path = entry.partition("=")
+            if not separator or not name.strip() or not path.strip():
+                raise ValueError(f"Invalid POSE_MODEL_VARIANTS entry '{entry}'. Expected 'name=path'.")
+            variants[name.strip()] = path.strip()
+        return variants
+
+    model_path = settings.POSE_ESTIMATION_MODEL_PATH
+    default_path = "backend/models/movenet_lightning.tflite"  # Consistent with README
+    if not model_path or not os.path.exists(model_path):
+        print(f"WARNING: POSE_ESTIMATION_MODEL_PATH '{model_path}' not found. Trying '{default_path}'.")
+        print(f"  You can download a MoveNet TFLite model from TensorFlow Hub (e.g., search 'movenet singlepose lightning tflite').")
+        model_path = default_path
+    return {os.path.splitext(os.path.basename(model_path))[0]: model_path}
+
+
+pose_model_registry = PoseModelRegistry()
+
+
+def get_pose_engine(policy: str = POSE_POLICY_BATCH) -> Optional[PoseInferenceEngine]:
+    """
+    Returns the inference engine of the model chosen by `policy`, loading OpenCV, the TFLite runtime and
+    all configured models on first call. None means pose estimation is unavailable in this process.
+    """
+    variant = pose_model_registry.select(policy)
+    return variant.engine if variant else None
+
+
+def warm_up() -> Dict[str, Any]:
+    """
+    Loads the CV stack, every model and the exercise specs now instead of on the first request.
+    Returns the model status.
+    """
+    get_exercise_spec_registry()
+    pose_model_registry.warm_up()
+    return pose_model_registry.status()
+
+
+# --- Vectorized keypoint geometry ---
+# Keypoint tensors are (N, NUM_KEYPOINTS, 3) arrays of [y, x, score] per frame. Joints that fall below
+# MIN_KEYPOINT_VISIBILITY_SCORE become NaN, and NaN propagates through every angle that depends on them.
+
+def as_keypoint_tensor(keypoints: np.ndarray) -> np.ndarray:
+    """Validates shape once per clip and returns an (N, NUM_KEYPOINTS, 3) float array."""
+    keypoints = np.asarray(keypoints, dtype=np.float64)
+    if keypoints.ndim == 2:
+        keypoints = keypoints[np.newaxis]
+    if keypoints.ndim != 3 or keypoints.shape[1] != NUM_KEYPOINTS or keypoints.shape[2] != 3:
+        raise ValueError(f"Expected keypoints of shape (N, {NUM_KEYPOINTS}, 3), got {keypoints.shape}.")
+    return keypoints
+
+
+def visible_joint_coords(keypoints: np.ndarray, *landmark_names: str) -> np.ndarray:
+    """
+    Returns (N, 2) [y, x] coordinates of the first visible landmark among `landmark_names` for each frame
+    (e.g. left_hip, falling back to right_hip), or NaN where none of them is visible.
+    """
+    coords = np.full((keypoints.shape[0], 2), np.nan)
+    for landmark_name in reversed(landmark_names):
+        landmark = keypoints[:, KEYPOINT_DICT[landmark_name]]
+        visible = landmark[:, 2] >= MIN_KEYPOINT_VISIBILITY_SCORE
+        coords[visible] = landmark[visible, :2]
+    return coords
+
+
+def joint_angles(p1: np.ndarray, vertex: np.ndarray, p3: np.ndarray) -> np.ndarray:
+    """Angle in degrees at `vertex` for (N, 2) point arrays. 180 for degenerate (zero-length) limbs."""
+    v21 = p1 - vertex
+    v23 = p3 - vertex
+    magnitudes = np.linalg.norm(v21, axis=1) * np.linalg.norm(v23, axis=1)
+    dot_products = np.einsum("ij,ij->i", v21, v23)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cos_angles = np.clip(dot_products / magnitudes, -1.0, 1.0)
+    angles = np.degrees(np.arccos(cos_angles))
+    return np.where(magnitudes == 0, 180.0, angles)
+
+
+class FrameAnalysis(NamedTuple):
+    """Per-frame results for a whole clip, as arrays aligned on the frame axis."""
+    form_scores: np.ndarray  # (N,)
+    angles: Dict[str, np.ndarray]  # angle name -> (N,) degrees, NaN where not measurable
+    feedback_masks: Dict[str, np.ndarray]  # message -> (N,) bool, in per-frame message order
+
+    def frame(self, index: int) -> Dict[str, Any]:
+        """The single-frame dict shape used for live feedback."""
+        return {
+            "feedback": [message for message, mask in self.feedback_masks.items() if mask[index]],
+            "form_score_frame": float(self.form_scores[index]),
+            "angles": {name: float(values[index]) for name, values in self.angles.items()
+                       if not np.isnan(values[index])},
+        }
+
+
+_RULE_COMPARISONS = {"lt": np.less, "lte": np.less_equal, "gt": np.greater, "gte": np.greater_equal}
+_RULE_PHASES = ("flexed", "extended")
+
+
+class CompiledFormRule(NamedTuple):
+    message: str
+    angle: str
+    comparisons: Tuple[Tuple[Any, float], ...]  # (numpy comparison ufunc, threshold)
+    unmeasurable: bool
+    phase: Optional[str]
+    below: Optional[Tuple[str, str]]  # (point, reference point): point must be lower in the image
+    weight: float
+
+
+class CompiledExerciseSpec(NamedTuple):
+    """An exercise form spec resolved to landmark indices and comparison ufuncs, ready to run over clips."""
+    name: str
+    points: Dict[str, Tuple[str, ...]]  # point name -> landmark candidates, first visible wins
+    angles: Dict[str, Tuple[str, str, str]]  # angle name -> (point, vertex point, point)
+    phase_angle: Optional[str]  # Angle tracked for phases and repetition counting
+    flexed_below: float
+    extended_above: float
+    starts_at: str  # "extended" (squat, push-up) or "flexed" (deadlift off the floor)
+    eccentric: str  # Direction of the lowering phase: "flexing", or "extending" (e.g. curls)
+    issue_penalty: float
+    rules: Tuple[CompiledFormRule, ...]
+
+    def analyze(self, keypoints: np.ndarray) -> FrameAnalysis:
+        coords = {name: visible_joint_coords(keypoints, *landmarks) for name, landmarks in self.points.items()}
+        angles = {name: np.round(joint_angles(coords[p1], coords[vertex], coords[p3]), 1)
+                  for name, (p1, vertex, p3) in self.angles.items()}
+
+        phase_masks = {}
+        if self.phase_angle:
+            phase_masks["flexed"] = angles[self.phase_angle] < self.flexed_below
+            phase_masks["extended"] = angles[self.phase_angle] > self.extended_above
+
+        issues = np.zeros(keypoints.shape[0])
+        feedback_masks = {}
+        for rule in self.rules:
+            values = angles[rule.angle]
+            if rule.unmeasurable:
+                mask = np.isnan(values)
+            else:
+                mask = ~np.isnan(values)
+                for comparison, threshold in rule.comparisons:
+                    mask &= comparison(values, threshold)
+            if rule.phase:
+                mask &= phase_masks[rule.phase]
+            if rule.below:
+                point, reference = rule.below
+                mask &= coords[point][:, 0] > coords[reference][:, 0]  # Larger y is lower in the image
+            issues += mask * rule.weight
+            feedback_masks[rule.message] = mask | feedback_masks.get(rule.message, False)
+
+        return FrameAnalysis(
+            form_scores=np.maximum(0.0, 1.0 - issues * self.issue_penalty),
+            angles=angles,
+            feedback_masks=feedback_masks,
+        )
+
+
+def normalize_exercise_name(exercise_type: str) -> str:
+    return " ".join(exercise_type.lower().replace("-", " ").replace("_", " ").split())
+
+
+def compile_exercise_spec(name: str, spec: Dict[str, Any]) -> CompiledExerciseSpec:
+    """Validates one raw spec from the rules file. Raises ValueError naming the offending exercise."""
+    points = {point: tuple(landmarks) for point, landmarks in spec["points"].items()}
+    for point, landmarks in points.items():
+        unknown = [landmark for landmark in landmarks if landmark not in KEYPOINT_DICT]
+        if not landmarks or unknown:
+            raise ValueError(f"Exercise '{name}': point '{point}' has unknown or no landmarks {unknown}.")
+
+    angles = {angle: tuple(angle_points) for angle, angle_points in spec["angles"].items()}
+    for angle, angle_points in angles.items():
+        if len(angle_points) != 3 or any(point not in points for point in angle_points):
+            raise ValueError(f"Exercise '{name}': angle '{angle}' must reference three defined points.")
+
+    phases = spec.get("phases") or {}
+    phase_angle = phases.get("angle")
+    if phase_angle is not None and phase_angle not in angles:
+        raise ValueError(f"Exercise '{name}': phase angle '{phase_angle}' is not defined.")
+    starts_at, eccentric = phases.get("starts_at", "extended"), phases.get("eccentric", "flexing")
+    if starts_at not in _RULE_PHASES or eccentric not in ("flexing", "extending"):
+        raise ValueError(f"Exercise '{name}': invalid phases starts_at '{starts_at}' or eccentric '{eccentric}'.")
+
+    rules = []
+    for rule in spec["rules"]:
+        if rule["angle"] not in angles:
+            raise ValueError(f"Exercise '{name}': rule '{rule['message']}' uses undefined angle '{rule['angle']}'.")
+        if rule.get("phase") is not None and (rule["phase"] not in _RULE_PHASES or phase_angle is None):
+            raise ValueError(f"Exercise '{name}': rule '{rule['message']}' has invalid phase '{rule['phase']}'.")
+        below = tuple(rule["below"]) if rule.get("below") else None
+        if below is not None and (len(below) != 2 or any(point not in points for point in below)):
+            raise ValueError(f"Exercise '{name}': rule '{rule['message']}' has invalid 'below' points.")
+        rules.append(CompiledFormRule(
+            message=rule["message"],
+            angle=rule["angle"],
+            comparisons=tuple((comparison, float(rule[op])) for op, comparison in _RULE_COMPARISONS.items()
+                              if op in rule),
+            unmeasurable=bool(rule.get("unmeasurable", False)),
+            phase=rule.get("phase"),
+            below=below,
+            weight=float(rule.get("weight", 1.0)),
+        ))
+
+    return CompiledExerciseSpec(
+        name=name,
+        points=points,
+        angles=angles,
+        phase_angle=phase_angle,
+        flexed_below=float(phases.get("flexed_below", 0.0)),
+        extended_above=float(phases.get("extended_above", 180.0)),
+        starts_at=starts_at,
+        eccentric=eccentric,
+        issue_penalty=float(spec.get("issue_penalty", 0.2)),
+        rules=tuple(rules),
+    )
+
+
+class ExerciseSpecRegistry:
+    """Compiled exercise specs plus an alias index, so resolving an exercise name is a few dict lookups."""
+
+    def __init__(self, specs: Dict[str, CompiledExerciseSpec], alias_index: Dict[str, str]):
+        self.specs = specs
+        self.alias_index = alias_index
+        self._max_alias_words = max((len(alias.split()) for alias in alias_index), default=0)
+        self._resolved: Dict[str, Optional[CompiledExerciseSpec]] = {}
+
+    @classmethod
+    def from_file(cls, rules_path: str) -> "ExerciseSpecRegistry":
+        with open(rules_path, "r", encoding="utf-8") as rules_file:
+            raw_specs = json.load(rules_file)
+        specs, alias_index = {}, {}
+        for name, raw_spec in raw_specs.items():
+            specs[name] = compile_exercise_spec(name, raw_spec)
+            for alias in [name, *raw_spec.get("aliases", [])]:
+                alias_index[normalize_exercise_name(alias)] = name
+        return cls(specs, alias_index)
+
+    def resolve(self, exercise_type: str) -> Optional[CompiledExerciseSpec]:
+        """
+        Finds the spec for a free-form exercise name such as "Barbell Back Squat": the whole normalized
+        name first, then its word n-grams from longest to shortest. Results are memoized per name.
+        """
+        if exercise_type in self._resolved:
+            return self._resolved[exercise_type]
+        words = normalize_exercise_name(exercise_type).split()
+        spec = None
+        for size in range(min(len(words), self._max_alias_words), 0, -1):
+            for start in range(len(words) - size + 1):
+                spec_name = self.alias_index.get(" ".join(words[start:start + size]))
+                if spec_name is not None:
+                    spec = self.specs[spec_name]
+                    break
+            if spec is not None:
+                break
+        self._resolved[exercise_type] = spec
+        return spec
+
+
+EXERCISE_FORM_RULES_PATH = settings.EXERCISE_FORM_RULES_PATH or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "exercise_form_rules.json")
+_exercise_spec_registry: Optional[ExerciseSpecRegistry] = None
+_exercise_spec_lock = threading.Lock()
+
+
+def get_exercise_spec_registry() -> ExerciseSpecRegistry:
+    """The exercise specs from EXERCISE_FORM_RULES_PATH, read on first use (or by warm_up() in CV workers)."""
+    global _exercise_spec_registry
+    if _exercise_spec_registry is None:
+        with _exercise_spec_lock:
+            if _exercise_spec_registry is None:
+                registry = ExerciseSpecRegistry.from_file(EXERCISE_FORM_RULES_PATH)
+                print(f"INFO: Loaded {len(registry.specs)} exercise form specs from {EXERCISE_FORM_RULES_PATH}: "
+                      f"{', '.join(registry.specs)}.")
+                _exercise_spec_registry = registry
+    return _exercise_spec_registry
+
+
+def analyze_generic_frames(keypoints: np.ndarray) -> FrameAnalysis:
+    frame_count = keypoints.shape[0]
+    return FrameAnalysis(
+        form_scores=np.full(frame_count, 0.5),  # Neutral score
+        angles={},
+        feedback_masks={"Generic pose captured.": np.ones(frame_count, dtype=bool)},
+    )
+
+
+def analyze_frames(keypoints: np.ndarray, exercise_type: str) -> FrameAnalysis:
+    spec = get_exercise_spec_registry().resolve(exercise_type)
+    if spec is None:
+        # If specific analysis not found, return a generic message
+        return analyze_generic_frames(keypoints)
+    return spec.analyze(keypoints)
+
+
+def iter_frames_from_files(frame_paths: Iterable[str]) -> Iterator[bytes]:
+    """Reads encoded frame files one at a time, so only the frames in flight are held in memory."""
+    for frame_path in frame_paths:
+        with open(frame_path, "rb") as frame_file:
+            yield frame_file.read()
+
+
+def video_frame_rate(video_path: str) -> Optional[float]:
+    """Frame rate from the video container, or None if OpenCV cannot tell."""
+    cv2 = _import_cv2()
+    capture = cv2.VideoCapture(video_path)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) if capture.isOpened() else 0.0
+    finally:
+        capture.release()
+    return fps if fps and fps > 0 else None
+
+
+def iter_frames_from_video(video_path: str, frame_stride: int = 1) -> Iterator[np.ndarray]:
+    """Decodes a video file with OpenCV and yields every `frame_stride`-th frame as a BGR array."""
+    cv2 = _import_cv2()
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        print(f"Warning: Could not open video file for analysis: {video_path}")
+        return
+    try:
+        frame_index = 0
+        while True:
+            grabbed = capture.grab()
+            if not grabbed:
+                break
+            if frame_index % frame_stride == 0:
+                retrieved, frame_bgr = capture.retrieve()
+                if retrieved:
+                    yield frame_bgr
+            frame_index += 1
+    finally:
+        capture.release()
+
+
+class RepCounter:
+    """
+    Streaming repetition segmentation on a spec's phase angle, in one O(N) pass with O(1) state per frame.
+
+    The angle is smoothed with an EMA, and the spec's flexed/extended thresholds act as hysteresis: a rep
+    begins when the angle leaves the starting phase, must reach the opposite phase, and ends when it returns.
+    The extreme of the smoothed angle in between splits the rep into its eccentric and concentric halves.
+    """
+
+    def __init__(self, spec: CompiledExerciseSpec, smoothing_alpha: float = REP_SMOOTHING_ALPHA):
+        self.spec = spec
+        self.alpha = smoothing_alpha
+        self.starts_extended = spec.starts_at == "extended"
+        # Leaving an extended start flexes the joint first; that half is eccentric when lowering flexes it
+        self.first_half_is_eccentric = self.starts_extended == (spec.eccentric == "flexing")
+        self.reps: List[Dict[str, Any]] = []
+
+        self._smoothed: Optional[float] = None
+        self._armed = False  # Seen the starting phase, so the next departure from it begins a rep
+        self._last_start_time = 0.0
+        self._in_rep = False
+        self._reached_opposite = False
+        self._turn_value = 0.0
+        self._turn_time = 0.0
+        self._min_angle = 0.0
+        self._max_angle = 0.0
+        self._score_sum = 0.0
+        self._score_count = 0
+
+    def _in_phase(self, value: float, extended: bool) -> bool:
+        return value > self.spec.extended_above if extended else value < self.spec.flexed_below
+
+    def _finish_rep(self, end_time: float):
+        first_half_s = self._turn_time - self._last_start_time
+        second_half_s = end_time - self._turn_time
+        eccentric_s, concentric_s = ((first_half_s, second_half_s) if self.first_half_is_eccentric
+                                     else (second_half_s, first_half_s))
+        self.reps.append({
+            "rep": len(self.reps) + 1,
+            "depth_angle": round(self._min_angle, 1),
+            "range_of_motion": round(self._max_angle - self._min_angle, 1),
+            "eccentric_s": round(eccentric_s, 2),
+            "concentric_s": round(concentric_s, 2),
+            "form_score": round(self._score_sum / self._score_count, 2),
+        })
+
+    def update(self, angles: np.ndarray, times: np.ndarray, form_scores: np.ndarray):
+        """Feeds aligned per-frame arrays (phase angle in degrees, timestamps in seconds, frame scores)."""
+        for value, frame_time, score in zip(angles.tolist(), times.tolist(), form_scores.tolist()):
+            if value != value:  # NaN: joint not visible, hold the smoothed signal
+                continue
+            self._smoothed = value if self._smoothed is None else (
+                    self.alpha * value + (1.0 - self.alpha) * self._smoothed)
+            smoothed = self._smoothed
+            in_start_phase = self._in_phase(smoothed, self.starts_extended)
+
+            if not self._in_rep:
+                if in_start_phase:
+                    self._armed = True
+                    self._last_start_time = frame_time
+                    continue
+                if not self._armed:
+                    continue
+                self._in_rep, self._reached_opposite = True, False
+                self._turn_value, self._turn_time = smoothed, frame_time
+                self._min_angle = self._max_angle = value
+                self._score_sum, self._score_count = 0.0, 0
+
+            self._min_angle = min(self._min_angle, value)
+            self._max_angle = max(self._max_angle, value)
+            self._score_sum += score
+            self._score_count += 1
+            if (smoothed < self._turn_value) if self.starts_extended else (smoothed > self._turn_value):
+                self._turn_value, self._turn_time = smoothed, frame_time
+            if self._in_phase(smoothed, not self.starts_extended):
+                self._reached_opposite = True
+            if in_start_phase:
+                if self._reached_opposite:
+                    self._finish_rep(frame_time)
+                # A partial movement that never reached the opposite phase is not counted
+                self._in_rep = False
+                self._last_start_time = frame_time
+
+    @property
+    def rep_count(self) -> int:
+        return len(self.reps)
+
+
+class FormAnalysisAccumulator:
+    """
+    Incrementally aggregates analysis results batch by batch. Only running totals, angle min/max/sum, the
+    set of distinct feedback messages and one entry per completed rep are kept, so memory does not grow
+    with the number of frames.
+
+    `source_fps` is the capture rate of the incoming frames, used to timestamp them for rep tempo.
+    """
+
+    def __init__(self, exercise_type: str, source_fps: Optional[float] = None):
+        self.exercise_type = exercise_type
+        self.source_fps = source_fps or settings.CV_DEFAULT_SOURCE_FPS
+        spec = get_exercise_spec_registry().resolve(exercise_type)
+        self.rep_counter = RepCounter(spec) if spec is not None and spec.phase_angle else None
+        self.frames_input = 0
+        self.frames_successfully_processed = 0
+        self.frames_from_cache = 0
+        self.sum_form_score = 0.0
+        self.unique_feedback_issues = set()
+        self.positive_feedback_observed = False
+        self.first_message: Optional[str] = None
+        # angle_name -> [min, max, sum, count]
+        self.angle_stats: Dict[str, List[float]] = {}
+
+    def _record_message(self, msg_core: str):
+        if self.first_message is None:
+            self.first_message = msg_core
+        if "Good" in msg_core or "good" in msg_core:
+            self.positive_feedback_observed = True
+        elif "Could not determine" not in msg_core and "Decoding error" not in msg_core and "Generic pose captured" not in msg_core:
+            self.unique_feedback_issues.add(msg_core)
+
+    def add_keypoints(self, keypoints: np.ndarray, frame_times: Optional[np.ndarray] = None) -> FrameAnalysis:
+        """
+        Adds a validated (N, NUM_KEYPOINTS, 3) tensor of successfully inferred frames. `frame_times` are their
+        timestamps in seconds; by default frames are assumed to follow on from the previous ones at source_fps.
+        """
+        if frame_times is None:
+            frame_times = (self.frames_successfully_processed + np.arange(keypoints.shape[0])) / self.source_fps
+        self.frames_successfully_processed += keypoints.shape[0]
+        analysis = analyze_frames(keypoints, self.exercise_type)
+        if self.rep_counter is not None:
+            self.rep_counter.update(analysis.angles[self.rep_counter.spec.phase_angle], frame_times,
+                                    analysis.form_scores)
+
+        if self.first_message is None and "Generic pose captured." in analysis.feedback_masks:
+            self._record_message(
+                f"Analysis for '{self.exercise_type}' not specifically implemented. Generic pose captured.")
+        for message, mask in analysis.feedback_masks.items():
+            if mask.any():
+                self._record_message(message)
+        self.sum_form_score += float(analysis.form_scores.sum())
+
+        for angle_name, angle_values in analysis.angles.items():
+            angle_values = angle_values[~np.isnan(angle_values)]
+            if angle_values.size == 0:
+                continue
+            stats = self.angle_stats.get(angle_name)
+            batch_stats = [float(angle_values.min()), float(angle_values.max()), float(angle_values.sum()),
+                           int(angle_values.size)]
+            if stats is None:
+                self.angle_stats[angle_name] = batch_stats
+            else:
+                stats[0] = min(stats[0], batch_stats[0])
+                stats[1] = max(stats[1], batch_stats[1])
+                stats[2] += batch_stats[2]
+                stats[3] += batch_stats[3]
+        return analysis
+
+    def add_batch(self, inference_results: List[PoseInferenceResult],
+                  frame_times: Optional[List[float]] = None) -> List[Optional[Dict[str, Any]]]:
+        """
+        Adds a batch of inference results, analyzing all valid frames in one vectorized pass.
+        `frame_times` optionally gives each frame's capture time in seconds (e.g. arrival time of live frames);
+        otherwise it is derived from the frame's position in the stream and source_fps.
+        Returns each frame's analysis dict, or None for frames that were unusable.
+        """
+        first_frame_index = self.frames_input
+        valid_positions, valid_keypoints = [], []
+        for position, inference_result in enumerate(inference_results):
+            self.frames_input += 1
+            if inference_result.error and inference_result.error.startswith("Decoding error"):
+                print(f"Warning: Could not decode base64 frame {self.frames_input - 1}: {inference_result.error}")
+                self._record_message("Decoding error.")
+                continue
+
+            keypoints = inference_result.keypoints
+            if keypoints is None or not isinstance(keypoints, np.ndarray) or keypoints.ndim != 2 or keypoints.shape[
+                0] != NUM_KEYPOINTS or keypoints.shape[1] != 3:
+                self._record_message(
+                    f"Could not get valid keypoints (shape: {keypoints.shape if isinstance(keypoints, np.ndarray) else 'None or invalid'}).")
+                continue
+            valid_positions.append(position)
+            valid_keypoints.append(keypoints)
+            if inference_result.from_cache:
+                self.frames_from_cache += 1
+
+        frame_results: List[Optional[Dict[str, Any]]] = [None] * len(inference_results)
+        if valid_keypoints:
+            if frame_times is not None:
+                valid_times = np.asarray(frame_times, dtype=np.float64)[valid_positions]
+            else:
+                valid_times = (first_frame_index + np.asarray(valid_positions)) / self.source_fps
+            analysis = self.add_keypoints(as_keypoint_tensor(np.stack(valid_keypoints)), valid_times)
+            for analysis_index, position in enumerate(valid_positions):
+                frame_results[position] = analysis.frame(analysis_index)
+        return frame_results
+
+    def add(self, inference_result: PoseInferenceResult,
+            frame_time: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Adds one frame's inference result. Returns the frame's analysis, or None if the frame was unusable."""
+        return self.add_batch([inference_result], None if frame_time is None else [frame_time])[0]
+
+    @property
+    def average_form_score(self) -> float:
+        if self.frames_successfully_processed == 0:
+            return 0.0
+        return self.sum_form_score / self.frames_successfully_processed
+
+    @property
+    def reps(self) -> List[Dict[str, Any]]:
+        return self.rep_counter.reps if self.rep_counter is not None else []
+
+    @property
+    def overall_form_score(self) -> float:
+        """Mean of the per-rep scores once reps are detected, so setup and rest frames don't dilute it."""
+        if self.reps:
+            return sum(rep["form_score"] for rep in self.reps) / len(self.reps)
+        return self.average_form_score
+
+    def key_metrics_summary(self) -> Dict[str, float]:
+        key_metrics_summary = {}
+        for angle_name, (angle_min, angle_max, angle_sum, angle_count) in self.angle_stats.items():
+            key_metrics_summary[f"{angle_name}_min"] = round(angle_min, 1)
+            key_metrics_summary[f"{angle_name}_max"] = round(angle_max, 1)
+            key_metrics_summary[f"{angle_name}_avg"] = round(angle_sum / angle_count, 1)
+        return key_metrics_summary
+
+    def summary(self, frames_per_second: Optional[float] = None) -> Dict[str, Any]:
+        if self.frames_input == 0:
+            return {"error": "No video frames provided for analysis."}
+
+        if self.frames_successfully_processed == 0:
+            final_error_msg = "No frames could be processed successfully for keypoint extraction."
+            if self.first_message:  # If there were decoding errors, include that info
+                final_error_msg += " Check detailed messages. Common issues: invalid base64, empty frames."
+            return {"error": final_error_msg, "detailed_frame_messages": sorted(self.unique_feedback_issues)}
+
+        key_metrics_summary = self.key_metrics_summary()
+        return {
+            "exercise_type_analyzed": self.exercise_type,
+            "frames_input": self.frames_input,
+            "frames_processed_successfully": self.frames_successfully_processed,
+            "overall_form_score": round(self.overall_form_score, 2),
+            "corrective_feedback": self.corrective_feedback(),
+            "key_metrics_summary": key_metrics_summary if key_metrics_summary else None,
+            "frames_per_second": round(frames_per_second, 1) if frames_per_second else None,
+            "frames_from_cache": self.frames_from_cache,
+            "rep_count": len(self.reps) if self.rep_counter is not None else None,
+            "reps": self.reps if self.rep_counter is not None else None,
+        }
+
+    def corrective_feedback(self) -> List[str]:
+        final_corrective_feedback = sorted(list(self.unique_feedback_issues))  # Sort for consistent order
+        if not final_corrective_feedback and self.positive_feedback_observed and self.overall_form_score > 0.85:
+            final_corrective_feedback.append("Overall good form detected!")
+        elif not final_corrective_feedback and not self.positive_feedback_observed:
+            final_corrective_feedback.append(
+                "Analysis inconclusive or keypoints not consistently visible for detailed feedback.")
+        elif not final_corrective_feedback and self.first_message and "Generic pose captured" in self.first_message:
+            final_corrective_feedback.append(
+                f"Pose captured for {self.exercise_type}. Specific form cues for this exercise are not yet implemented.")
+        return final_corrective_feedback
+
+
+def analyze_exercise_form_from_stream(frames: Iterable[Frame], exercise_type: str,
+                                      source_fps: Optional[float] = None,
+                                      model_policy: str = POSE_POLICY_BATCH) -> Dict[str, Any]:
+    """
+    Runs form analysis over any iterable of frames (base64 strings, encoded bytes or decoded BGR arrays).
+    Frames are pulled lazily through the inference engine, so generators keep peak memory flat.
+    `source_fps` is the rate the frames were captured at, used for rep tempo; `model_policy` picks the model.
+    """
+    engine = get_pose_engine(model_policy)
+    if not engine or not engine.is_ready:
+        return {"error": "Pose estimation model not loaded or not configured properly. Cannot analyze form."}
+
+    accumulator = FormAnalysisAccumulator(exercise_type, source_fps=source_fps)
+    analysis_started_at = time.perf_counter()
+
+    # Base64 decoding, image decoding and inference all run on the engine's worker pool;
+    # results are analyzed in vectorized chunks of ANALYSIS_CHUNK_FRAMES
+    inference_results: List[PoseInferenceResult] = []
+    for inference_result in engine.iter_keypoints(frames):
+        inference_results.append(inference_result)
+        if len(inference_results) == ANALYSIS_CHUNK_FRAMES:
+            accumulator.add_batch(inference_results)
+            inference_results = []
+    if inference_results:
+        accumulator.add_batch(inference_results)
+
+    analysis_elapsed_s = time.perf_counter() - analysis_started_at
+    frames_per_second = accumulator.frames_input / analysis_elapsed_s if analysis_elapsed_s > 0 else None
+    summary = accumulator.summary(frames_per_second=frames_per_second)
+    if "error" not in summary:
+        summary["pose_model"] = engine.model_name
+        summary["inference_ms_per_frame"] = engine.latency_stats()["recent_ms_per_frame"]
+    return summary
+
+
+def analyze_exercise_form_from_keypoints(keypoints: np.ndarray, exercise_type: str,
+                                         source_fps: Optional[float] = None) -> Dict[str, Any]:
+    """Re-runs form analysis over stored keypoints of shape (N, NUM_KEYPOINTS, 3) without any inference."""
+    keypoints = as_keypoint_tensor(keypoints)
+    accumulator = FormAnalysisAccumulator(exercise_type, source_fps=source_fps)
+    accumulator.frames_input = keypoints.shape[0]
+    if keypoints.shape[0]:
+        accumulator.add_keypoints(keypoints)
+    return accumulator.summary()
 
 
 def analyze_exercise_form_from_frames(
         video_frames_base64: List[str],
-        exercise_type: str
+        exercise_type: str,
+        source_fps: Optional[float] = None,
+        model_policy: str = POSE_POLICY_BATCH
 ) -> Dict[str, Any]:
-    if not pose_estimator_instance or not pose_estimator_instance.interpreter:
-        return {"error": "Pose estimation model not loaded or not configured properly. Cannot analyze form."}
-
     if not video_frames_base64:
         return {"error": "No video frames provided for analysis."}
+    return analyze_exercise_form_from_stream(video_frames_base64, exercise_type, source_fps=source_fps,
+                                             model_policy=model_policy)
 
-    all_frame_feedback_msgs = []
-    sum_form_score = 0.0
-    frames_successfully_processed = 0
-    aggregated_angles: Dict[str, List[float]] = {}
 
-    for i, frame_b64 in enumerate(video_frames_base64):
-        try:
-            frame_bytes = base64.b64decode(frame_b64)
-        except Exception as e:
-            print(f"Warning: Could not decode base64 frame {i}: {e}")
-            all_frame_feedback_msgs.append(f"Frame {i + 1}: Decoding error.")
-            continue
-
-        keypoints = pose_estimator_instance.run_inference(frame_bytes)
-
-        if keypoints is None or not isinstance(keypoints, np.ndarray) or keypoints.ndim != 2 or keypoints.shape[
-            0] != NUM_KEYPOINTS or keypoints.shape[1] != 3:
-            all_frame_feedback_msgs.append(
-                f"Frame {i + 1}: Could not get valid keypoints (shape: {keypoints.shape if isinstance(keypoints, np.ndarray) else 'None or invalid'}).")
-            continue
-
-        frames_successfully_processed += 1
-        frame_analysis_result: Dict[str, Any] = {}
-
-        exercise_type_lower = exercise_type.lower()
-        if "squat" in exercise_type_lower:
-            frame_analysis_result = analyze_squat_frame(keypoints)
-        elif "push-up" in exercise_type_lower or "pushup" in exercise_type_lower:
-            frame_analysis_result = analyze_pushup_frame(keypoints)
-        # Add more exercises:
-        # elif "lunge" in exercise_type_lower:
-        #     frame_analysis_result = analyze_lunge_frame(keypoints)
-        # elif "bicep curl" in exercise_type_lower or "curl" in exercise_type_lower:
-        #     frame_analysis_result = analyze_bicep_curl_frame(keypoints)
-        else:
-            # If specific analysis not found, return a generic message for this frame or overall
-            all_frame_feedback_msgs.append(
-                f"Frame {i + 1}: Analysis for '{exercise_type}' not specifically implemented. Generic pose captured.")
-            frame_analysis_result = {"feedback": ["Generic pose captured."], "form_score_frame": 0.5,
-                                     "angles": {}}  # Neutral score
-
-        frame_feedback_list = frame_analysis_result.get("feedback", [])
-        if frame_feedback_list:
-            all_frame_feedback_msgs.extend([f"Frame {i + 1}: {fb}" for fb in frame_feedback_list])
-        sum_form_score += frame_analysis_result.get("form_score_frame", 0)
-
-        current_frame_angles = frame_analysis_result.get("angles", {})
-        for angle_name, angle_value in current_frame_angles.items():
-            if angle_name not in aggregated_angles: aggregated_angles[angle_name] = []
-            if isinstance(angle_value, (int, float)):  # Ensure it's a number
-                aggregated_angles[angle_name].append(angle_value)
-
-    if frames_successfully_processed == 0:
-        final_error_msg = "No frames could be processed successfully for keypoint extraction."
-        if all_frame_feedback_msgs:  # If there were decoding errors, include that info
-            final_error_msg += " Check detailed messages. Common issues: invalid base64, empty frames."
-        return {"error": final_error_msg, "detailed_frame_messages": all_frame_feedback_msgs}
-
-    average_form_score_overall = sum_form_score / frames_successfully_processed
-
-    unique_feedback_issues = set()
-    positive_feedback_observed = False
-    for msg_with_frame_num in all_frame_feedback_msgs:
-        msg_core = msg_with_frame_num.split(": ", 1)[1] if ": " in msg_with_frame_num else msg_with_frame_num
-        if "Good" in msg_core or "good" in msg_core:
-            positive_feedback_observed = True
-        elif "Could not determine" not in msg_core and "Decoding error" not in msg_core and "Generic pose captured" not in msg_core:
-            unique_feedback_issues.add(msg_core)
-
-    final_corrective_feedback = sorted(list(unique_feedback_issues))  # Sort for consistent order
-    if not final_corrective_feedback and positive_feedback_observed and average_form_score_overall > 0.85:
-        final_corrective_feedback.append("Overall good form detected!")
-    elif not final_corrective_feedback and not positive_feedback_observed:
-        final_corrective_feedback.append(
-            "Analysis inconclusive or keypoints not consistently visible for detailed feedback.")
-    elif not final_corrective_feedback and "Generic pose captured." in all_frame_feedback_msgs[
-        0]:  # If only generic feedback
-        final_corrective_feedback.append(
-            f"Pose captured for {exercise_type}. Specific form cues for this exercise are not yet implemented.")
-
-    key_metrics_summary = {}
-    for angle_name, angle_values_list in aggregated_angles.items():
-        if angle_values_list:  # Ensure list is not empty
-            key_metrics_summary[f"{angle_name}_min"] = round(min(angle_values_list), 1)
-            key_metrics_summary[f"{angle_name}_max"] = round(max(angle_values_list), 1)
-            key_metrics_summary[f"{angle_name}_avg"] = round(sum(angle_values_list) / len(angle_values_list), 1)
-
-    return {
-        "exercise_type_analyzed": exercise_type,
-        "frames_input": len(video_frames_base64),
-        "frames_processed_successfully": frames_successfully_processed,
-        "overall_form_score": round(average_form_score_overall, 2),
-        "corrective_feedback": final_corrective_feedback,
-        "key_metrics_summary": key_metrics_summary if key_metrics_summary else None,
-        # "detailed_frame_messages": all_frame_feedback_msgs # Enable for debugging
-    }
\ No newline at end of file
+def analyze_exercise_form_from_files(
+        exercise_type: str,
+        frame_paths: Optional[List[str]] = None,
+        video_path: Optional[str] = None,
+        video_frame_stride: int = 1,
+        source_fps: Optional[float] = None,
+        model_policy: str = POSE_POLICY_BATCH
+) -> Dict[str, Any]:
+    """
+    Analyzes uploaded frames spooled to disk: individual JPEG/PNG files and/or one video file.
+    Takes paths rather than bytes so it can be sent to the CV worker pool without copying the upload.
+    `source_fps` is the capture rate of the image files; a video's own frame rate takes precedence.
+    """
+    if video_path:
+        video_fps = video_frame_rate(video_path)
+        if video_fps:
+            source_fps = video_fps / video_frame_stride
+
+    def frames() -> Iterator[Frame]:
+        if frame_paths:
+            yield from iter_frames_from_files(frame_paths)
+        if video_path:
+            yield from iter_frames_from_video(video_path, frame_stride=video_frame_stride)
+
+    return analyze_exercise_form_from_stream(frames(), exercise_type, source_fps=source_fps,
+                                             model_policy=model_policy)
@@ -0,0 +1,231 @@
+# backend/services/cv_worker_service.py
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from backend.core.config import settings
+
+
+def _init_cv_worker_process():
+    # CV workers exist only for form analysis, so load the pose model eagerly instead of on the first job
+    from backend.services import cv_service
+    cv_service.warm_up()
+    print("INFO: CV worker process initialized.")
+
+
+def _cv_worker_stats() -> Dict[str, Any]:
+    """This worker's counters. They are cumulative, so the latest report from each worker is its full tally."""
+    from backend.services import cv_service
+    return {
+        "pid": os.getpid(),
+        "keypoint_cache": cv_service.keypoint_cache.stats() if cv_service.keypoint_cache else None,
+        "pose_models": cv_service.pose_model_registry.latency_counters(),
+    }
+
+
+def _cv_worker_model_status() -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    from backend.services import cv_service
+    return cv_service.warm_up(), _cv_worker_stats()
+
+
+def _run_cv_job(fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    # Stats ride along with every result, so the API process sees each worker's counters without polling
+    return fn(*args, **kwargs), _cv_worker_stats()
+
+
+def aggregate_keypoint_cache_stats(worker_stats: Dict[int, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Keypoint cache counters summed over the workers' latest reports (each worker has its own memory tier)."""
+    reports = [stats["keypoint_cache"] for stats in worker_stats.values() if stats.get("keypoint_cache")]
+    if not reports:
+        return None
+    totals = {key: sum(report[key] for report in reports)
+              for key in ("entries_in_memory", "memory_hits", "disk_hits", "misses")}
+    lookups = totals["memory_hits"] + totals["disk_hits"] + totals["misses"]
+    return {
+        **totals,
+        "max_entries_per_worker": reports[0]["max_entries"],
+        "disk_dir": reports[0]["disk_dir"],
+        "hit_rate": round((totals["memory_hits"] + totals["disk_hits"]) / lookups, 3) if lookups else 0.0,
+        "workers_reporting": len(reports),
+    }
+
+
+def aggregate_pose_model_latency(worker_stats: Dict[int, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-variant latency over all workers: frames and total inference time summed, and the workers' recent
+    (EMA) latencies averaged weighted by the frames each has inferred.
+    """
+    by_variant: Dict[str, list] = {}
+    for stats in worker_stats.values():
+        for name, counters in (stats.get("pose_models") or {}).items():
+            by_variant.setdefault(name, []).append(counters)
+    aggregated = {}
+    for name, reports in by_variant.items():
+        frames = sum(report.get("frames_inferred", 0) for report in reports)
+        total_s = sum(report.get("total_inference_s", 0.0) for report in reports)
+        recent = [(report["latency_ema_ms"], report["frames_inferred"]) for report in reports
+                  if report.get("latency_ema_ms") is not None and report.get("frames_inferred")]
+        recent_frames = sum(weight for _, weight in recent)
+        states = {report["state"] for report in reports}
+        aggregated[name] = {
+            "state": "ready" if "ready" in states else states.pop(),
+            "frames_inferred": frames,
+            "avg_ms_per_frame": round(total_s * 1000 / frames, 2) if frames else None,
+            "recent_ms_per_frame": round(sum(ms * weight for ms, weight in recent) / recent_frames, 2)
+            if recent_frames else None,
+            "workers_reporting": len(reports),
+        }
+    return aggregated
+
+
+class CVWorkerPool:
+    """
+    Runs CPU-bound CV jobs in a dedicated process pool so they never block the API event loop.
+
+    At most `max_concurrent` jobs run at once and at most `max_queued` more may wait for a slot.
+    Anything beyond that is rejected immediately with 429 and a Retry-After estimate instead of
+    piling up behind the running jobs.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._running = 0
+        self._queued = 0
+        self.worker_model_status: Optional[Dict[str, Any]] = None  # Reported by a worker after warm_up()
+        self._worker_stats: Dict[int, Dict[str, Any]] = {}  # Latest _cv_worker_stats() of each worker, by pid
+
+        # Metrics
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self.jobs_rejected = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.total_run_s = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # "spawn" avoids forking a process that already holds threads (uvicorn, inference pools)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_concurrent,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_cv_worker_process,
+            )
+        return self._executor
+
+    def _estimate_retry_after_s(self) -> int:
+        avg_run_s = self.total_run_s / self.jobs_completed if self.jobs_completed else 5.0
+        backlog = self._running + self._queued
+        return max(1, int(round(avg_run_s * backlog / self.max_concurrent)))
+
+    async def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs `fn(*args, **kwargs)` in the worker pool. `fn` and its arguments must be picklable."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+
+        if self._running + self._queued >= self.max_concurrent + self.max_queued:
+            self.jobs_rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Form analysis is at capacity. Please retry shortly.",
+                headers={"Retry-After": str(self._estimate_retry_after_s())},
+            )
+
+        enqueued_at = time.perf_counter()
+        self._queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+
+        wait_s = time.perf_counter() - enqueued_at
+        self.total_wait_s += wait_s
+        self.max_wait_s = max(self.max_wait_s, wait_s)
+
+        loop = asyncio.get_running_loop()
+        self._running += 1
+        started_at = time.perf_counter()
+        try:
+            job = self._get_executor().submit(_run_cv_job, fn, args, kwargs)
+        except Exception:  # Executor shut down or broken
+            self._running -= 1
+            self._slots.release()
+            self.jobs_failed += 1
+            raise
+
+        def _on_job_done(done: Future):  # Called on an executor thread
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._job_done, done, started_at)
+
+        # The slot is freed when the worker is done with the job, not when this coroutine exits: a cancelled
+        # request (client disconnect) leaves its job running, and freeing the slot then would let more than
+        # max_concurrent jobs run at once
+        job.add_done_callback(_on_job_done)
+        result, _ = await asyncio.wrap_future(job)
+        return result
+
+    def _job_done(self, job: Future, started_at: float):
+        self._running -= 1
+        self._slots.release()
+        if job.cancelled():
+            return
+        if job.exception() is not None:
+            self.jobs_failed += 1
+            return
+        _, worker_stats = job.result()
+        self._worker_stats[worker_stats["pid"]] = worker_stats
+        self.jobs_completed += 1
+        self.total_run_s += time.perf_counter() - started_at
+
+    async def warm_up(self) -> Dict[str, Any]:
+        """Starts every worker process (each loads the pose model on start) and records the model status."""
+        loop = asyncio.get_running_loop()
+        reports = await asyncio.gather(*[
+            loop.run_in_executor(self._get_executor(), _cv_worker_model_status) for _ in range(self.max_concurrent)
+        ])
+        for _, worker_stats in reports:
+            self._worker_stats[worker_stats["pid"]] = worker_stats
+        self.worker_model_status = reports[0][0]
+        return self.worker_model_status
+
+    def keypoint_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Keypoint cache counters across all worker processes, as of each worker's latest job."""
+        return aggregate_keypoint_cache_stats(self._worker_stats)
+
+    def pose_model_latency(self) -> Dict[str, Dict[str, Any]]:
+        """Live per-variant inference latency across all worker processes, as of each worker's latest job."""
+        return aggregate_pose_model_latency(self._worker_stats)
+
+    def metrics(self) -> Dict[str, Any]:
+        jobs_started = self.jobs_completed + self.jobs_failed + self._running
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "running": self._running,
+            "queue_depth": self._queued,
+            "jobs_completed": self.jobs_completed,
+            "jobs_failed": self.jobs_failed,
+            "jobs_rejected": self.jobs_rejected,
+            "avg_wait_ms": round(self.total_wait_s / jobs_started * 1000, 1) if jobs_started else 0.0,
+            "max_wait_ms": round(self.max_wait_s * 1000, 1),
+            "avg_run_ms": round(self.total_run_s / self.jobs_completed * 1000, 1) if self.jobs_completed else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._worker_stats.clear()
+
+
+cv_worker_pool = CVWorkerPool(
+    max_concurrent=settings.CV_MAX_CONCURRENT_ANALYSES,
+    max_queued=settings.CV_MAX_QUEUED_ANALYSES,
+)
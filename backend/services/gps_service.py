@@ -0,0 +1,452 @@
+# backend/services/gps_service.py
+"""
+GPS track math on packed NumPy arrays: distance (haversine or Vincenty), accuracy filtering,
+elevation gain/loss with hysteresis, moving time, splits and Ramer-Douglas-Peucker simplification,
+plus the compact binary format tracks are stored in (encode_track / decode_track).
+
+Tracks are packed once from GPSDataPoint objects or their stored JSON dicts; everything after
+that works on whole arrays, so a 50k-point track takes milliseconds.
+"""
+import json
+import struct
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from backend import schemas
+from backend.core.config import settings
+
+EARTH_RADIUS_M = 6371008.8  # Mean radius, for haversine
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+_UTC_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAIVE_EPOCH = datetime(1970, 1, 1)  # Naive timestamps are UTC throughout the app
+
+
+class PackedTrack(NamedTuple):
+    """A GPS track as parallel arrays, one entry per point, in time order."""
+    lat: np.ndarray  # (N,) degrees
+    lon: np.ndarray  # (N,) degrees
+    alt: np.ndarray  # (N,) meters, NaN where missing
+    t: np.ndarray  # (N,) seconds since the epoch
+    accuracy: np.ndarray  # (N,) meters, NaN where missing
+
+    def __len__(self) -> int:
+        return int(self.lat.shape[0])
+
+    def select(self, mask: np.ndarray) -> "PackedTrack":
+        return PackedTrack(*(values[mask] for values in self))
+
+
+def _epoch_seconds(timestamps: List[Union[datetime, str]]) -> np.ndarray:
+    if timestamps and isinstance(timestamps[0], str):  # ISO strings, as stored in JSON
+        timestamps = [datetime.fromisoformat(value.replace("Z", "+00:00")) for value in timestamps]
+    return np.fromiter(
+        ((value - (_NAIVE_EPOCH if value.tzinfo is None else _UTC_EPOCH)).total_seconds() for value in timestamps),
+        dtype=np.float64, count=len(timestamps),
+    )
+
+
+def pack_track(points: Iterable[Union[schemas.GPSDataPoint, Dict[str, Any]]], sort_by_time: bool = True) -> PackedTrack:
+    """
+    Packs GPSDataPoint objects or their JSON dicts (as stored in Activity.gps_data). With `sort_by_time`
+    False the arrays stay in input order, so indices into the track are indices into `points`.
+    """
+    points = list(points)
+    # Plain attribute/key reads per field; going through .dict() per point is most of the cost otherwise
+    if points and isinstance(points[0], dict):
+        columns = [[point.get(field) for point in points] for field in ("lat", "lon", "altitude", "timestamp", "accuracy")]
+    else:
+        columns = [[getattr(point, field) for point in points] for field in ("lat", "lon", "altitude", "timestamp", "accuracy")]
+    lat, lon, alt, timestamps, accuracy = columns
+    track = PackedTrack(
+        lat=np.array(lat, dtype=np.float64),
+        lon=np.array(lon, dtype=np.float64),
+        alt=np.array(alt, dtype=np.float64),  # None becomes NaN
+        t=_epoch_seconds(timestamps),
+        accuracy=np.array(accuracy, dtype=np.float64),
+    )
+    if sort_by_time and len(points) > 1 and np.any(np.diff(track.t) < 0):  # Devices occasionally deliver points out of order
+        track = track.select(np.argsort(track.t, kind="stable"))
+    return track
+
+
+def track_to_points(track: PackedTrack) -> List[Dict[str, Any]]:
+    """GPSDataPoint-shaped dicts (naive UTC timestamps), for API responses."""
+    lat = np.round(track.lat, 7).tolist()
+    lon = np.round(track.lon, 7).tolist()
+    alt = [None if value != value else value for value in np.round(track.alt, 2).tolist()]  # NaN -> None
+    accuracy = [None if value != value else value for value in np.round(track.accuracy, 1).tolist()]
+    timestamps = np.round(track.t * 1000).astype(np.int64).astype("datetime64[ms]").astype(object).tolist()
+    return [
+        {"lat": point[0], "lon": point[1], "timestamp": point[2], "altitude": point[3], "accuracy": point[4]}
+        for point in zip(lat, lon, timestamps, alt, accuracy)
+    ]
+
+
+# --- Binary track format ---
+# Header: magic, version, flags, point count, start time (epoch ms), altitude reference (m). Then, zlib-compressed:
+#   lat, lon    int32 1e-7 degree fixed point (~1 cm), first value absolute then deltas
+#   t           uint32 ms since the start time (tracks up to ~49 days)
+#   altitude    int16 quarter meters relative to the reference (+-8 km), only if any point has one
+#   accuracy    uint16 decimeters, only if any point has one
+# Missing altitude/accuracy use the type's extreme value. About 6-8 bytes per point after compression vs
+# ~130 for a JSON object per point.
+_TRACK_MAGIC = b"GT"
+_TRACK_VERSION = 1
+_TRACK_HEADER = struct.Struct("<2sBBIqd")
+_HAS_ALTITUDE = 1
+_HAS_ACCURACY = 2
+_COORD_SCALE = 1e7
+_ALTITUDE_SCALE = 4.0
+_ALTITUDE_MISSING = np.iinfo(np.int16).min
+_ACCURACY_SCALE = 10.0
+_ACCURACY_MISSING = np.iinfo(np.uint16).max
+
+
+def encode_track(track: PackedTrack) -> bytes:
+    n = len(track)
+    start_ms = int(round(track.t[0] * 1000)) if n else 0
+    lat = np.round(track.lat * _COORD_SCALE).astype(np.int64)
+    lon = np.round(track.lon * _COORD_SCALE).astype(np.int64)
+    columns = [
+        np.diff(lat, prepend=0).astype("<i4"),
+        np.diff(lon, prepend=0).astype("<i4"),
+        np.clip(np.round(track.t * 1000) - start_ms, 0, np.iinfo(np.uint32).max).astype("<u4"),
+    ]
+    flags = 0
+    alt_reference = 0.0
+    has_alt = ~np.isnan(track.alt)
+    if has_alt.any():
+        flags |= _HAS_ALTITUDE
+        alt_reference = float((np.nanmin(track.alt) + np.nanmax(track.alt)) / 2)
+        quarters = np.clip(np.round((np.nan_to_num(track.alt) - alt_reference) * _ALTITUDE_SCALE),
+                           _ALTITUDE_MISSING + 1, np.iinfo(np.int16).max)
+        columns.append(np.where(has_alt, quarters, _ALTITUDE_MISSING).astype("<i2"))
+    has_accuracy = ~np.isnan(track.accuracy)
+    if has_accuracy.any():
+        flags |= _HAS_ACCURACY
+        decimeters = np.clip(np.round(np.nan_to_num(track.accuracy) * _ACCURACY_SCALE), 0, _ACCURACY_MISSING - 1)
+        columns.append(np.where(has_accuracy, decimeters, _ACCURACY_MISSING).astype("<u2"))
+    header = _TRACK_HEADER.pack(_TRACK_MAGIC, _TRACK_VERSION, flags, n, start_ms, alt_reference)
+    return header + zlib.compress(b"".join(column.tobytes() for column in columns), 1)  # Level 1: ~7x faster than 6, ~10% larger
+
+
+def decode_track(data: bytes) -> PackedTrack:
+    magic, version, flags, n, start_ms, alt_reference = _TRACK_HEADER.unpack_from(data)
+    if magic != _TRACK_MAGIC or version != _TRACK_VERSION:
+        raise ValueError(f"Unsupported GPS track encoding (magic={magic!r}, version={version}).")
+    body = zlib.decompress(data[_TRACK_HEADER.size:])
+
+    offset = 0
+
+    def column(dtype: str) -> np.ndarray:
+        nonlocal offset
+        values = np.frombuffer(body, dtype=dtype, count=n, offset=offset)
+        offset += values.nbytes
+        return values
+
+    # Deltas wrap around int32 (e.g. crossing the antimeridian); summing in int32 wraps them back exactly
+    lat = np.cumsum(column("<i4"), dtype=np.int32) / _COORD_SCALE
+    lon = np.cumsum(column("<i4"), dtype=np.int32) / _COORD_SCALE
+    t = (column("<u4").astype(np.float64) + start_ms) / 1000
+    alt = np.full(n, np.nan)
+    if flags & _HAS_ALTITUDE:
+        quarters = column("<i2")
+        present = quarters != _ALTITUDE_MISSING
+        alt[present] = quarters[present] / _ALTITUDE_SCALE + alt_reference
+    accuracy = np.full(n, np.nan)
+    if flags & _HAS_ACCURACY:
+        decimeters = column("<u2")
+        present = decimeters != _ACCURACY_MISSING
+        accuracy[present] = decimeters[present] / _ACCURACY_SCALE
+    return PackedTrack(lat=lat, lon=lon, alt=alt, t=t, accuracy=accuracy)
+
+
+def haversine_m(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Great-circle distance in meters between paired points, on a spherical Earth."""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlam = np.radians(lon2) - np.radians(lon1)
+    h = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def vincenty_m(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray,
+               max_iterations: int = 20, tolerance: float = 1e-12) -> np.ndarray:
+    """
+    Geodesic distance in meters between paired points on the WGS-84 ellipsoid (Vincenty's inverse formula).
+    Pairs that don't converge (nearly antipodal, never the case between consecutive GPS fixes) fall back to
+    haversine.
+    """
+    u1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1, sin_u2, cos_u2 = np.sin(u1), np.cos(u1), np.sin(u2), np.cos(u2)
+    big_l = np.radians(lon2) - np.radians(lon1)
+    lam = big_l.copy()
+    converged = np.zeros(lam.shape, dtype=bool)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma > 0, cos_u1 * cos_u2 * sin_lam / sin_sigma, 0.0)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sm = np.where(cos2_alpha > 0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha, 0.0)
+            c = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = big_l + (1 - c) * WGS84_F * sin_alpha * (
+                sigma + c * sin_sigma * (cos_2sm + c * cos_sigma * (-1 + 2 * cos_2sm ** 2)))
+            converged = np.abs(lam - lam_prev) < tolerance
+            if converged.all():
+                break
+
+        u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        big_a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        big_b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = big_b * sin_sigma * (cos_2sm + big_b / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sm ** 2)
+            - big_b / 6 * cos_2sm * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sm ** 2)))
+        distance = WGS84_B * big_a * (sigma - delta_sigma)
+
+    fallback = ~converged | ~np.isfinite(distance)
+    if fallback.any():
+        distance[fallback] = haversine_m(lat1[fallback], lon1[fallback], lat2[fallback], lon2[fallback])
+    return distance
+
+
+_DISTANCE_FORMULAS = {"haversine": haversine_m, "vincenty": vincenty_m}
+
+
+def segment_distances_m(track: PackedTrack, formula: Optional[str] = None) -> np.ndarray:
+    """(N-1,) distances between consecutive points."""
+    distance_fn = _DISTANCE_FORMULAS.get(formula or settings.GPS_DISTANCE_FORMULA, haversine_m)
+    return distance_fn(track.lat[:-1], track.lon[:-1], track.lat[1:], track.lon[1:])
+
+
+def filter_by_accuracy(track: PackedTrack, max_accuracy_m: Optional[float] = None) -> PackedTrack:
+    """Drops fixes whose reported horizontal accuracy is worse than `max_accuracy_m`; unknown accuracy is kept."""
+    max_accuracy_m = settings.GPS_MAX_ACCURACY_M if max_accuracy_m is None else max_accuracy_m
+    if max_accuracy_m <= 0:
+        return track
+    keep = ~(track.accuracy > max_accuracy_m)  # NaN compares False, so points without accuracy stay
+    return track if keep.all() else track.select(keep)
+
+
+def smooth_elevation(alt: np.ndarray, window: int = 5) -> np.ndarray:
+    """Centered moving average over `window` points (shrinking at the ends); NaN altitudes must be removed first."""
+    if window <= 1 or alt.size < 3:
+        return alt
+    half = min(window // 2, (alt.size - 1) // 2)
+    cumulative = np.concatenate(([0.0], np.cumsum(alt)))
+    index = np.arange(alt.size)
+    lo = np.maximum(index - half, 0)
+    hi = np.minimum(index + half + 1, alt.size)
+    return (cumulative[hi] - cumulative[lo]) / (hi - lo)
+
+
+def elevation_gain_loss_m(alt: np.ndarray, hysteresis_m: Optional[float] = None,
+                          smoothing_window: int = 5) -> Dict[str, float]:
+    """
+    Total climb and descent of the smoothed altitude profile, ignoring changes smaller than `hysteresis_m`
+    relative to the last counted level, so altitude noise doesn't accumulate into phantom climbing.
+    """
+    hysteresis_m = settings.GPS_ELEVATION_HYSTERESIS_M if hysteresis_m is None else hysteresis_m
+    alt = smooth_elevation(alt[~np.isnan(alt)], smoothing_window)
+    if alt.size < 2:
+        return {"gain": 0.0, "loss": 0.0}
+    if hysteresis_m <= 0:
+        diffs = np.diff(alt)
+        return {"gain": float(diffs[diffs > 0].sum()), "loss": float(-diffs[diffs < 0].sum())}
+
+    # Hysteresis is inherently sequential; a pass over plain floats keeps it to a few ms for 50k points
+    values = alt.tolist()
+    gain = loss = 0.0
+    level = values[0]
+    for value in values[1:]:
+        if value - level >= hysteresis_m:
+            gain += value - level
+            level = value
+        elif level - value >= hysteresis_m:
+            loss += level - value
+            level = value
+    return {"gain": gain, "loss": loss}
+
+
+def local_xy_m(track: PackedTrack) -> np.ndarray:
+    """(N, 2) planar coordinates in meters (equirectangular about the track's mean latitude)."""
+    lon = np.unwrap(np.radians(track.lon))  # Continuous across the antimeridian
+    lat = np.radians(track.lat)
+    return np.column_stack((EARTH_RADIUS_M * lon * np.cos(lat.mean()), EARTH_RADIUS_M * lat))
+
+
+def simplify_indices(track: PackedTrack, tolerance_m: float) -> np.ndarray:
+    """
+    Indices of the points Ramer-Douglas-Peucker keeps so that no dropped point is more than `tolerance_m`
+    from the simplified line; endpoints are always kept.
+    """
+    n = len(track)
+    if n < 3 or tolerance_m <= 0:
+        return np.arange(n)
+    return np.flatnonzero(simplification_significance(track, tolerance_m) > tolerance_m)
+
+
+def simplification_significance(track: PackedTrack, min_tolerance_m: float) -> np.ndarray:
+    """
+    Per point, the largest tolerance at which Ramer-Douglas-Peucker still keeps it (inf for the endpoints,
+    0 for points not kept even at `min_tolerance_m`), so the simplification at any tolerance >= the minimum
+    is `significance > tolerance` without running RDP again.
+
+    Iterative rather than recursive: each pass measures every still-undecided point against the segment
+    between its neighbouring kept points in one set of array operations, then splits every span whose
+    farthest point is out of tolerance at that point (the same choice the recursive form makes). Passes
+    equal the recursion depth, typically a few dozen even for 50k-point tracks. A point's significance is
+    capped by that of the points bounding its span, since it is only reached once they have been kept.
+    """
+    n = len(track)
+    significance = np.zeros(n)
+    significance[[0, -1]] = np.inf
+    if n < 3:
+        return significance
+    xy = local_xy_m(track)
+    x, y = np.ascontiguousarray(xy[:, 0]), np.ascontiguousarray(xy[:, 1])
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    candidates = np.arange(1, n - 1)
+    tolerance_sq = max(min_tolerance_m, 0.0) ** 2
+    while candidates.size:
+        kept = np.flatnonzero(keep)
+        span = np.searchsorted(kept, candidates)  # Each candidate lies between kept[span - 1] and kept[span]
+        start, end = kept[span - 1], kept[span]
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[candidates] - x[start], y[candidates] - y[start]
+        length_sq = dx * dx + dy * dy
+        # Distance to the segment rather than the infinite line, so out-and-back sections aren't collapsed
+        along = np.clip((px * dx + py * dy) / np.where(length_sq > 0, length_sq, 1.0), 0.0, 1.0)
+        distance_sq = (px - along * dx) ** 2 + (py - along * dy) ** 2
+
+        new_span = np.empty(candidates.size, dtype=bool)
+        new_span[0] = True
+        np.not_equal(span[1:], span[:-1], out=new_span[1:])
+        span_of = np.cumsum(new_span) - 1
+        span_max = np.maximum.reduceat(distance_sq, np.flatnonzero(new_span))
+        open_span = (span_max > tolerance_sq)[span_of]
+        at_max = np.flatnonzero(open_span & (distance_sq == span_max[span_of]))
+        first_in_span = np.empty(at_max.size, dtype=bool)  # Ties: the earliest point, like argmax
+        if at_max.size:
+            first_in_span[0] = True
+            np.not_equal(span_of[at_max][1:], span_of[at_max][:-1], out=first_in_span[1:])
+        split = at_max[first_in_span]
+        keep[candidates[split]] = True
+        significance[candidates[split]] = np.minimum(
+            np.sqrt(distance_sq[split]), np.minimum(significance[start[split]], significance[end[split]]))
+        candidates = candidates[open_span & ~keep[candidates]]
+    return significance
+
+
+def simplify_points(points: List[Any], tolerance_m: float) -> List[Any]:
+    """The subset of `points` (GPSDataPoint objects or dicts, in recorded order) kept by simplify_indices."""
+    if len(points) < 3 or tolerance_m <= 0:
+        return list(points)
+    return [points[index] for index in simplify_indices(pack_track(points, sort_by_time=False), tolerance_m)]
+
+
+def parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """Parses "min_lon,min_lat,max_lon,max_lat" (GeoJSON order). Raises ValueError if malformed."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError("bbox must be four numbers: min_lon,min_lat,max_lon,max_lat")
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise ValueError("bbox is out of range or has min_lat > max_lat")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def clip_to_bbox(track: PackedTrack, bbox: Tuple[float, float, float, float]) -> PackedTrack:
+    """The points of `track` inside `bbox`; min_lon > max_lon means the box crosses the antimeridian."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    inside = (track.lat >= min_lat) & (track.lat <= max_lat)
+    if min_lon <= max_lon:
+        inside &= (track.lon >= min_lon) & (track.lon <= max_lon)
+    else:
+        inside &= (track.lon >= min_lon) | (track.lon <= max_lon)
+    return track.select(inside)
+
+
+def iter_points_json(track: PackedTrack, chunk_size: int = 1000) -> Iterator[bytes]:
+    """
+    The track as a JSON array of GPSDataPoint objects, produced `chunk_size` points at a time so a long
+    track is never held in memory as one list of dicts or one response body.
+    """
+    yield b"["
+    for start in range(0, len(track), chunk_size):
+        points = track_to_points(track.select(slice(start, start + chunk_size)))
+        chunk = json.dumps(points, separators=(",", ":"), default=datetime.isoformat)[1:-1]
+        yield (b"," if start else b"") + chunk.encode()
+    yield b"]"
+
+
+def compute_splits(cumulative_m: np.ndarray, t: np.ndarray, split_m: float = 1000.0) -> List[Dict[str, float]]:
+    """Time for each `split_m` of distance (interpolated within segments), plus the final partial split."""
+    total_m = float(cumulative_m[-1]) if cumulative_m.size else 0.0
+    if total_m <= 0 or split_m <= 0:
+        return []
+    edges_m = np.arange(int(total_m // split_m) + 1) * split_m
+    if total_m - edges_m[-1] > 1e-6:
+        edges_m = np.append(edges_m, total_m)
+    edges_t = np.interp(edges_m, cumulative_m, t)
+    distances_km = np.diff(edges_m) / 1000
+    durations_s = np.diff(edges_t)
+    return [
+        {
+            "split": index + 1,
+            "distance_km": round(float(distance_km), 3),
+            "duration_s": round(float(duration_s), 1),
+            "pace_min_per_km": round(float(duration_s) / 60 / float(distance_km), 2) if distance_km > 0 else None,
+        }
+        for index, (distance_km, duration_s) in enumerate(zip(distances_km, durations_s))
+    ]
+
+
+def compute_track_metrics(track: PackedTrack, *, formula: Optional[str] = None,
+                          max_accuracy_m: Optional[float] = None, hysteresis_m: Optional[float] = None,
+                          moving_speed_mps: Optional[float] = None, split_m: float = 1000.0) -> Dict[str, Any]:
+    """Distance, elevation gain/loss, elapsed and moving time, and splits of a packed track."""
+    moving_speed_mps = settings.GPS_MOVING_SPEED_MPS if moving_speed_mps is None else moving_speed_mps
+    points_in = len(track)
+    track = filter_by_accuracy(track, max_accuracy_m)
+    metrics: Dict[str, Any] = {
+        "total_distance_km": 0.0,
+        "total_elevation_gain_m": 0.0,
+        "total_elevation_loss_m": 0.0,
+        "elapsed_time_s": 0.0,
+        "moving_time_s": 0.0,
+        "splits": [],
+        "points_used": len(track),
+        "points_dropped": points_in - len(track),
+    }
+    if len(track) < 2:
+        return metrics
+
+    distances = segment_distances_m(track, formula)
+    dt = np.diff(track.t)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speeds = np.where(dt > 0, distances / dt, 0.0)
+    cumulative_m = np.concatenate(([0.0], np.cumsum(distances)))
+    elevation = elevation_gain_loss_m(track.alt, hysteresis_m)
+
+    metrics.update(
+        total_distance_km=round(float(cumulative_m[-1]) / 1000, 3),
+        total_elevation_gain_m=round(elevation["gain"], 1),
+        total_elevation_loss_m=round(elevation["loss"], 1),
+        elapsed_time_s=round(float(track.t[-1] - track.t[0]), 1),
+        moving_time_s=round(float(dt[speeds >= moving_speed_mps].sum()), 1),
+        splits=compute_splits(cumulative_m, track.t, split_m),
+    )
+    return metrics
@@ -0,0 +1,143 @@
+# backend/services/polyline_service.py
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from backend.core.config import settings
+from backend.services import gps_service
+
+WEB_MERCATOR_M_PER_PX_Z0 = 156543.03392  # Ground meters per pixel of a 256 px tile at zoom 0, at the equator
+MIN_ZOOM = 0
+MAX_ZOOM = 22
+POLYLINE_PRECISION = 5  # Google's encoded polyline format: 1e-5 degrees
+
+ROUTE_FORMAT_POLYLINE = "polyline"
+ROUTE_FORMAT_BINARY = "binary"
+
+
+def tolerance_for_zoom(zoom: int, latitude: float) -> float:
+    """Simplification tolerance in meters that keeps the route within ROUTE_TOLERANCE_PX pixels at `zoom`."""
+    meters_per_px = WEB_MERCATOR_M_PER_PX_Z0 * math.cos(math.radians(latitude)) / 2 ** zoom
+    return meters_per_px * settings.ROUTE_TOLERANCE_PX
+
+
+def encode_polyline(lat: np.ndarray, lon: np.ndarray, precision: int = POLYLINE_PRECISION) -> str:
+    """Google encoded polyline of the coordinates, vectorized over all points."""
+    if not len(lat):
+        return ""
+    factor = 10 ** precision
+    coords = np.column_stack((np.round(lat * factor), np.round(lon * factor))).astype(np.int64)
+    deltas = np.diff(coords, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()  # lat, lon interleaved
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    # 5-bit groups, least significant first; every group but a value's last carries the 0x20 continuation bit
+    shifts = np.arange(0, 35, 5)
+    groups = (values[:, None] >> shifts) & 0x1F
+    group_count = 1 + np.count_nonzero((values[:, None] >> shifts[1:]) > 0, axis=1)
+    used = np.arange(shifts.size) < group_count[:, None]
+    continued = np.arange(shifts.size) < (group_count - 1)[:, None]
+    chars = (groups | (continued * 0x20)) + 63
+    return chars[used].astype(np.uint8).tobytes().decode("ascii")
+
+
+def encode_binary(lat: np.ndarray, lon: np.ndarray) -> bytes:
+    """Little-endian int32 (lat, lon) pairs in 1e-7 degrees; a JS Int32Array over the body reads them directly."""
+    return np.column_stack((np.round(lat * 1e7), np.round(lon * 1e7))).astype("<i4").tobytes()
+
+
+class RouteLevels(NamedTuple):
+    """An activity's route with every point's RDP significance (gps_service.simplification_significance)."""
+    lat: np.ndarray
+    lon: np.ndarray
+    significance: np.ndarray
+    reference_lat: float  # For converting zoom levels to meters
+
+    def at_zoom(self, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+        kept = self.significance > tolerance_for_zoom(zoom, self.reference_lat)
+        return self.lat[kept], self.lon[kept]
+
+
+def build_route_levels(track: gps_service.PackedTrack) -> RouteLevels:
+    reference_lat = float(np.mean(track.lat)) if len(track) else 0.0
+    significance = gps_service.simplification_significance(track, tolerance_for_zoom(MAX_ZOOM, reference_lat))
+    return RouteLevels(lat=track.lat, lon=track.lon, significance=significance, reference_lat=reference_lat)
+
+
+class RouteLevelsCache:
+    """
+    Size-bounded LRU of per-activity route levels and the payloads already encoded from them.
+
+    The significance ranking is computed once per activity; every zoom level after that is a threshold on
+    it, and each (zoom, format) payload is encoded once. crud.activity invalidates an activity's entry when
+    its track changes or it is deleted; other API processes pick the change up within `ttl_s`.
+    """
+
+    def __init__(self, max_activities: int, ttl_s: float):
+        self.max_activities = max(0, max_activities)
+        self.ttl_s = ttl_s
+        # activity_id -> (expires at, levels, {(zoom, format): (payload, point count)})
+        self._entries: "OrderedDict[int, Tuple[float, RouteLevels, Dict[Tuple[int, str], Tuple[Any, int]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_activities > 0 and self.ttl_s > 0
+
+    def get(self, activity_id: int, zoom: int, route_format: str,
+            load_track: Callable[[], Optional[gps_service.PackedTrack]]) -> Optional[Tuple[Union[str, bytes], int]]:
+        """
+        (payload, point count) of the activity's route at `zoom`, or None if it has no GPS track.
+        `load_track` is only called on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(activity_id)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[activity_id]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(activity_id)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry is None:
+            track = load_track()
+            if track is None or not len(track):
+                return None
+            entry = (time.monotonic() + self.ttl_s, build_route_levels(track), {})
+            if self.enabled:
+                with self._lock:
+                    self._entries[activity_id] = entry
+                    while len(self._entries) > self.max_activities:
+                        self._entries.popitem(last=False)
+
+        levels, payloads = entry[1], entry[2]
+        key = (zoom, route_format)
+        payload = payloads.get(key)
+        if payload is None:
+            lat, lon = levels.at_zoom(zoom)
+            encoded = encode_polyline(lat, lon) if route_format == ROUTE_FORMAT_POLYLINE else encode_binary(lat, lon)
+            payload = payloads[key] = (encoded, len(lat))  # Concurrent requests at most encode a level twice
+        return payload
+
+    def invalidate(self, activity_id: Optional[int]):
+        with self._lock:
+            self._entries.pop(activity_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"activities": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+route_levels_cache = RouteLevelsCache(
+    max_activities=settings.ROUTE_CACHE_MAX_ACTIVITIES,
+    ttl_s=settings.ROUTE_CACHE_TTL_S,
+)
@@ -1,6 +1,7 @@
 from backend import models, schemas
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
 
 # --- CONCEPTUAL Sustainability Service ---
 
@@ -27,7 +28,7 @@ EMISSION_FACTORS = {
 
 
 def calculate_activity_carbon_footprint(
-        db: Session,
+        db: Union[Session, AsyncSession],
         user: models.User,
         activity: models.Activity,  # The user's logged activity from DB
         request_data: schemas.ActivityCarbonFootprintRequest
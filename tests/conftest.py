@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+# The engine is created when backend.database is imported, so point it at a throwaway database first
+_TEST_DB_DIR = tempfile.mkdtemp(prefix="fittrack-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TEST_DB_DIR, 'test.db')}"
+
+import pytest
+
+from backend import crud  # noqa: E402  (before firebase_init, which imports crud indirectly)
+from backend.database import Base, SessionLocal, engine, ensure_indexes
+
+
+@pytest.fixture()
+def db():
+    Base.metadata.create_all(bind=engine)
+    ensure_indexes(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture()
+def api_client(db):
+    """Builds a TestClient for one router, serving requests from `db` as the given user."""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from backend.core.security import get_current_active_user
+    from backend.database import get_db
+
+    def _client(router, prefix, user):
+        app = FastAPI()
+        app.include_router(router, prefix=prefix)
+        app.dependency_overrides[get_db] = lambda: db
+        app.dependency_overrides[get_current_active_user] = lambda: user
+        return TestClient(app)
+
+    return _client
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from backend import crud, models, schemas
+from backend.database import count_queries
+from backend.services import bulk_service
+
+
+def _add_user(db):
+    user = models.User(email="sleeper@example.com", is_active=True)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _night(day, **fields):
+    start = datetime(2024, 1, 1, 23, 0) + timedelta(days=day)
+    return {"start_time": start.isoformat(), "end_time": (start + timedelta(hours=8)).isoformat(),
+            "sleep_score": day, **fields}
+
+
+def test_batched_insert_maps_ids_to_rows_in_order(db, monkeypatch):
+    user = _add_user(db)
+    monkeypatch.setattr(bulk_service.settings, "BULK_INSERT_CHUNK_SIZE", 3)
+
+    with count_queries() as counter:
+        response = bulk_service.bulk_create_for_user(db, crud.sleep_record, [_night(day) for day in range(7)],
+                                                     schemas.SleepRecordCreate, user.id)
+
+    assert response.created == 7 and response.failed == 0
+    inserts = [statement for statement in counter.statements if statement.startswith("INSERT INTO sleep_records")]
+    assert len(inserts) == 3  # Chunks of 3, 3 and 1 rows
+    scores = {record.id: record.sleep_score for record in db.query(models.SleepRecord)}
+    assert [scores[result.id] for result in response.results] == list(range(7))
+
+
+def test_failing_chunk_is_retried_row_by_row(db, monkeypatch):
+    user = _add_user(db)
+    monkeypatch.setattr(bulk_service.settings, "BULK_INSERT_CHUNK_SIZE", 10)
+
+    def prepare(obj_in):
+        if obj_in.sleep_score == 2:  # Passes validation, then violates end_time NOT NULL in the database
+            return schemas.SleepRecordCreate.construct(**{**obj_in.dict(), "end_time": None})
+        return obj_in
+
+    items = [_night(0), {"start_time": "not a date"}, _night(2), _night(3)]
+    response = bulk_service.bulk_create_for_user(db, crud.sleep_record, items, schemas.SleepRecordCreate,
+                                                 user.id, prepare=prepare)
+
+    assert [result.status for result in response.results] == ["created", "invalid", "failed", "created"]
+    assert "NOT NULL" in response.results[2].errors[0]
+    db.expunge_all()
+    stored = {record.id: record.sleep_score for record in db.query(models.SleepRecord)}
+    assert stored == {response.results[0].id: 0, response.results[3].id: 3}
+
+
+def test_row_error_without_driver_error_is_reported(db):
+    class _RejectingCRUD:
+        model = models.SleepRecord
+
+        def create_many(self, db, *, objs_in, user_id, chunk_size):
+            return [SQLAlchemyError("rejected") for _ in objs_in]
+
+    with count_queries(max_queries=0):
+        response = bulk_service.bulk_create_for_user(db, _RejectingCRUD(), [_night(0)], schemas.SleepRecordCreate, 1)
+
+    assert response.results[0].status == "failed"
+    assert response.results[0].errors == ["rejected"]
@@ -0,0 +1,31 @@
+import asyncio
+import os
+import time
+
+from backend.services.cv_worker_service import CVWorkerPool
+
+
+def test_cancelled_request_keeps_its_slot_until_the_worker_finishes():
+    pool = CVWorkerPool(max_concurrent=1, max_queued=4)
+
+    async def _scenario():
+        await pool.submit(os.getpid)  # Start the worker process before timing anything
+        slow = asyncio.ensure_future(pool.submit(time.sleep, 0.5))
+        await asyncio.sleep(0.1)
+        slow.cancel()  # The client went away; the worker keeps sleeping
+        await asyncio.gather(slow, return_exceptions=True)
+        running_after_cancel = pool.metrics()["running"]
+
+        started_at = time.perf_counter()
+        await pool.submit(os.getpid)
+        return running_after_cancel, time.perf_counter() - started_at
+
+    try:
+        running_after_cancel, next_job_s = asyncio.run(_scenario())
+    finally:
+        pool.shutdown()
+
+    assert running_after_cancel == 1
+    assert next_job_s >= 0.3  # Waited for the cancelled job's slot instead of running alongside it
+    assert pool.metrics()["running"] == 0
+    assert pool.metrics()["jobs_completed"] == 3
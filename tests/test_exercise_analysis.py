@@ -0,0 +1,167 @@
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from backend.services import cv_service
+from backend.services.cv_service import (KEYPOINT_DICT, NUM_KEYPOINTS, POSE_POLICY_BATCH, POSE_POLICY_INTERACTIVE,
+                                         PoseModelRegistry, RepCounter, compile_exercise_spec, joint_angles)
+
+FPS = 10.0
+
+
+@pytest.fixture(scope="module")
+def squat_spec():
+    with open(cv_service.EXERCISE_FORM_RULES_PATH, encoding="utf-8") as rules_file:
+        return compile_exercise_spec("squat", json.load(rules_file)["squat"])
+
+
+def _squat_keypoints(knee_angles, side="left"):
+    """(N, 17, 3) keypoints with the hip above the knee and the ankle placed at each knee angle; other joints unseen."""
+    keypoints = np.zeros((len(knee_angles), NUM_KEYPOINTS, 3))
+    radians = np.radians(np.asarray(knee_angles, dtype=np.float64))
+    knee = np.array([0.6, 0.5])
+    keypoints[:, KEYPOINT_DICT[f"{side}_knee"]] = [*knee, 0.9]
+    keypoints[:, KEYPOINT_DICT[f"{side}_hip"]] = [knee[0] - 0.2, knee[1], 0.9]  # [y, x]; smaller y is higher
+    keypoints[:, KEYPOINT_DICT[f"{side}_ankle"], 0] = knee[0] - 0.2 * np.cos(radians)
+    keypoints[:, KEYPOINT_DICT[f"{side}_ankle"], 1] = knee[1] + 0.2 * np.sin(radians)
+    keypoints[:, KEYPOINT_DICT[f"{side}_ankle"], 2] = 0.9
+    return keypoints
+
+
+def _rep_trace(depth, down_frames, up_frames, top=175.0, hold_frames=5):
+    """Knee angles for one rep: hold at the top, lower linearly to `depth`, rise back, hold again."""
+    return np.concatenate([np.full(hold_frames, top), np.linspace(top, depth, down_frames + 1)[1:],
+                           np.linspace(depth, top, up_frames + 1)[1:], np.full(hold_frames, top)])
+
+
+def test_joint_angles():
+    vertex = np.zeros((5, 2))
+    p1 = np.array([[1.0, 0.0]] * 5)
+    p3 = np.array([[0.0, 1.0], [-1.0, 0.0], [1.0, 1.0], [2.0, 0.0], [0.0, 0.0]])
+
+    angles = joint_angles(p1, vertex, p3)
+
+    np.testing.assert_allclose(angles, [90.0, 180.0, 45.0, 0.0, 180.0])  # Zero-length limb counts as straight
+    assert np.isnan(joint_angles(np.array([[np.nan, 0.0]]), vertex[:1], p3[:1])).all()
+
+
+@pytest.mark.parametrize("side", ["left", "right"])
+def test_analyze_measures_the_visible_side_and_scores_depth(squat_spec, side):
+    keypoints = _squat_keypoints([80.0, 100.0, 130.0, 170.0], side=side)
+
+    analysis = squat_spec.analyze(keypoints)
+
+    np.testing.assert_allclose(analysis.angles["knee_angle"], [80.0, 100.0, 130.0, 170.0])
+    np.testing.assert_allclose(analysis.form_scores, [1.0, 0.8, 0.6, 0.6])  # issue_penalty 0.2 x rule weight
+    assert analysis.frame(0)["feedback"] == ["Good squat depth (thighs parallel or below)."]
+    assert analysis.frame(1)["feedback"] == ["Try to squat deeper; aim for thighs parallel to the ground."]
+
+
+def test_analyze_flags_frames_without_a_visible_knee(squat_spec):
+    keypoints = _squat_keypoints([90.0, 90.0])
+    keypoints[1, KEYPOINT_DICT["left_knee"], 2] = 0.1  # Below MIN_KEYPOINT_VISIBILITY_SCORE
+
+    analysis = squat_spec.analyze(keypoints)
+
+    assert analysis.angles["knee_angle"][0] == 90.0 and np.isnan(analysis.angles["knee_angle"][1])
+    assert analysis.frame(1) == {"feedback": [squat_spec.rules[-1].message], "form_score_frame": 0.8, "angles": {}}
+
+
+def test_rep_counter_segments_reps_with_depth_and_tempo(squat_spec):
+    # Two reps (lowered over 2 s, raised over 1 s), then a half rep that never reaches the flexed phase
+    angles = np.concatenate([_rep_trace(80.0, 20, 10), _rep_trace(95.0, 20, 10), _rep_trace(130.0, 10, 10)])
+    times = np.arange(len(angles)) / FPS
+    counter = RepCounter(squat_spec, smoothing_alpha=1.0)  # Unsmoothed, so phase crossings are exact frames
+
+    counter.update(angles, times, np.ones(len(angles)))
+
+    assert counter.rep_count == 2
+    assert [rep["depth_angle"] for rep in counter.reps] == [80.0, 95.0]
+    # Measured over the rep's own frames: the bottom up to the first frame back above 160 (165.5 and 167)
+    assert [rep["range_of_motion"] for rep in counter.reps] == [85.5, 72.0]
+    # Lowering runs from the last frame above 160 degrees to the bottom, raising from the bottom to the first
+    # frame back above 160: 0.3 s of the 2 s descent and 0.1 s of the 1 s ascent are outside the rep
+    assert [(rep["eccentric_s"], rep["concentric_s"]) for rep in counter.reps] == [(1.7, 0.9), (1.7, 0.9)]
+
+
+def test_rep_counter_skips_frames_where_the_joint_is_not_visible(squat_spec):
+    angles = _rep_trace(80.0, 10, 10)
+    angles[12] = np.nan
+    counter = RepCounter(squat_spec, smoothing_alpha=1.0)
+
+    counter.update(angles, np.arange(len(angles)) / FPS, np.ones(len(angles)))
+
+    assert counter.rep_count == 1 and counter.reps[0]["depth_angle"] == 80.0
+
+
+def test_keypoint_analysis_counts_reps_and_reports_per_rep_depth():
+    angles = np.concatenate([_rep_trace(85.0, 15, 10), _rep_trace(100.0, 15, 10)])
+
+    summary = cv_service.analyze_exercise_form_from_keypoints(_squat_keypoints(angles), "Goblet Squat",
+                                                              source_fps=FPS)
+
+    assert summary["rep_count"] == 2
+    assert [rep["depth_angle"] for rep in summary["reps"]] == [85.0, 100.0]
+    assert summary["reps"][0]["form_score"] > summary["reps"][1]["form_score"]
+    assert summary["key_metrics_summary"]["knee_angle_min"] == 85.0
+
+
+def _registry(**engines):
+    registry = PoseModelRegistry({name: f"{name}.tflite" for name in engines})
+    for name, engine in engines.items():
+        registry.variants[name].engine = engine
+    registry.state = "ready"  # Skip loading the TFLite runtime
+    return registry
+
+
+def _engine(size, latency_ema_ms=None):
+    return SimpleNamespace(input_size=(size, size), latency_ema_ms=latency_ema_ms)
+
+
+def test_registry_selects_by_estimate_before_latency_is_measured():
+    registry = _registry(lightning=_engine(192), thunder=_engine(256), lightning_int8=_engine(192))
+
+    assert registry.select(POSE_POLICY_INTERACTIVE).name == "lightning_int8"
+    assert registry.select(POSE_POLICY_BATCH).name == "thunder"
+
+
+def test_registry_selects_interactive_by_measured_latency():
+    registry = _registry(lightning=_engine(192, 9.0), thunder=_engine(256, 4.0), lightning_int8=_engine(192, 6.0))
+
+    assert registry.select(POSE_POLICY_INTERACTIVE).name == "thunder"
+    assert registry.select(POSE_POLICY_BATCH).name == "thunder"
+
+
+def test_registry_prefers_full_precision_for_batch_at_equal_input_size():
+    registry = _registry(lightning_int8=_engine(192, 3.0), lightning=_engine(192, 5.0))
+
+    assert registry.select(POSE_POLICY_BATCH).name == "lightning"
+    assert registry.select(POSE_POLICY_INTERACTIVE).name == "lightning_int8"
+
+
+def test_registry_without_ready_variants_selects_nothing():
+    registry = _registry(lightning=None)
+
+    assert registry.select(POSE_POLICY_INTERACTIVE) is None
+
+
+def test_importing_cv_service_reads_no_specs_or_models():
+    script = ("from backend.services import cv_service; "
+              "assert cv_service._exercise_spec_registry is None and not cv_service.pose_model_registry.variants")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=60,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    assert result.returncode == 0, result.stderr
+    assert "exercise form specs" not in result.stdout and "MoveNet TFLite model" not in result.stdout
+
+
+def test_specs_load_on_first_use(monkeypatch):
+    monkeypatch.setattr(cv_service, "_exercise_spec_registry", None)
+
+    assert cv_service.analyze_frames(_squat_keypoints([95.0]), "Back Squat").angles["knee_angle"][0] == 95.0
+    assert cv_service._exercise_spec_registry is not None
@@ -0,0 +1,176 @@
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt as google_jwt
+
+from backend.core import firebase_tokens
+from backend.core.firebase_tokens import FirebaseSigningKeys, FirebaseTokenVerifier, InvalidFirebaseTokenError
+
+PROJECT_ID = "demo-fitness"
+
+
+class _SigningKey:
+    """An RSA key with a self-signed cert, standing in for one of Google's Firebase signing keys."""
+
+    def __init__(self, kid: str):
+        self.kid = kid
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, kid)])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+                .serial_number(x509.random_serial_number()).not_valid_before(now - datetime.timedelta(days=1))
+                .not_valid_after(now + datetime.timedelta(days=1)).sign(key, hashes.SHA256()))
+        self.cert_pem = cert.public_bytes(serialization.Encoding.PEM).decode()
+        private_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                        serialization.NoEncryption())
+        self._signer = crypt.RSASigner.from_string(private_pem, key_id=kid)
+
+    def token(self, **claims) -> str:
+        now = int(time.time())
+        payload = {"iss": f"https://securetoken.google.com/{PROJECT_ID}", "aud": PROJECT_ID, "sub": "uid-1",
+                   "iat": now - 10, "exp": now + 3600, "email": "runner@example.com", **claims}
+        return google_jwt.encode(self._signer, payload).decode()
+
+
+class _CertServer:
+    """Local stand-in for the Firebase cert endpoint, serving whichever keys `served` holds."""
+
+    def __init__(self, max_age_s: int = 1000):
+        self.served = []
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                body = json.dumps({key.kid: key.cert_pem for key in server.served}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", f"public, max-age={max_age_s}, must-revalidate")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}/certs"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture(scope="module")
+def signing_keys():
+    return _SigningKey("kid-1"), _SigningKey("kid-2")
+
+
+@pytest.fixture()
+def cert_server(signing_keys, monkeypatch):
+    server = _CertServer()
+    server.served = [signing_keys[0]]
+    monkeypatch.setattr(firebase_tokens.settings, "FIREBASE_CERTS_URL", server.url)
+    yield server
+    server.close()
+
+
+def _verifier(min_refetch_s: float = 0.0) -> FirebaseTokenVerifier:
+    keys = FirebaseSigningKeys(certs_url=firebase_tokens.settings.FIREBASE_CERTS_URL, fallback_refresh_s=3600,
+                               min_refetch_s=min_refetch_s)
+    return FirebaseTokenVerifier(keys, project_id=lambda: PROJECT_ID, max_entries=100)
+
+
+def test_refresh_fetches_certs_and_schedules_next_refresh_from_max_age(cert_server, signing_keys):
+    keys = _verifier().keys
+
+    certs = keys.refresh()
+
+    assert set(certs) == {"kid-1"}
+    assert keys.fetches == 1
+    assert keys._refresh_in_s == pytest.approx(800)  # 80% of max-age=1000
+
+
+def test_verify_checks_signature_once_per_token(cert_server, signing_keys):
+    verifier = _verifier()
+    token = signing_keys[0].token()
+
+    claims = verifier.verify(token)
+    assert verifier.verify(token) == claims
+
+    assert claims["uid"] == "uid-1" and claims["email"] == "runner@example.com"
+    assert (verifier.misses, verifier.hits, cert_server.requests) == (1, 1, 1)
+
+
+def test_unknown_kid_refetches_rotated_certs(cert_server, signing_keys):
+    verifier = _verifier()
+    verifier.verify(signing_keys[0].token())
+    cert_server.served = [signing_keys[0], signing_keys[1]]  # Google publishes the next key
+
+    claims = verifier.verify(signing_keys[1].token(sub="uid-2"))
+
+    assert claims["uid"] == "uid-2"
+    assert verifier.keys.fetches == 2
+
+
+def test_unknown_kid_refetch_is_rate_limited(cert_server, signing_keys):
+    verifier = _verifier(min_refetch_s=3600)
+    verifier.keys.refresh()
+    cert_server.served = [signing_keys[1]]
+
+    with pytest.raises(InvalidFirebaseTokenError, match="unknown key"):
+        verifier.verify(signing_keys[1].token())
+    assert verifier.keys.fetches == 1
+
+
+def test_cached_claims_expire_with_the_token(cert_server, signing_keys, monkeypatch):
+    verifier = _verifier()
+    exp = int(time.time()) + 120
+    token = signing_keys[0].token(exp=exp)
+    verifier.verify(token)
+
+    assert verifier._cache[verifier._cache_key(token)][0] == exp
+    assert verifier.get_cached(token) is not None
+    monkeypatch.setattr(firebase_tokens.time, "time", lambda: exp + 1)
+    assert verifier.get_cached(token) is None
+    assert len(verifier._cache) == 0
+
+
+@pytest.mark.parametrize("claims, message", [
+    ({"aud": "another-project"}, "audience"),
+    ({"iss": "https://securetoken.google.com/another-project"}, "iss"),
+    ({"sub": ""}, "sub"),
+])
+def test_rejects_tokens_for_another_project_or_without_subject(cert_server, signing_keys, claims, message):
+    verifier = _verifier()
+
+    with pytest.raises(InvalidFirebaseTokenError, match=message):
+        verifier.verify(signing_keys[0].token(**claims))
+    assert len(verifier._cache) == 0
+
+
+def test_expired_token_is_flagged(cert_server, signing_keys):
+    now = int(time.time())
+    token = signing_keys[0].token(iat=now - 7200, exp=now - 3600)
+
+    with pytest.raises(InvalidFirebaseTokenError) as excinfo:
+        _verifier().verify(token)
+    assert excinfo.value.expired
+
+
+def test_token_signed_by_another_key_with_known_kid_is_rejected(cert_server, signing_keys):
+    impostor = _SigningKey("kid-1")  # Reuses the served kid but not its private key
+
+    with pytest.raises(InvalidFirebaseTokenError):
+        _verifier().verify(impostor.token())
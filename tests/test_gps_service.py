@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from backend import crud, models, schemas
+from backend.routers import activities
+from backend.services import gps_service
+from backend.services.gps_service import PackedTrack
+
+
+def _meridian_track(step_deg=0.001, count=10, lon=0.0):
+    lat = np.arange(count) * step_deg
+    return PackedTrack(lat=lat, lon=np.full(count, lon), alt=np.full(count, np.nan),
+                       t=np.arange(count, dtype=np.float64), accuracy=np.full(count, np.nan))
+
+
+def _wiggly_points(count=400, seed=7):
+    """A run that meanders about a line heading north-east, one fix per second."""
+    rng = np.random.default_rng(seed)
+    steps = np.arange(count)
+    lat = 52.0 + steps * 2e-5 + 3e-4 * np.sin(steps / 15) + rng.normal(0, 2e-6, count)
+    lon = 4.0 + steps * 3e-5 + rng.normal(0, 2e-6, count)
+    start = datetime(2024, 1, 1, 7, 0)
+    return [schemas.GPSDataPoint(lat=float(lat[i]), lon=float(lon[i]), timestamp=start + timedelta(seconds=int(i)),
+                                 altitude=float(10 + i % 7), accuracy=4.0) for i in steps]
+
+
+def _max_deviation_m(track, kept):
+    """Largest distance of a dropped point from the segment between the kept points around it."""
+    xy = gps_service.local_xy_m(track)
+    worst = 0.0
+    for start, end in zip(kept[:-1], kept[1:]):
+        a, b, p = xy[start], xy[end], xy[start + 1:end]
+        if not len(p):
+            continue
+        ab = b - a
+        along = np.clip((p - a) @ ab / max(ab @ ab, 1e-12), 0.0, 1.0)
+        worst = max(worst, float(np.linalg.norm(p - (a + along[:, None] * ab), axis=1).max()))
+    return worst
+
+
+def test_vincenty_matches_the_flinders_peak_to_buninyong_reference():
+    # Vincenty (1975) / Geoscience Australia worked example: 54 972.271 m on WGS-84
+    lat1, lon1 = -(37 + 57 / 60 + 3.72030 / 3600), 144 + 25 / 60 + 29.52440 / 3600
+    lat2, lon2 = -(37 + 39 / 60 + 10.15610 / 3600), 143 + 55 / 60 + 35.38390 / 3600
+
+    distance = gps_service.vincenty_m(np.array([lat1]), np.array([lon1]), np.array([lat2]), np.array([lon2]))
+
+    assert distance[0] == pytest.approx(54972.271, abs=1e-3)
+
+
+def test_short_track_distance_against_reference_arcs():
+    # 0.009 degrees along the equator's meridian: a(1 - e^2) * dphi on the ellipsoid, R * dphi on the sphere
+    track = _meridian_track()
+    dphi = np.radians(0.009)
+    meridian_radius = gps_service.WGS84_A * (1 - gps_service.WGS84_F * (2 - gps_service.WGS84_F))
+
+    assert gps_service.segment_distances_m(track, "vincenty").sum() == pytest.approx(meridian_radius * dphi, abs=1e-3)
+    assert gps_service.segment_distances_m(track, "haversine").sum() == pytest.approx(
+        gps_service.EARTH_RADIUS_M * dphi, abs=1e-6)
+
+    along_equator = PackedTrack(lat=track.lon, lon=track.lat, alt=track.alt, t=track.t, accuracy=track.accuracy)
+    assert gps_service.segment_distances_m(along_equator, "vincenty").sum() == pytest.approx(
+        gps_service.WGS84_A * dphi, abs=1e-3)
+
+
+def test_track_metrics_distance_uses_the_configured_formula():
+    metrics = gps_service.compute_track_metrics(_meridian_track(), formula="vincenty", moving_speed_mps=0)
+
+    assert metrics["total_distance_km"] == 0.995
+    assert metrics["elapsed_time_s"] == 9.0
+
+
+def test_elevation_gain_ignores_changes_below_the_hysteresis():
+    alt = np.array([100, 101, 99, 100, 104, 103, 108, 106, 107, 101], dtype=np.float64)
+
+    assert gps_service.elevation_gain_loss_m(alt, hysteresis_m=3, smoothing_window=1) == {"gain": 8.0, "loss": 7.0}
+    assert gps_service.elevation_gain_loss_m(alt, hysteresis_m=0, smoothing_window=1) == {"gain": 12.0, "loss": 11.0}
+
+
+def test_altitude_noise_on_flat_ground_adds_no_climb():
+    alt = 50 + np.random.default_rng(3).uniform(-1, 1, 600)
+    alt[::40] = np.nan  # Fixes without altitude are skipped
+
+    assert gps_service.elevation_gain_loss_m(alt, hysteresis_m=3) == {"gain": 0.0, "loss": 0.0}
+
+
+def test_binary_track_round_trip_is_lossless_within_quantization():
+    rng = np.random.default_rng(11)
+    count = 500
+    track = PackedTrack(
+        lat=-33.9 + np.cumsum(rng.normal(0, 1e-4, count)),
+        lon=(179.99 + np.cumsum(np.abs(rng.normal(0, 1e-4, count))) + 180) % 360 - 180,  # Crosses the antimeridian
+        alt=np.where(rng.random(count) < 0.1, np.nan, 20 + np.cumsum(rng.normal(0, 0.5, count))),
+        t=1_700_000_000 + np.cumsum(rng.uniform(0.5, 2.0, count)),
+        accuracy=np.where(rng.random(count) < 0.1, np.nan, rng.uniform(2, 30, count)),
+    )
+
+    assert track.lon.min() < -179 and track.lon.max() > 179
+    decoded = gps_service.decode_track(gps_service.encode_track(track))
+
+    assert len(decoded) == count
+    np.testing.assert_allclose(decoded.lat, track.lat, rtol=0, atol=0.5e-7)  # 1e-7 degrees
+    np.testing.assert_allclose(decoded.lon, track.lon, rtol=0, atol=0.5e-7)
+    np.testing.assert_allclose(decoded.t, track.t, rtol=0, atol=0.5e-3)  # Milliseconds
+    np.testing.assert_allclose(decoded.alt, track.alt, rtol=0, atol=0.125)  # Quarter meters; NaN where missing
+    np.testing.assert_allclose(decoded.accuracy, track.accuracy, rtol=0, atol=0.05)  # Decimeters
+    assert gps_service.encode_track(decoded) == gps_service.encode_track(track)  # Quantized values are exact
+
+
+def test_simplified_track_stays_within_resolution():
+    track = gps_service.pack_track(_wiggly_points())
+    kept_counts = []
+
+    for resolution_m in (0.5, 2.0, 5.0, 20.0):
+        kept = gps_service.simplify_indices(track, resolution_m)
+        assert kept[0] == 0 and kept[-1] == len(track) - 1
+        assert _max_deviation_m(track, kept) <= resolution_m
+        kept_counts.append(len(kept))
+
+    assert kept_counts == sorted(kept_counts, reverse=True) and kept_counts[-1] < len(track) // 10
+
+
+@pytest.fixture()
+def runner_with_track(db):
+    user = models.User(email="runner@example.com", is_active=True)
+    db.add(user)
+    db.commit()
+    activity = crud.activity.create_with_user(db, obj_in=schemas.ActivityCreate(
+        activity_type=schemas.ActivityTypeSchema.RUNNING, start_time=datetime(2024, 1, 1, 7, 0),
+        duration_minutes=7, gps_data=_wiggly_points()), user_id=user.id)
+    return user, activity
+
+
+def test_track_endpoint_simplifies_from_the_full_track(db, api_client, runner_with_track):
+    user, activity = runner_with_track
+    client = api_client(activities.router, "/activities", user)
+    full_track = crud.activity.full_track(activity)
+
+    full = client.get(f"/activities/{activity.id}/track").json()
+    coarse = client.get(f"/activities/{activity.id}/track", params={"resolution_m": 10}).json()
+
+    assert len(full) == len(full_track) == 400  # Not the stored simplified track
+    kept = [index for index, point in enumerate(full) if point in coarse]
+    assert len(kept) == len(coarse) < len(full)
+    assert _max_deviation_m(full_track, np.array(kept)) <= 10
+
+
+def test_track_endpoint_clips_to_bbox(db, api_client, runner_with_track):
+    user, activity = runner_with_track
+    client = api_client(activities.router, "/activities", user)
+    bbox = (4.003, 52.0, 4.006, 52.01)  # min_lon,min_lat,max_lon,max_lat
+
+    points = client.get(f"/activities/{activity.id}/track",
+                        params={"resolution_m": 2, "bbox": ",".join(map(str, bbox))}).json()
+
+    assert points
+    assert all(bbox[0] <= point["lon"] <= bbox[2] and bbox[1] <= point["lat"] <= bbox[3] for point in points)
+    assert [point["timestamp"] for point in points] == sorted(point["timestamp"] for point in points)
+
+
+def test_track_endpoint_rejects_bad_bbox_and_other_users(db, api_client, runner_with_track):
+    user, activity = runner_with_track
+    other = models.User(email="other@example.com", is_active=True)
+    db.add(other)
+    db.commit()
+
+    response = api_client(activities.router, "/activities", user).get(
+        f"/activities/{activity.id}/track", params={"bbox": "4,52,5"})
+    assert response.status_code == 400
+    assert api_client(activities.router, "/activities", other).get(
+        f"/activities/{activity.id}/track").status_code == 403
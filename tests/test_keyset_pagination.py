@@ -0,0 +1,98 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from backend import crud, models
+from backend.database import count_queries
+from backend.routers import activities
+
+_T1, _T2, _T3 = datetime(2024, 1, 1), datetime(2024, 1, 2), datetime(2024, 1, 3)
+
+
+def _seed_workouts(db):
+    user = models.User(email="pager@example.com", is_active=True)
+    db.add(user)
+    db.flush()
+    # Inserted out of time order so ids alone don't give the listing order; three share _T2
+    schedule = [_T2, None, _T1, _T2, _T3, None, _T2]
+    workouts = [models.Workout(user_id=user.id, name=f"Workout {i}", scheduled_date=when)
+                for i, when in enumerate(schedule)]
+    db.add_all(workouts)
+    db.commit()
+    expected = sorted((w for w in workouts if w.scheduled_date), key=lambda w: (w.scheduled_date, w.id), reverse=True)
+    expected += sorted((w for w in workouts if w.scheduled_date is None), key=lambda w: w.id, reverse=True)
+    return user.id, [workout.id for workout in expected]
+
+
+def _walk(db, user_id, limit):
+    """All pages of the user's workouts, with the number of NULL-timestamp queries each page issued."""
+    pages, null_queries, cursor = [], [], None
+    while True:
+        with count_queries() as counter:
+            page, cursor = crud.workout.get_page_by_user(db, user_id=user_id, cursor=cursor, limit=limit)
+        pages.append([workout.id for workout in page])
+        null_queries.append(sum("scheduled_date IS NULL" in statement for statement in counter.statements))
+        if cursor is None:
+            return pages, null_queries
+
+
+def test_pages_keep_a_stable_order_across_equal_timestamps(db):
+    user_id, expected_ids = _seed_workouts(db)
+
+    for limit in (1, 2, 3, 7):
+        pages, _ = _walk(db, user_id, limit)
+        assert [workout_id for page in pages for workout_id in page] == expected_ids
+        assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_null_timestamp_query_runs_once_the_dated_rows_run_out(db):
+    user_id, expected_ids = _seed_workouts(db)
+
+    pages, null_queries = _walk(db, user_id, limit=2)
+
+    # Pages 1-2 are filled by dated rows; page 3 tops up its last dated row with an undated one, and page 4
+    # starts from an undated cursor, so it only runs the NULL query
+    assert pages == [expected_ids[0:2], expected_ids[2:4], expected_ids[4:6], expected_ids[6:7]]
+    assert null_queries == [0, 0, 1, 1]
+
+
+def _b64(payload: bytes) -> str:
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def test_listing_returns_next_cursor_in_header(db, api_client):
+    user = models.User(email="runner@example.com", is_active=True)
+    db.add(user)
+    db.flush()
+    db.add_all([models.Activity(user_id=user.id, activity_type=models.ActivityTypeDB.RUNNING, start_time=_T1),
+                models.Activity(user_id=user.id, activity_type=models.ActivityTypeDB.RUNNING, start_time=_T2)])
+    db.commit()
+    client = api_client(activities.router, "/activities", user)
+
+    first = client.get("/activities/", params={"limit": 1})
+    second = client.get("/activities/", params={"limit": 1, "cursor": first.headers["X-Next-Cursor"]})
+
+    assert first.status_code == second.status_code == 200
+    assert [item["start_time"] for item in first.json() + second.json()] == [_T2.isoformat(), _T1.isoformat()]
+    assert "X-Next-Cursor" not in second.headers
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",  # Not base64
+    _b64(b"\xff\xfe"),  # Not JSON
+    _b64(json.dumps({"t": None}).encode()),  # No id
+    _b64(json.dumps({"t": "yesterday", "id": 1}).encode()),  # Bad timestamp
+    _b64(json.dumps({"t": None, "id": "one"}).encode()),  # Bad id
+    _b64(json.dumps([1, 2]).encode()),  # Not an object
+])
+def test_malformed_cursor_is_a_400(db, api_client, cursor):
+    user = models.User(email="runner@example.com", is_active=True)
+    db.add(user)
+    db.commit()
+
+    response = api_client(activities.router, "/activities", user).get("/activities/", params={"cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid pagination cursor."
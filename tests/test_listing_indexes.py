@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from backend import crud, models
+from backend.database import engine
+
+
+def _seed(db):
+    user = models.User(email="index-plan@example.com")
+    db.add(user)
+    db.flush()
+    start = datetime(2024, 1, 1)
+    for day in range(3):
+        at = start + timedelta(days=day)
+        db.add_all([
+            models.Activity(user_id=user.id, activity_type=models.ActivityTypeDB.RUNNING, start_time=at),
+            models.Workout(user_id=user.id, name=f"Workout {day}", scheduled_date=at),
+            models.NutritionLog(user_id=user.id, food_item_name="Apple", consumed_at=at),
+            models.SleepRecord(user_id=user.id, start_time=at, end_time=at + timedelta(hours=8)),
+            models.PaymentRecord(user_id=user.id, amount=10.0, payment_gateway=models.PaymentGatewayDB.STRIPE,
+                                 created_at=at),
+        ])
+    db.add(models.Workout(user_id=user.id, name="Unscheduled"))  # NULL scheduled_date: the second listing query
+    db.commit()
+    return user.id
+
+
+def _listing_statements(table, run):
+    """(statement, parameters) of every query `run` issues against `table` filtered by user_id."""
+    captured = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if f"FROM {table}" in statement and "user_id" in statement:
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    assert captured, f"No listing query against {table} was issued"
+    return captured
+
+
+def _query_plan(statement, parameters):
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+LISTINGS = [
+    (crud.activity, "activities", "ix_activities_user_id_start_time"),
+    (crud.workout, "workouts", "ix_workouts_user_id_scheduled_date"),
+    (crud.nutrition_log, "nutrition_logs", "ix_nutrition_logs_user_id_consumed_at"),
+    (crud.sleep_record, "sleep_records", "ix_sleep_records_user_id_start_time"),
+    (crud.payment_record, "payment_records", "ix_payment_records_user_id_created_at"),
+]
+
+
+@pytest.mark.parametrize("crud_obj, table, index_name", LISTINGS, ids=[table for _, table, _ in LISTINGS])
+def test_listing_queries_seek_the_user_time_index(db, crud_obj, table, index_name):
+    user_id = _seed(db)
+
+    def run_listings():
+        _, cursor = crud_obj.get_page_by_user(db, user_id=user_id, limit=1)
+        crud_obj.get_page_by_user(db, user_id=user_id, cursor=cursor, limit=1)
+        crud_obj.get_page_by_user(db, user_id=user_id, skip=1, limit=100)
+        crud_obj.get_multi_by_user(db, user_id=user_id, limit=10)
+        if crud_obj is crud.nutrition_log:
+            crud_obj.get_multi_by_user(db, user_id=user_id, date_filter=datetime(2024, 1, 2).date())
+
+    for statement, parameters in _listing_statements(table, run_listings):
+        plan = _query_plan(statement, parameters)
+        assert any(f"USING INDEX {index_name}" in step for step in plan), (statement, plan)
+        assert not any(step.startswith("SCAN") or "USE TEMP B-TREE" in step for step in plan), (statement, plan)
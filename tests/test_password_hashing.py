@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.core.password_hashing import PasswordHashingPool, build_password_context
+
+
+def _bcrypt_usable() -> bool:
+    try:
+        build_password_context(4).hash("probe")
+    except ValueError:  # passlib 1.7.4's backend self-test fails against bcrypt >= 4.1
+        return False
+    return True
+
+
+def _blocking_pool(max_concurrent=1, max_queued=4):
+    pool = PasswordHashingPool(build_password_context(4), max_concurrent=max_concurrent, max_queued=max_queued)
+    release = threading.Event()
+    started = threading.Event()
+
+    def _job():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    return pool, release, started, _job
+
+
+def test_pending_count_drops_when_a_queued_job_is_cancelled():
+    pool, release, started, job = _blocking_pool()
+    try:
+        running = pool._submit(job)
+        started.wait(5)
+        queued = pool._submit(job)
+        assert pool.metrics()["queue_depth"] == 1
+
+        assert queued.cancel()
+        assert pool.metrics()["queue_depth"] == 0
+        release.set()
+        assert running.result(5) == "done"
+        assert pool._pending == 0
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_pending_count_drops_when_an_awaiting_caller_is_cancelled():
+    pool, release, started, job = _blocking_pool()
+
+    async def _scenario():
+        running = pool._submit(job)
+        waiter = asyncio.ensure_future(asyncio.wrap_future(pool._submit(job)))
+        await asyncio.sleep(0.05)
+        waiter.cancel()  # e.g. the client disconnected during login
+        await asyncio.gather(waiter, return_exceptions=True)
+        release.set()
+        return await asyncio.wrap_future(running)
+
+    try:
+        assert asyncio.run(_scenario()) == "done"
+        assert pool._pending == 0
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_pending_count_drops_for_jobs_cancelled_by_shutdown():
+    pool, release, started, job = _blocking_pool(max_queued=8)
+    pool._submit(job)
+    started.wait(5)
+    for _ in range(3):
+        pool._submit(job)
+
+    pool.shutdown()
+    assert pool._pending == 1  # Only the running job
+    release.set()
+    for _ in range(50):
+        if pool._pending == 0:
+            break
+        threading.Event().wait(0.02)
+    assert pool._pending == 0
+
+
+@pytest.mark.skipif(not _bcrypt_usable(), reason="passlib can't load this bcrypt version's backend")
+def test_login_rehashes_passwords_stored_at_an_old_cost():
+    old_hash = build_password_context(4).hash("s3cret-pass")
+    pool = PasswordHashingPool(build_password_context(5), max_concurrent=1, max_queued=1)
+    try:
+        verified, new_hash = asyncio.run(pool.averify_and_update("s3cret-pass", old_hash))
+        assert verified
+        assert new_hash is not None and new_hash.startswith("$2b$05$")
+        assert asyncio.run(pool.averify_and_update("s3cret-pass", new_hash)) == (True, None)
+        assert asyncio.run(pool.averify_and_update("wrong-pass", old_hash)) == (False, None)
+        assert pool.metrics()["rehashes"] == 1
+    finally:
+        pool.shutdown()
@@ -0,0 +1,44 @@
+import random
+import threading
+import time
+
+import numpy as np
+
+from backend.services import cv_service
+
+
+class _ScriptedEstimator:
+    """PoseEstimator stand-in whose keypoints echo the frame's fill value, with jittered inference time."""
+
+    batch_sizes = []
+    _lock = threading.Lock()
+
+    def __init__(self, model_path, num_threads=None):
+        self.interpreter = object()
+        self.model_input_height = self.model_input_width = 4
+        self.input_details = [{"dtype": np.float32}]
+
+    def _preprocess_image(self, frame):
+        return np.full((1, 4, 4, 3), frame[0, 0, 0], dtype=np.float32), frame.shape[:2]
+
+    def run_inference_on_batch(self, input_batch):
+        with self._lock:
+            self.batch_sizes.append(len(input_batch))
+        time.sleep(random.uniform(0, 0.01))  # Let batches finish out of order
+        return [np.full((cv_service.NUM_KEYPOINTS, 3), frame[0, 0, 0], dtype=np.float32) for frame in input_batch]
+
+
+def test_iter_keypoints_yields_batched_results_in_input_order(monkeypatch):
+    monkeypatch.setattr(cv_service, "PoseEstimator", _ScriptedEstimator)
+    _ScriptedEstimator.batch_sizes = []
+    engine = cv_service.PoseInferenceEngine("scripted.tflite", num_workers=3, batch_size=4)
+    frames = [np.full((8, 8, 3), index, dtype=np.uint8) for index in range(50)]
+    try:
+        results = list(engine.iter_keypoints(iter(frames)))
+    finally:
+        engine.shutdown()
+
+    assert [int(result.keypoints[0, 0]) for result in results] == list(range(50))
+    assert all(result.error is None for result in results)
+    assert sorted(_ScriptedEstimator.batch_sizes) == [2] + [4] * 12  # 50 frames in batches of 4
+    assert engine.frames_inferred == 50
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from backend import crud, models
+from backend.database import count_queries
+
+
+def _seed_workouts(db, count=5, exercises_per_workout=3):
+    user = models.User(email="query-budget@example.com")
+    exercises = [models.Exercise(name=f"Exercise {i}") for i in range(exercises_per_workout)]
+    db.add_all([user, *exercises])
+    db.flush()
+    workouts = []
+    for day in range(count):
+        workout = models.Workout(user_id=user.id, name=f"Workout {day}",
+                                 scheduled_date=datetime(2024, 1, 1) + timedelta(days=day))
+        workout.workout_exercises_association = [
+            models.WorkoutExercise(exercise_id=exercise.id, sets=3, reps="10") for exercise in exercises]
+        workouts.append(workout)
+    db.add_all(workouts)
+    db.commit()
+    ids = user.id, [workout.id for workout in workouts], workouts[0].workout_exercises_association[0].id
+    db.expunge_all()  # Nothing may come from the identity map; every row the reads need must be queried
+    return ids
+
+
+def _serialize(workout):
+    # What WorkoutSchema reads: the workout, its exercises and each exercise definition
+    return [(workout.name, item.sets, item.exercise.name) for item in workout.workout_exercises]
+
+
+def test_workout_page_loads_nested_exercises_in_three_queries(db):
+    user_id, _, _ = _seed_workouts(db)
+    with count_queries(max_queries=3):
+        page, next_cursor = crud.workout.get_page_by_user(db, user_id=user_id, limit=3)
+        serialized = [_serialize(workout) for workout in page]
+    assert len(page) == 3 and next_cursor
+    assert all(len(items) == 3 for items in serialized)
+
+
+def test_workout_detail_read_is_one_query(db):
+    _, workout_ids, _ = _seed_workouts(db)
+    with count_queries(max_queries=1):
+        workout = crud.workout.get_with_exercises(db, id=workout_ids[0])
+        serialized = _serialize(workout)
+    assert len(serialized) == 3
+
+
+def test_workout_exercise_lookup_is_one_query(db):
+    user_id, workout_ids, workout_exercise_id = _seed_workouts(db)
+    with count_queries(max_queries=1):
+        workout_exercise = crud.workout.get_workout_exercise(db, workout_id=workout_ids[0], id=workout_exercise_id)
+        assert workout_exercise.exercise.name and workout_exercise.workout.user_id == user_id
+    assert crud.workout.get_workout_exercise(db, workout_id=workout_ids[1], id=workout_exercise_id) is None
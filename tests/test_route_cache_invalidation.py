@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from backend import crud, models, schemas
+from backend.services import polyline_service
+
+
+def _points(count, lon_step=0.001):
+    start = datetime(2024, 1, 1, 7, 0)
+    return [schemas.GPSDataPoint(lat=52.0, lon=4.0 + i * lon_step, timestamp=start + timedelta(seconds=10 * i))
+            for i in range(count)]
+
+
+def test_activity_track_update_invalidates_route_cache_after_commit(db, monkeypatch):
+    user = models.User(email="runner@example.com", is_active=True)
+    db.add(user)
+    db.commit()
+    activity = crud.activity.create_with_user(db, obj_in=schemas.ActivityCreate(
+        activity_type=schemas.ActivityTypeSchema.RUNNING, start_time=datetime(2024, 1, 1, 7, 0),
+        duration_minutes=10, gps_data=_points(20)), user_id=user.id)
+
+    events = []
+    event.listen(db, "after_commit", lambda session: events.append("commit"))
+    monkeypatch.setattr(polyline_service.route_levels_cache, "invalidate",
+                        lambda activity_id: events.append(("invalidate", activity_id)))
+
+    crud.activity.update(db, db_obj=activity, obj_in={"gps_data": _points(30, lon_step=0.002)})
+
+    assert events == ["commit", ("invalidate", activity.id)]
@@ -0,0 +1,85 @@
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from backend import crud, models
+from backend.database import ensure_schema
+from backend.services import gps_service
+
+# activities as created before the per-activity GPS metrics and the binary track column existed
+_OLD_ACTIVITIES = """
+CREATE TABLE activities (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    activity_type VARCHAR(8) NOT NULL,
+    start_time DATETIME NOT NULL,
+    end_time DATETIME,
+    duration_minutes FLOAT,
+    distance_km FLOAT,
+    calories_burned FLOAT,
+    avg_heart_rate INTEGER,
+    max_heart_rate INTEGER,
+    hr_zones JSON,
+    gps_data JSON,
+    notes VARCHAR,
+    created_at DATETIME
+)
+"""
+
+def _old_schema_engine(tmp_path, *statements):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL)"))
+        connection.execute(text("INSERT INTO users (id, email) VALUES (1, 'runner@example.com')"))
+        for statement in statements:
+            connection.execute(text(statement))
+    return engine
+
+
+def test_ensure_schema_adds_missing_activity_columns(tmp_path):
+    engine = _old_schema_engine(tmp_path, _OLD_ACTIVITIES,
+                                "INSERT INTO activities (id, user_id, activity_type, start_time, distance_km) "
+                                "VALUES (1, 1, 'RUNNING', '2024-01-01 07:00:00', 5.0)")
+
+    changes = ensure_schema(engine)
+
+    for column in ("elevation_gain_m", "elevation_loss_m", "moving_time_minutes", "splits", "gps_track"):
+        assert f"column activities.{column}" in changes
+    assert "index ix_activities_user_id_start_time" in changes
+    assert "activity_tracks" in inspect(engine).get_table_names()
+    with engine.connect() as connection:
+        row = connection.execute(text("SELECT distance_km, elevation_gain_m, splits FROM activities")).one()
+    assert tuple(row) == (5.0, None, None)
+    assert ensure_schema(engine) == []  # Idempotent
+    engine.dispose()
+
+
+def test_legacy_gps_data_json_is_read_and_rewritten_as_binary(tmp_path):
+    points = [{"lat": 52.0 + i * 1e-4, "lon": 4.0, "timestamp": f"2024-01-01T07:00:{i:02d}", "altitude": 10.0 + i,
+               "accuracy": 5.0} for i in range(30)]
+    engine = _old_schema_engine(tmp_path, _OLD_ACTIVITIES)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO activities (id, user_id, activity_type, start_time, gps_data) "
+                                "VALUES (1, 1, 'RUNNING', '2024-01-01 07:00:00', :points)"),
+                           {"points": json.dumps(points)})
+    ensure_schema(engine)
+
+    with Session(engine) as db:
+        activity = db.get(models.Activity, 1)
+        assert activity.gps_track is None
+        assert len(activity.track) == len(crud.activity.full_track(activity)) == 30
+        assert activity.gps_data[-1]["lat"] == pytest.approx(points[-1]["lat"], abs=1e-7)
+        assert activity.gps_data[-1]["timestamp"] == datetime(2024, 1, 1, 7, 0, 29)
+
+        crud.activity.update(db, db_obj=activity, obj_in={"gps_data": points[:10]})
+
+    with engine.connect() as connection:
+        gps_track, gps_data = connection.execute(text("SELECT gps_track, gps_data FROM activities")).one()
+        point_count = connection.execute(text("SELECT point_count FROM activity_tracks")).scalar_one()
+    assert gps_data is None
+    assert len(gps_service.decode_track(gps_track)) == 2  # A straight line simplifies to its end points
+    assert point_count == 10
+    engine.dispose()
@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+from pydantic import BaseModel
+from sqlalchemy import Column, DateTime, Integer, String, create_engine, event, func, text
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from backend import crud, models, schemas
+from backend.database import count_queries, unit_of_work
+
+
+def _add_user(db):
+    user = models.User(email="runner@example.com", full_name="Runner", is_active=True)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_unit_of_work_commits_crud_writes_once(db):
+    user = _add_user(db)
+    commits = []
+    event.listen(db, "after_commit", lambda session: commits.append(session))
+
+    with unit_of_work(db):
+        exercise = crud.exercise.create(db, obj_in=schemas.ExerciseCreate(name="Back Squat"))
+        crud.user.update(db, db_obj=user, obj_in={"full_name": "Renamed"})
+        assert exercise.id is not None  # Flushed, so later writes can use it
+        assert commits == []
+
+    assert len(commits) == 1
+    db.expunge_all()
+    assert crud.exercise.get(db, id=exercise.id).name == "Back Squat"
+    assert crud.user.get(db, id=user.id).full_name == "Renamed"
+
+
+def test_unit_of_work_rolls_back_all_writes_on_error(db):
+    user = _add_user(db)
+    user_id = user.id
+
+    with pytest.raises(RuntimeError):
+        with unit_of_work(db):
+            crud.exercise.create(db, obj_in=schemas.ExerciseCreate(name="Back Squat"))
+            crud.user.update(db, db_obj=user, obj_in={"full_name": "Renamed"})
+            raise RuntimeError("third write failed")
+
+    db.expunge_all()
+    assert db.query(models.Exercise).count() == 0
+    assert crud.user.get(db, id=user_id).full_name == "Runner"
+
+
+_ServerDefaultBase = declarative_base()
+
+
+class _Stamped(_ServerDefaultBase):
+    __tablename__ = "stamped"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    status = Column(String, nullable=False, server_default=text("'new'"))
+    stamped_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+
+class _StampedCreate(BaseModel):
+    name: str
+
+
+@pytest.mark.parametrize("insert_returning", [True, False], ids=["returning", "refresh"])
+def test_create_populates_server_defaults(tmp_path, monkeypatch, insert_returning):
+    engine = create_engine(f"sqlite:///{tmp_path / 'stamped.db'}")
+    _ServerDefaultBase.metadata.create_all(bind=engine)
+    monkeypatch.setattr(engine.dialect, "insert_returning", insert_returning)
+    session = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)()
+    try:
+        stamped = crud.CRUDBase(_Stamped).create(session, obj_in=_StampedCreate(name="a"))
+
+        with count_queries(engine, max_queries=0):  # Already loaded, not lazy-loaded on access
+            assert stamped.status == "new"
+            assert isinstance(stamped.stamped_at, datetime)
+    finally:
+        session.close()
+        engine.dispose()
@@ -0,0 +1,21 @@
+from backend import models
+from backend.core.firebase_init import get_current_firebase_user
+from backend.core.user_cache import USER_KEY_FIREBASE_UID, user_identity_cache
+
+
+def test_firebase_cache_hit_does_not_extend_expiry(db):
+    user_identity_cache.clear()
+    db.add(models.User(email="runner@example.com", firebase_uid="uid-1", is_active=True))
+    db.commit()
+    token = {"uid": "uid-1", "email": "runner@example.com"}
+    key = (USER_KEY_FIREBASE_UID, "uid-1")
+
+    get_current_firebase_user(db=db, decoded_token=token)  # Miss: loads and caches the user
+    expires_at = user_identity_cache._entries[key][0]
+    hits = user_identity_cache.hits
+    user = get_current_firebase_user(db=db, decoded_token=token)
+
+    assert user.email == "runner@example.com"
+    assert user_identity_cache.hits == hits + 1
+    assert user_identity_cache._entries[key][0] == expires_at
+    user_identity_cache.clear()